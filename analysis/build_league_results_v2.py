@@ -11,10 +11,13 @@ reinforcement learner can train on well-conditioned inputs.
 
 from __future__ import annotations
 
+import sys
 from pathlib import Path
+from typing import Dict, Iterable, Mapping
 
 import numpy as np
 import pandas as pd
+from pandas.api.indexers import BaseIndexer
 
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -144,26 +147,119 @@ MOMENTUM_BASE_FEATURES = [
     "match_weekday_index",
 ]
 
-
-def _trailing_sum_counts(dates: np.ndarray, weights: np.ndarray, window_days: int) -> np.ndarray:
-    """Return trailing-weighted counts over a time window excluding the current row."""
-
-    if dates.dtype != "datetime64[ns]":
-        dates = dates.astype("datetime64[ns]")
-
-    counts = np.zeros(len(dates), dtype=float)
-    left = 0
-    window = np.timedelta64(window_days, "D")
-
-    for idx, current in enumerate(dates):
-        window_start = current - window
-        while left < idx and dates[left] < window_start:
-            left += 1
-        if idx == 0:
-            counts[idx] = 0.0
-        else:
-            counts[idx] = float(weights[left:idx].sum())
-    return counts
+# Column groups recorded in the typed Parquet mirrors (`pipelines/typed_dataset.py`).
+FEATURE_GROUPS = {
+    "metadata": METADATA_COLUMNS,
+    "targets": TARGET_COLUMNS,
+    "performance": PERFORMANCE_FEATURES,
+    "momentum": MOMENTUM_INFERENCE_FEATURES + MOMENTUM_BASE_FEATURES,
+    "market": MARKET_FEATURES,
+}
+
+
+ROLLING_STATS = (
+    "points",
+    "goals_for",
+    "goals_against",
+    "goal_diff",
+    "xg_for",
+    "xg_against",
+    "xg_diff",
+)
+ROLLING_WINDOWS = (2, 3, 5, 8, 10)
+EXP_DECAY_STATS = ("points", "goal_diff", "xg_diff")
+EXP_DECAY_ALPHA = 0.5
+CONGESTION_WINDOWS_DAYS = (14,)
+
+
+class _TeamBlockWindow(BaseIndexer):
+    """Trailing windows of `window_size` rows that stop at the first row of each team block.
+
+    `block_start[i]` is the position of the first row of row i's team in a
+    table sorted by team. pandas restarts its running sum whenever a window
+    does not overlap the previous one, which happens at every block start, so
+    each team is summed exactly as a rolling sum over that team alone would be.
+    """
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.block_start).astype(np.int64)
+        return start, end
+
+
+def _team_blocks(team_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Stable order of rows by team and, in that order, where each row's team block starts."""
+
+    order = np.argsort(team_ids, kind="stable")
+    sorted_ids = team_ids[order]
+    positions = np.arange(len(order))
+    is_start = np.ones(len(order), dtype=bool)
+    is_start[1:] = sorted_ids[1:] != sorted_ids[:-1]
+    block_start = np.maximum.accumulate(np.where(is_start, positions, 0))
+    return order, block_start
+
+
+def _shift_within_blocks(values: np.ndarray, block_start: np.ndarray, periods: int = 1) -> np.ndarray:
+    """`values` lagged by `periods` rows within each team block, NaN where the lag leaves the block."""
+
+    source = np.arange(len(values)) - periods
+    valid = source >= block_start
+    shifted = np.full(len(values), np.nan)
+    shifted[valid] = values[source[valid]]
+    return shifted
+
+
+def _block_ids(block_start: np.ndarray) -> np.ndarray:
+    return np.cumsum(block_start == np.arange(len(block_start))) - 1
+
+
+def calendar_window_sums(
+    long_df: pd.DataFrame,
+    weights: Mapping[str, object],
+    window_days: Iterable[int] = CONGESTION_WINDOWS_DAYS,
+    time_col: str = "match_datetime_utc",
+    team_col: str = "team_id",
+) -> pd.DataFrame:
+    """Per-team sums of each weight over the `window_days` days before every match.
+
+    `weights` maps a name to a column name or a per-row array (`1` counts
+    matches, `1 - is_home` away matches, minutes played, ...). The result has
+    one column `<name>_last_<days>_days` per weight and window, aligned with
+    `long_df`. A window covers the team's earlier rows kicking off at most
+    `days` days before the current one; the current row and later rows at the
+    same kickoff are excluded; missing weights count as 0. Each team's rows
+    must be in chronological order.
+
+    Window starts come from one `searchsorted` over the (team, kickoff) keys and
+    sums from cumulative sums, so the cost is O(n log n) for any number of
+    windows and weights.
+    """
+
+    window_days = list(window_days)
+    team_ids = long_df[team_col].to_numpy()
+    order, block_start = _team_blocks(team_ids)
+    kickoffs = long_df[time_col].to_numpy(dtype="datetime64[ns]")[order].astype(np.int64)
+    starts = [kickoffs - np.int64(days) * 86_400 * 10**9 for days in window_days]
+
+    # Dense ranks keep (team block, kickoff) keys small enough to combine into one int64.
+    _, ranks = np.unique(np.concatenate([kickoffs, *starts]), return_inverse=True)
+    ranks = ranks.reshape(len(window_days) + 1, len(kickoffs))
+    stride = np.int64(ranks.max() + 1)
+    block_keys = _block_ids(block_start).astype(np.int64) * stride
+    keys = block_keys + ranks[0]
+    positions = np.arange(len(order))
+
+    inverse = np.empty_like(order)
+    inverse[order] = positions
+    sums: Dict[str, np.ndarray] = {}
+    for name, weight in weights.items():
+        values = long_df[weight] if isinstance(weight, str) else weight
+        values = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)[order]
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        for days, start_ranks in zip(window_days, ranks[1:]):
+            left = np.minimum(np.searchsorted(keys, block_keys + start_ranks, side="left"), positions)
+            sums[f"{name}_last_{days}_days"] = (cumulative[positions] - cumulative[left])[inverse]
+    return pd.DataFrame(sums, index=long_df.index)
 
 
 def load_v1() -> pd.DataFrame:
@@ -196,117 +292,68 @@ def load_v1() -> pd.DataFrame:
 
 
 def compute_team_view(matches: pd.DataFrame) -> pd.DataFrame:
-    """Transform match table into a long team-centric view with shifts."""
-
-    def outcome_points(code: str) -> tuple[int, int]:
-        if code == "H":
-            return 3, 0
-        if code == "A":
-            return 0, 3
-        return 1, 1
-
-    home_pts, away_pts = zip(*matches["match_outcome_code"].map(outcome_points))
-    matches = matches.assign(home_points=home_pts, away_points=away_pts)
-
-    home_cols = {
-        "home_team_id": "team_id",
-        "home_team_name": "team_name",
-        "home_points": "points",
-        "home_goals": "goals_for",
-        "away_goals": "goals_against",
-        "home_xg": "xg_for",
-        "away_xg": "xg_against",
-        "forecast_home_win": "win_prob",
-    }
-    away_cols = {
-        "away_team_id": "team_id",
-        "away_team_name": "team_name",
-        "away_points": "points",
-        "away_goals": "goals_for",
-        "home_goals": "goals_against",
-        "away_xg": "xg_for",
-        "home_xg": "xg_against",
-        "forecast_away_win": "win_prob",
-    }
+    """Transform match table into a long team-centric view with shifts.
 
-    home_df = matches[["match_id", "match_datetime_utc", "season", *home_cols.keys()]].rename(columns=home_cols)
-    home_df["is_home"] = 1
+    The reshape is `pipelines.team_ledger.team_rows`, shared with the
+    persisted team ledger.
+    """
 
-    away_df = matches[["match_id", "match_datetime_utc", "season", *away_cols.keys()]].rename(columns=away_cols)
-    away_df["is_home"] = 0
-
-    long_df = pd.concat([home_df, away_df], ignore_index=True).sort_values(
-        ["team_id", "match_datetime_utc"]
-    )
-    long_df["goal_diff"] = long_df["goals_for"] - long_df["goals_against"]
-    long_df["xg_diff"] = long_df["xg_for"] - long_df["xg_against"]
-    long_df["match_number"] = long_df.groupby("team_id").cumcount()
+    from pipelines.team_ledger import team_rows
 
-    long_df["rest_days"] = (
-        long_df.groupby("team_id")["match_datetime_utc"]
-        .diff()
-        .dt.total_seconds()
-        .div(86400)
-    )
-    return long_df.reset_index(drop=True)
+    return team_rows(matches)
 
 
 def add_rolling_features(long_df: pd.DataFrame) -> pd.DataFrame:
     """Attach pre-match rolling aggregates and calendar diagnostics."""
 
-    feature_cols = (
-        "points",
-        "goals_for",
-        "goals_against",
-        "goal_diff",
-        "xg_for",
-        "xg_against",
-        "xg_diff",
-    )
-    windows = (2, 3, 5, 8, 10)
-    grouped = long_df.groupby("team_id", group_keys=False)
-
-    for col in feature_cols:
-        for window in windows:
-            new_col = f"{col}_last_{window}"
-            long_df[new_col] = grouped[col].transform(
-                lambda s, w=window: s.shift().rolling(window=w, min_periods=1).sum()
-            )
-
-    long_df["rest_days_prev"] = grouped["rest_days"].transform(lambda s: s.shift())
+    # Every shifted per-team aggregate below comes from one stable sort by team
+    # rather than a Python-level pass over the groups per column.
+    team_ids = long_df["team_id"].to_numpy()
+    order, block_start = _team_blocks(team_ids)
+    positions = np.empty_like(order)
+    positions[order] = np.arange(len(order))
+
+    def lagged(col: str, periods: int = 1) -> np.ndarray:
+        values = long_df[col].to_numpy(dtype=float, na_value=np.nan)[order]
+        return _shift_within_blocks(values, block_start, periods)
+
+    shifted = pd.DataFrame({col: lagged(col) for col in ROLLING_STATS})
+    window_sums = {
+        window: shifted.rolling(_TeamBlockWindow(window_size=window, block_start=block_start), min_periods=1).sum()
+        for window in ROLLING_WINDOWS
+    }
+    for col in ROLLING_STATS:
+        for window in ROLLING_WINDOWS:
+            long_df[f"{col}_last_{window}"] = window_sums[window][col].to_numpy()[positions]
+
+    long_df["rest_days_prev"] = lagged("rest_days")[positions]
     long_df["rest_days_prev"] = long_df["rest_days_prev"].fillna(0)
     long_df["rest_days_capped"] = long_df["rest_days_prev"].clip(upper=28.0)
     long_df["rest_reset_flag"] = (long_df["rest_days_prev"] > 35).astype(int)
 
-    for window in windows:
+    for window in ROLLING_WINDOWS:
         denom = 3 * long_df["match_number"].clip(upper=window)
         denom = denom.replace(0, np.nan)
         long_df[f"points_pct_last_{window}"] = long_df[f"points_last_{window}"] / denom
 
-    decay_alpha = 0.5
-    long_df["points_exp_decay"] = grouped["points"].transform(
-        lambda s: s.shift().ewm(alpha=decay_alpha, adjust=False).mean()
-    )
-    long_df["goal_diff_exp_decay"] = grouped["goal_diff"].transform(
-        lambda s: s.shift().ewm(alpha=decay_alpha, adjust=False).mean()
+    decayed = (
+        shifted[list(EXP_DECAY_STATS)]
+        .groupby(block_start, sort=True)
+        .ewm(alpha=EXP_DECAY_ALPHA, adjust=False)
+        .mean()
+        .droplevel(0)
+        .sort_index()
     )
-    long_df["xg_diff_exp_decay"] = grouped["xg_diff"].transform(
-        lambda s: s.shift().ewm(alpha=decay_alpha, adjust=False).mean()
-    )
-
-    matches_last14 = []
-    away_matches_last14 = []
-    for _, group in grouped:
-        dates = group["match_datetime_utc"].to_numpy()
-        all_weights = np.ones(len(group), dtype=float)
-        away_weights = (1 - group["is_home"].to_numpy()).astype(float)
-        all_counts = _trailing_sum_counts(dates, all_weights, window_days=14)
-        away_counts = _trailing_sum_counts(dates, away_weights, window_days=14)
-        matches_last14.append(pd.Series(all_counts, index=group.index))
-        away_matches_last14.append(pd.Series(away_counts, index=group.index))
+    for col in EXP_DECAY_STATS:
+        long_df[f"{col}_exp_decay"] = decayed[col].to_numpy()[positions]
 
-    long_df["matches_last_14_days"] = pd.concat(matches_last14).sort_index()
-    long_df["away_matches_last_14_days"] = pd.concat(away_matches_last14).sort_index()
+    congestion = calendar_window_sums(
+        long_df,
+        {"matches": np.ones(len(long_df)), "away_matches": 1 - long_df["is_home"]},
+        CONGESTION_WINDOWS_DAYS,
+    )
+    long_df["matches_last_14_days"] = congestion["matches_last_14_days"].to_numpy()
+    long_df["away_matches_last_14_days"] = congestion["away_matches_last_14_days"].to_numpy()
     long_df["fixture_congestion_flag"] = (
         (long_df["matches_last_14_days"] >= 3) | (long_df["rest_days_prev"] <= 3)
     ).astype(int)
@@ -321,8 +368,8 @@ def add_rolling_features(long_df: pd.DataFrame) -> pd.DataFrame:
     )
     long_df["travel_rest_ratio"] = long_df["travel_rest_ratio"].fillna(0.0)
 
-    long_df["win_prob_prev"] = grouped["win_prob"].transform(lambda s: s.shift(1))
-    long_df["win_prob_prev2"] = grouped["win_prob"].transform(lambda s: s.shift(2))
+    long_df["win_prob_prev"] = lagged("win_prob", 1)[positions]
+    long_df["win_prob_prev2"] = lagged("win_prob", 2)[positions]
     long_df["win_prob_prev_delta"] = long_df["win_prob_prev"] - long_df["win_prob_prev2"]
 
     long_df.fillna(0, inplace=True)
@@ -660,6 +707,8 @@ def reorder_columns(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def main() -> None:
+    from pipelines.typed_dataset import write_typed_dataset
+
     matches_v1 = load_v1()
     long_df = compute_team_view(matches_v1)
     long_df = add_rolling_features(long_df)
@@ -672,6 +721,8 @@ def main() -> None:
     OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
     enriched.to_csv(OUTPUT_PATH, index=False)
     enriched.to_csv(PRIMARY_DATASET_PATH, index=False)
+    for path in (OUTPUT_PATH, PRIMARY_DATASET_PATH):
+        write_typed_dataset(path, FEATURE_GROUPS)
     print(
         "Saved version 2 dataset with "
         f"{len(enriched)} rows to {OUTPUT_PATH} and {PRIMARY_DATASET_PATH}"
@@ -679,4 +730,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    sys.path.insert(0, str(PROJECT_ROOT))  # `pipelines` when run as `python analysis/...`
     main()
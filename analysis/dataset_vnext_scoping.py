@@ -9,8 +9,9 @@ cleaning priorities.
 
 from __future__ import annotations
 
+import sys
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import Dict, Iterable
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -54,88 +55,12 @@ def load_matches() -> pd.DataFrame:
     return matches.sort_values("match_datetime")
 
 
-def outcome_points(code: str) -> Tuple[int, int]:
-    """Return home and away point allocation for the result code."""
-    if code == "H":
-        return 3, 0
-    if code == "A":
-        return 0, 3
-    return 1, 1
-
-
 def expand_team_view(matches: pd.DataFrame) -> pd.DataFrame:
     """Create a team-perspective table for rolling feature engineering."""
-    home_points, away_points = zip(*matches["match_outcome_code"].map(outcome_points))
-    matches = matches.assign(home_points=home_points, away_points=away_points)
-
-    home_df = matches[
-        [
-            "match_id",
-            "match_datetime",
-            "season",
-            "home_team_id",
-            "home_team_name",
-            "home_points",
-            "home_goals",
-            "away_goals",
-            "home_xg",
-            "away_xg",
-        ]
-    ].rename(
-        columns={
-            "home_team_id": "team_id",
-            "home_team_name": "team_name",
-            "home_points": "points",
-            "home_goals": "goals_for",
-            "away_goals": "goals_against",
-            "home_xg": "xg_for",
-            "away_xg": "xg_against",
-        }
-    )
-    home_df["is_home"] = 1
-
-    away_df = matches[
-        [
-            "match_id",
-            "match_datetime",
-            "season",
-            "away_team_id",
-            "away_team_name",
-            "away_points",
-            "away_goals",
-            "home_goals",
-            "away_xg",
-            "home_xg",
-        ]
-    ].rename(
-        columns={
-            "away_team_id": "team_id",
-            "away_team_name": "team_name",
-            "away_points": "points",
-            "away_goals": "goals_for",
-            "home_goals": "goals_against",
-            "away_xg": "xg_for",
-            "home_xg": "xg_against",
-        }
-    )
-    away_df["is_home"] = 0
+    from pipelines.team_ledger import SIDE_COLUMNS, team_rows
 
-    long_df = (
-        pd.concat([home_df, away_df], ignore_index=True)
-        .sort_values(["team_id", "match_datetime"])
-        .reset_index(drop=True)
-    )
-
-    long_df["goal_diff"] = long_df["goals_for"] - long_df["goals_against"]
-    long_df["xg_diff"] = long_df["xg_for"] - long_df["xg_against"]
-    long_df["match_number"] = long_df.groupby("team_id").cumcount()
-    long_df["rest_days"] = (
-        long_df.groupby("team_id")["match_datetime"]
-        .diff()
-        .dt.total_seconds()
-        .div(86400)
-    )
-    return long_df
+    sides = {name: columns for name, columns in SIDE_COLUMNS.items() if name != "win_prob"}
+    return team_rows(matches, time_col="match_datetime", sides=sides)
 
 
 def add_rolling_features(long_df: pd.DataFrame) -> pd.DataFrame:
@@ -456,4 +381,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    sys.path.insert(0, str(PROJECT_ROOT))  # `pipelines` when run as `python analysis/...`
     main()
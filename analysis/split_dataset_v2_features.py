@@ -11,6 +11,7 @@ Football Predictor notebook. Each output stores metadata columns
 
 from __future__ import annotations
 
+import sys
 from pathlib import Path
 from typing import Dict, List
 
@@ -27,7 +28,9 @@ def load_dataset() -> pd.DataFrame:
     if not DATA_PATH.exists():
         raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
 
-    df = pd.read_csv(DATA_PATH, parse_dates=["match_datetime_utc", "match_date"])
+    from pipelines.typed_dataset import load_dataset as load_typed_or_csv
+
+    df = load_typed_or_csv(DATA_PATH)  # the Parquet mirror when current; dates parsed either way
     if {"match_id", "match_outcome_code", "outcome_id"}.issubset(df.columns) is False:
         raise ValueError("Dataset missing required outcome columns.")
 
@@ -176,4 +179,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    sys.path.insert(0, str(PROJECT_ROOT))  # `pipelines` when run as `python analysis/...`
     main()
@@ -1,6 +1,5 @@
 import asyncio
 import aiohttp
-import ast
 import csv
 import re
 from pathlib import Path
@@ -9,29 +8,12 @@ from typing import Any, Dict, List, Optional, Tuple
 import pandas as pd
 from understat import Understat
 
+from pipelines.match_table import load_match_table, match_records
+
 BASE_DIR = Path("understat_data")
 MAX_CONCURRENCY = 6  # be nice to the API
 
 
-def safe_parse_dict(val: Any) -> Optional[Dict[str, Any]]:
-    """
-    Parse a dict-like string from CSV into a real dict.
-    Return None if parsing fails.
-    """
-    if isinstance(val, dict):
-        return val
-    if pd.isna(val):
-        return None
-    if isinstance(val, str):
-        val = val.strip()
-        # Normalize quotes if necessary (in case CSV quoted JSON differently)
-        try:
-            return ast.literal_eval(val)
-        except Exception:
-            return None
-    return None
-
-
 def to_float(x: Any) -> Optional[float]:
     try:
         if x is None or pd.isna(x):
@@ -89,32 +71,27 @@ def build_team_rows_for_season(
     season: int,
 ) -> List[Dict[str, Any]]:
     """
-    From team_results.csv (possibly nested fields), build a list of rows with
+    From the match table of team_results.csv, build a list of rows with
     team-centric columns ready to augment with shots.
     """
     rows: List[Dict[str, Any]] = []
 
-    # Filter out non-played matches if column exists
-    if "isResult" in df_results.columns:
-        df_results = df_results[df_results["isResult"].astype(str).str.lower() == "true"]
+    # Filter out non-played matches
+    df_results = df_results[df_results["is_result"]]
 
-    for _, row in df_results.iterrows():
-        match_id = to_int(row.get("id"))
+    for match in match_records(df_results):
+        match_id = match["match_id"]
         if match_id is None:
             continue
 
-        h_dict = safe_parse_dict(row.get("h"))
-        a_dict = safe_parse_dict(row.get("a"))
-        goals_dict = safe_parse_dict(row.get("goals"))
-        xg_dict = safe_parse_dict(row.get("xG"))
+        h_title = match["home_team_name"] or ""
+        a_title = match["away_team_name"] or ""
 
         # Figure out venue/side for this team
-        side = row.get("side")  # preferred if present
+        side = match.get("side")  # preferred if present
         if side not in ("h", "a"):
             # Infer it by comparing folder name with h/a title (case-insensitive, sanitized)
             team_folder_norm = sanitize_name(str(team_name_folder)).lower()
-            h_title = sanitize_name(str(h_dict.get("title"))) if h_dict else ""
-            a_title = sanitize_name(str(a_dict.get("title"))) if a_dict else ""
             if team_folder_norm == sanitize_name(h_title).lower():
                 side = "h"
             elif team_folder_norm == sanitize_name(a_title).lower():
@@ -123,35 +100,18 @@ def build_team_rows_for_season(
                 # Fallback: skip if cannot determine
                 continue
 
-        # Opponent
-        opponent_title = ""
+        # Opponent, goals and xG for/against
         if side == "h":
-            opponent_title = (a_dict or {}).get("title", "")
+            opponent_title = a_title
+            gf, ga = match["home_goals"], match["away_goals"]
+            xgf, xga = match["home_xg"], match["away_xg"]
         else:
-            opponent_title = (h_dict or {}).get("title", "")
-
-        # Goals for/against
-        gf = ga = None
-        if goals_dict:
-            if side == "h":
-                gf = to_int(goals_dict.get("h"))
-                ga = to_int(goals_dict.get("a"))
-            else:
-                gf = to_int(goals_dict.get("a"))
-                ga = to_int(goals_dict.get("h"))
-
-        # xG for/against
-        xgf = xga = None
-        if xg_dict:
-            if side == "h":
-                xgf = to_float(xg_dict.get("h"))
-                xga = to_float(xg_dict.get("a"))
-            else:
-                xgf = to_float(xg_dict.get("a"))
-                xga = to_float(xg_dict.get("h"))
+            opponent_title = h_title
+            gf, ga = match["away_goals"], match["home_goals"]
+            xgf, xga = match["away_xg"], match["home_xg"]
 
         # Result (derive if not provided)
-        result = row.get("result", None)
+        result = match.get("result")
         if not isinstance(result, str) and gf is not None and ga is not None:
             if gf > ga:
                 result = "w"
@@ -160,7 +120,7 @@ def build_team_rows_for_season(
             else:
                 result = "d"
 
-        date_str = row.get("datetime") or row.get("date") or ""
+        date_str = match["datetime"] or match.get("date") or ""
 
         rows.append(
             {
@@ -198,7 +158,7 @@ async def process_team_season(
         return None
 
     try:
-        df_results = pd.read_csv(results_path, low_memory=False)
+        df_results = load_match_table(results_path)
     except Exception:
         return None
 
@@ -1,9 +1,38 @@
+"""
+Davidson/World Football Elo ratings per league, from the team ledger.
+
+By default ratings are updated incrementally: the rating state (ratings,
+stats, last processed match and season) is kept next to the league's ledger
+as `<league>.elo.json`, only newly completed matches are applied, and their
+rows are appended to `team_elos_timeseries.csv`. That needs a time-anchored
+decay: a team's distance from START_ELO (the fixed rating every team
+starts at, not the current league mean) shrinks by
+`recency_weight(days since its previous match)` before each match, so no
+past update depends on matches played after it.
+
+`--full-recompute` keeps the original semantics for research runs: every
+K factor is scaled by the match's age relative to the most recent match in
+the league, which shifts the whole history whenever a match is added.
+
+Usage:
+    python getTeamEloV2.py [--leagues EPL ...] [--full-recompute]
+"""
+
+import argparse
+import hashlib
+import json
 import math
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
+from pipelines.team_ledger import LEDGER_ROOT, TeamLedger, update_team_ledger
+
 BASE_DIR = Path("understat_data")
 
 # Core parameters (tune per league for best accuracy)
@@ -69,232 +98,435 @@ def result_to_score(home_goals: int, away_goals: int) -> Tuple[float, float]:
     return 0.5, 0.5
 
 
-def load_matches_from_team_results_folder(folder: Path) -> pd.DataFrame:
+def load_matches_from_ledger(ledger: TeamLedger) -> pd.DataFrame:
     """
-    Read all team-centric CSVs and reconstruct one row per match:
-      match_id, date, season, home_team, away_team, home_goals, away_goals
+    One row per completed match of the league's team ledger, in (season, kickoff) order:
+      match_id, date, season, home_team, away_team, home_goals, away_goals, date_parsed
     """
-    csvs = list(folder.glob("*.csv"))
-    if not csvs:
-        return pd.DataFrame()
-    dfs = []
-    for f in csvs:
-        try:
-            df = pd.read_csv(f, low_memory=False)
-            dfs.append(df)
-        except Exception:
-            continue
-    if not dfs:
+    matches = ledger.matches().dropna(subset=["home_goals", "away_goals"])
+    if matches.empty:
         return pd.DataFrame()
-    all_teams = pd.concat(dfs, ignore_index=True, sort=False)
-    all_teams = all_teams[all_teams["match_id"].notna()]
-    all_teams = all_teams[all_teams["venue"].notna()]
+    return pd.DataFrame(
+        {
+            "match_id": matches["match_id"].astype(int),
+            "date": matches["match_datetime_utc"].dt.strftime("%Y-%m-%d %H:%M:%S").fillna(""),
+            "season": matches["season"],
+            "home_team": matches["home_team"],
+            "away_team": matches["away_team"],
+            "home_goals": matches["home_goals"].astype(int),
+            "away_goals": matches["away_goals"].astype(int),
+            "date_parsed": matches["match_datetime_utc"],
+        }
+    ).reset_index(drop=True)
+
+
+@dataclass
+class EloMatches:
+    """A league's matches as flat arrays, in processing order.
+
+    Teams are integer indices into `teams`, numbered by first appearance
+    (home before away), so indices `[0, seen_before[i])` are exactly the teams
+    holding a rating when match `i` is played.
+    """
 
-    matches = []
-    grouped = all_teams.groupby("match_id")
-    for match_id, g in grouped:
-        try:
-            home_row = g[g["venue"].astype(str).str.lower().isin(["home", "h"])].iloc[0]
-            away_row = g[g["venue"].astype(str).str.lower().isin(["away", "a"])].iloc[0]
-        except Exception:
-            if len(g) >= 2:
-                rows = g.to_dict("records")
-                home_row = None
-                away_row = None
-                for r in rows:
-                    v = str(r.get("venue", "")).strip().lower()
-                    if v == "home" and home_row is None:
-                        home_row = r
-                    elif v == "away" and away_row is None:
-                        away_row = r
-                if home_row is None or away_row is None:
-                    continue
-            else:
-                continue
-        try:
-            h_goals = int(home_row.get("goals_for"))
-            a_goals = int(away_row.get("goals_for"))
-        except Exception:
-            continue
-
-        date = home_row.get("date") or away_row.get("date") or ""
-        season = home_row.get("season") or away_row.get("season") or None
-
-        matches.append(
-            {
-                "match_id": int(match_id),
-                "date": date,
-                "season": int(season) if pd.notna(season) else None,
-                "home_team": home_row.get("team"),
-                "away_team": away_row.get("team"),
-                "home_goals": h_goals,
-                "away_goals": a_goals,
-            }
+    match_id: np.ndarray
+    date: np.ndarray
+    teams: List[str]
+    home: np.ndarray
+    away: np.ndarray
+    home_goals: np.ndarray
+    away_goals: np.ndarray
+    new_season: np.ndarray
+    seen_before: np.ndarray
+    recency: np.ndarray
+    kickoff_days: np.ndarray
+
+
+def elo_match_arrays(
+    df_matches: pd.DataFrame,
+    teams: Sequence[str] = (),
+    last_season: Optional[int] = None,
+    recency: bool = True,
+) -> EloMatches:
+    """Flatten `df_matches` for the rating loop.
+
+    `teams` and `last_season` continue an earlier run: known teams keep their
+    indices and a season change against `last_season` still triggers the
+    preseason regression. `recency=False` leaves every K weight at 1.
+    """
+
+    n = len(df_matches)
+    sides = np.empty(len(teams) + 2 * n, dtype=object)
+    sides[: len(teams)] = list(teams)
+    sides[len(teams) :: 2] = df_matches["home_team"].to_numpy()
+    sides[len(teams) + 1 :: 2] = df_matches["away_team"].to_numpy()
+    codes, names = pd.factorize(sides)
+    home, away = codes[len(teams) :: 2], codes[len(teams) + 1 :: 2]
+
+    # Preseason regression runs before the first match of every season after the first.
+    seasons = df_matches["season"]
+    previous = seasons.ffill().shift()
+    if last_season is not None:
+        previous = previous.fillna(last_season)
+    new_season = (seasons.notna() & previous.notna() & (seasons != previous)).to_numpy()
+    seen = np.maximum.accumulate(np.maximum(home, away)) + 1
+    seen_before = np.maximum(np.concatenate(([0], seen[:-1])), len(teams))
+
+    # Recency weights: age relative to the most recent match in this league. There are
+    # few distinct ages, so recency_weight runs once per age rather than once per match.
+    weights = np.ones(n)
+    dates = df_matches["date_parsed"]
+    ages = (dates.max() - dates).dt.days
+    dated = ages.notna().to_numpy()
+    if recency and dated.any():
+        unique_ages, inverse = np.unique(ages[dated].to_numpy(dtype=np.int64), return_inverse=True)
+        weights[dated] = np.array([recency_weight(int(age)) for age in unique_ages])[inverse]
+
+    return EloMatches(
+        match_id=df_matches["match_id"].to_numpy(),
+        date=df_matches["date"].to_numpy(),
+        teams=list(names),
+        home=home,
+        away=away,
+        home_goals=df_matches["home_goals"].to_numpy(dtype=np.int64),
+        away_goals=df_matches["away_goals"].to_numpy(dtype=np.int64),
+        new_season=new_season,
+        seen_before=seen_before,
+        recency=weights,
+        kickoff_days=((dates - pd.Timestamp(0)) / pd.Timedelta(days=1)).to_numpy(dtype=float, na_value=np.nan),
+    )
+
+
+def _rounded(values: np.ndarray, digits: int) -> List[float]:
+    # Python's round, not np.round: it is correctly rounded, so the CSVs keep their digits.
+    return [round(value, digits) for value in values.tolist()]
+
+
+def _home_scores(m: EloMatches) -> np.ndarray:
+    return np.where(m.home_goals > m.away_goals, 1.0, np.where(m.home_goals < m.away_goals, 0.0, 0.5))
+
+
+def _rate(
+    m: EloMatches,
+    s_home: np.ndarray,
+    elos: List[float],
+    last_played: Optional[List[Optional[float]]] = None,
+) -> pd.DataFrame:
+    """The sequential update over `m`, in place on `elos`; returns the timeseries rows.
+
+    With `last_played` (each team's previous kickoff, in days) ratings decay
+    toward START_ELO by the time since a team's previous match, and
+    `last_played` is advanced as matches are applied.
+    """
+
+    n = len(m.home)
+    gd = np.abs(m.home_goals - m.away_goals)
+
+    dr_pre = np.empty(n)
+    p_home = np.empty(n)
+    p_draw = np.empty(n)
+    p_away = np.empty(n)
+    k_eff = np.empty(n)
+    home_post = np.empty(n)
+    away_post = np.empty(n)
+
+    keep, pull = 1.0 - REGRESS_GAMMA, REGRESS_GAMMA
+    for i, (h, a, new_season, seen, s, goal_diff, rec, kickoff) in enumerate(
+        zip(
+            m.home.tolist(),
+            m.away.tolist(),
+            m.new_season.tolist(),
+            m.seen_before.tolist(),
+            s_home.tolist(),
+            gd.tolist(),
+            m.recency.tolist(),
+            m.kickoff_days.tolist(),
         )
+    ):
+        if new_season:
+            league_mean = sum(elos[:seen]) / seen
+            elos[:seen] = [keep * elo + pull * league_mean for elo in elos[:seen]]
+        if last_played is not None and not math.isnan(kickoff):
+            for team in (h, a):
+                if last_played[team] is not None:
+                    elos[team] = START_ELO + (elos[team] - START_ELO) * recency_weight(kickoff - last_played[team])
+                last_played[team] = kickoff
+
+        elo_home = elos[h]
+        elo_away = elos[a]
+        dr = (elo_home + HOME_ADVANTAGE) - elo_away
+        p_h, p_d, p_a = davidson_probs(dr)
+        k = K_BASE * mov_multiplier(goal_diff, dr) * rec
+        delta = k * (s - expected_score_2way(p_h, p_d))
+        elos[h] = elo_home + delta
+        elos[a] = elo_away - delta
+
+        dr_pre[i] = dr
+        p_home[i] = p_h
+        p_draw[i] = p_d
+        p_away[i] = p_a
+        k_eff[i] = k
+        home_post[i] = elos[h]
+        away_post[i] = elos[a]
+
+    names = np.asarray(m.teams, dtype=object)
+    return pd.DataFrame(
+        {
+            "match_id": m.match_id,
+            "date": m.date,
+            "home_team": names[m.home],
+            "away_team": names[m.away],
+            "home_goals": m.home_goals,
+            "away_goals": m.away_goals,
+            "dr_pre": _rounded(dr_pre, 2),
+            "p_home": _rounded(p_home, 4),
+            "p_draw": _rounded(p_draw, 4),
+            "p_away": _rounded(p_away, 4),
+            "k_eff": _rounded(k_eff, 3),
+            "home_elo_post": _rounded(home_post, 2),
+            "away_elo_post": _rounded(away_post, 2),
+        }
+    )
+
+
+def _match_stats(m: EloMatches, s_home: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(wins, draws, losses) per team index over the matches in `m`."""
+
+    n_teams = len(m.teams)
+    home_win, away_win, draw = s_home == 1.0, s_home == 0.0, s_home == 0.5
+    wins = np.bincount(m.home[home_win], minlength=n_teams) + np.bincount(m.away[away_win], minlength=n_teams)
+    draws = np.bincount(m.home[draw], minlength=n_teams) + np.bincount(m.away[draw], minlength=n_teams)
+    losses = np.bincount(m.home[away_win], minlength=n_teams) + np.bincount(m.away[home_win], minlength=n_teams)
+    return wins, draws, losses
+
+
+def _elo_table(teams: Sequence[str], elos: Sequence[float], wins, draws, losses) -> pd.DataFrame:
+    """The team_elos_v2.csv layout: highest rating first, ties in first-appearance order."""
+
+    final = np.array(elos, dtype=float)
+    wins, draws, losses = (np.asarray(values, dtype=np.int64) for values in (wins, draws, losses))
+    order = np.argsort(-final, kind="stable")
+    return pd.DataFrame(
+        {
+            "team": np.asarray(teams, dtype=object)[order],
+            "final_elo": _rounded(final[order], 2),
+            "played": (wins + draws + losses)[order],
+            "wins": wins[order],
+            "draws": draws[order],
+            "losses": losses[order],
+        }
+    )
+
+
+def run_elo(df_matches: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Rate a league's matches in order; returns (team_elos_v2 table, timeseries).
+
+    Full recompute with K weights relative to the league's most recent match.
+    """
 
-    if not matches:
-        return pd.DataFrame()
+    m = elo_match_arrays(df_matches)
+    s_home = _home_scores(m)
+    elos = [float(START_ELO)] * len(m.teams)
+    timeseries = _rate(m, s_home, elos)
+    return _elo_table(m.teams, elos, *_match_stats(m, s_home)), timeseries
 
-    df_matches = pd.DataFrame(matches)
-    df_matches["date_parsed"] = pd.to_datetime(df_matches["date"], errors="coerce")
-    df_matches = df_matches.sort_values(["season", "date_parsed"]).reset_index(drop=True)
-    return df_matches
 
+def elo_params() -> Dict[str, object]:
+    return {
+        "start_elo": START_ELO,
+        "k_base": K_BASE,
+        "scale": SCALE,
+        "home_advantage": HOME_ADVANTAGE,
+        "half_life_days": HALF_LIFE_DAYS,
+        "draw_nu": DRAW_NU,
+        "regress_gamma": REGRESS_GAMMA,
+        "mov_cap": MOV_CAP,
+    }
 
-def compute_elos_for_league(league_dir: Path) -> None:
-    team_results_dir = league_dir / "Team_Results"
-    if not team_results_dir.exists():
-        print(f"  Skip {league_dir.name}: {team_results_dir} missing")
-        return
 
-    df_matches = load_matches_from_team_results_folder(team_results_dir)
-    if df_matches.empty:
-        print(f"  No matches for {league_dir.name}")
-        return
+def matches_digest(df_matches: pd.DataFrame) -> str:
+    """sha256 of the (match_id, home_goals, away_goals) sequence."""
 
-    # For recency weights: age relative to the most recent match in this league
-    max_date = df_matches["date_parsed"].max()
-    # Elo state and stats
-    elos: Dict[str, float] = {}
-    stats: Dict[str, Dict[str, int]] = {}
-
-    def ensure(team: str):
-        if team not in elos:
-            elos[team] = START_ELO
-            stats[team] = {"played": 0, "wins": 0, "draws": 0, "losses": 0}
-
-    timeseries: List[Dict] = []
-    last_season = None
-
-    for _, m in df_matches.iterrows():
-        season = m["season"]
-        # Apply preseason regression when season changes (after the first season)
-        if pd.notna(season) and last_season is not None and season != last_season and len(elos) > 0:
-            league_mean = sum(elos.values()) / len(elos)
-            for t in list(elos.keys()):
-                elos[t] = (1.0 - REGRESS_GAMMA) * elos[t] + REGRESS_GAMMA * league_mean
-
-        last_season = season if pd.notna(season) else last_season
-
-        home = m["home_team"]
-        away = m["away_team"]
-        h_goals = int(m["home_goals"])
-        a_goals = int(m["away_goals"])
-        match_id = int(m["match_id"])
-        date = m.get("date", "")
-        date_parsed = m.get("date_parsed", pd.NaT)
-
-        ensure(home)
-        ensure(away)
-
-        elo_home = elos[home]
-        elo_away = elos[away]
-
-        # Rating diff with home advantage
-        dr = (elo_home + HOME_ADVANTAGE) - elo_away
+    keys = df_matches[["match_id", "home_goals", "away_goals"]].to_numpy(dtype=np.int64)
+    return hashlib.sha256(np.ascontiguousarray(keys).tobytes()).hexdigest()
 
-        # 3-way expectations
-        p_h, p_d, p_a = davidson_probs(dr)
-        e2 = expected_score_2way(p_h, p_d)  # expected 2-way score for update
-
-        # Actual scores
-        s_home, s_away = result_to_score(h_goals, a_goals)
-
-        # Multipliers
-        gd = abs(h_goals - a_goals)
-        mov = mov_multiplier(gd, dr)
-        # recency weight by age of match relative to max_date
-        if isinstance(date_parsed, pd.Timestamp) and pd.notna(date_parsed) and isinstance(max_date, pd.Timestamp):
-            delta_days = (max_date - date_parsed).days
-            rec = recency_weight(delta_days)
-        else:
-            rec = 1.0
-
-        k_eff = K_BASE * mov * rec
-
-        # Update using 2-way expectation derived from 3-way probs
-        delta = k_eff * (s_home - e2)
-        elos[home] = elo_home + delta
-        elos[away] = elo_away - delta
-
-        # Stats
-        stats[home]["played"] += 1
-        stats[away]["played"] += 1
-        if s_home == 1.0:
-            stats[home]["wins"] += 1
-            stats[away]["losses"] += 1
-        elif s_away == 1.0:
-            stats[away]["wins"] += 1
-            stats[home]["losses"] += 1
-        else:
-            stats[home]["draws"] += 1
-            stats[away]["draws"] += 1
-
-        timeseries.append(
-            {
-                "match_id": match_id,
-                "date": date,
-                "home_team": home,
-                "away_team": away,
-                "home_goals": h_goals,
-                "away_goals": a_goals,
-                "dr_pre": round(dr, 2),
-                "p_home": round(p_h, 4),
-                "p_draw": round(p_d, 4),
-                "p_away": round(p_a, 4),
-                "k_eff": round(k_eff, 3),
-                "home_elo_post": round(elos[home], 2),
-                "away_elo_post": round(elos[away], 2),
-            }
-        )
 
-    # Final table
-    rows = []
-    for team, elo in sorted(elos.items(), key=lambda kv: kv[1], reverse=True):
-        s = stats[team]
-        rows.append(
-            {
-                "team": team,
-                "final_elo": round(elo, 2),
-                "played": s["played"],
-                "wins": s["wins"],
-                "draws": s["draws"],
-                "losses": s["losses"],
-            }
+@dataclass
+class EloState:
+    """Everything the time-anchored update needs to resume after `matches` matches.
+
+    Saved as `<league>.elo.json` next to the league's ledger pickle. Ratings
+    and kickoffs (days since the epoch) round-trip exactly through JSON.
+    `timeseries_bytes` is the size of the timeseries CSV it last wrote, so a
+    CSV rewritten by anything else is not appended to.
+    """
+
+    teams: List[str] = field(default_factory=list)
+    ratings: List[float] = field(default_factory=list)
+    last_played: List[Optional[float]] = field(default_factory=list)
+    wins: List[int] = field(default_factory=list)
+    draws: List[int] = field(default_factory=list)
+    losses: List[int] = field(default_factory=list)
+    last_season: Optional[int] = None
+    last_match_id: Optional[int] = None
+    matches: int = 0
+    digest: str = ""
+    timeseries_bytes: int = 0
+    params: Dict[str, object] = field(default_factory=elo_params)
+
+    @staticmethod
+    def path(league: str, ledger_root: Path = LEDGER_ROOT) -> Path:
+        return TeamLedger.path(league, ledger_root).with_suffix(".elo.json")
+
+    @classmethod
+    def load(cls, league: str, ledger_root: Path = LEDGER_ROOT) -> Optional["EloState"]:
+        path = cls.path(league, ledger_root)
+        if not path.exists():
+            return None
+        return cls(**json.loads(path.read_text()))
+
+    def save(self, league: str, ledger_root: Path = LEDGER_ROOT) -> Path:
+        path = self.path(league, ledger_root)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as fh:
+            json.dump(asdict(self), fh)
+        os.replace(fh.name, path)
+        return path
+
+    def resumes(self, df_matches: pd.DataFrame) -> bool:
+        """True when `df_matches` starts with exactly the matches this state has applied."""
+
+        return (
+            self.params == elo_params()
+            and len(df_matches) >= self.matches
+            and matches_digest(df_matches.iloc[: self.matches]) == self.digest
         )
 
-    out_elos = pd.DataFrame(rows)
+    def table(self) -> pd.DataFrame:
+        return _elo_table(self.teams, self.ratings, self.wins, self.draws, self.losses)
+
+
+def update_elo(df_matches: pd.DataFrame, state: Optional[EloState] = None) -> Tuple[EloState, pd.DataFrame, bool]:
+    """Apply the matches of `df_matches` that `state` has not seen, with time-anchored decay.
+
+    Returns (new state, timeseries rows of the applied matches, resumed).
+    When `state` is missing or does not match the start of `df_matches`
+    (edited or back-dated results, changed parameters), every match is
+    applied from scratch and `resumed` is False.
+    """
+
+    resumed = state is not None and state.resumes(df_matches)
+    if not resumed:
+        state = EloState()
+    new = df_matches.iloc[state.matches :]
+    if new.empty:
+        return state, pd.DataFrame(), resumed
+
+    m = elo_match_arrays(new, state.teams, state.last_season, recency=False)
+    added = len(m.teams) - len(state.teams)
+    ratings = state.ratings + [float(START_ELO)] * added
+    last_played = state.last_played + [None] * added
+    s_home = _home_scores(m)
+    timeseries = _rate(m, s_home, ratings, last_played)
+    wins, draws, losses = (
+        np.asarray(old + [0] * added, dtype=np.int64) + new_counts
+        for old, new_counts in zip((state.wins, state.draws, state.losses), _match_stats(m, s_home))
+    )
+    seasons = new["season"].dropna()
+    state = EloState(
+        teams=m.teams,
+        ratings=ratings,
+        last_played=last_played,
+        wins=wins.tolist(),
+        draws=draws.tolist(),
+        losses=losses.tolist(),
+        last_season=int(seasons.iloc[-1]) if len(seasons) else state.last_season,
+        last_match_id=int(new["match_id"].iloc[-1]),
+        matches=len(df_matches),
+        digest=matches_digest(df_matches),
+    )
+    return state, timeseries, resumed
+
+
+def compute_elos_for_league(league_dir: Path, ledger_root: Path = LEDGER_ROOT, full_recompute: bool = False) -> None:
+    league = league_dir.name
+    team_results_dir = league_dir / "Team_Results"
+    ledger = TeamLedger.load(league, ledger_root)
+    if not len(ledger):
+        # No ledger saved by transformTeamData.py yet: build it from the league's season files.
+        try:
+            ledger, _ = update_team_ledger(league, league_dir.parent, ledger_root)
+        except FileNotFoundError as exc:
+            print(f"  Skip {league}: {exc}")
+            return
+
+    df_matches = load_matches_from_ledger(ledger)
+    if df_matches.empty:
+        print(f"  No matches for {league}")
+        return
 
-    # Export as team_elos_v2.csv
     out_elos_path = league_dir / "team_elos_v2.csv"
+    ts_out_path = team_results_dir / "team_elos_timeseries.csv"
+    team_results_dir.mkdir(parents=True, exist_ok=True)
+    if full_recompute:
+        out_elos, ts_df = run_elo(df_matches)
+        ts_df.to_csv(ts_out_path, index=False)
+        # These ratings cannot be continued incrementally; the next default run starts over.
+        EloState.path(league, ledger_root).unlink(missing_ok=True)
+        note = "full recompute"
+    else:
+        state = EloState.load(league, ledger_root)
+        if state is not None and (not ts_out_path.exists() or ts_out_path.stat().st_size != state.timeseries_bytes):
+            state = None
+        state, ts_df, resumed = update_elo(df_matches, state)
+        if resumed:
+            if len(ts_df):
+                ts_df.to_csv(ts_out_path, mode="a", header=False, index=False)
+            note = f"+{len(ts_df)} matches"
+        else:
+            ts_df.to_csv(ts_out_path, index=False)
+            note = f"rebuilt from {len(ts_df)} matches"
+        state.timeseries_bytes = ts_out_path.stat().st_size
+        state.save(league, ledger_root)
+        out_elos = state.table()
     out_elos.to_csv(out_elos_path, index=False)
 
-    # timeseries unchanged
-    ts_df = pd.DataFrame(timeseries)
-    ts_out_path = team_results_dir / "team_elos_timeseries.csv"
-    ts_df.to_csv(ts_out_path, index=False)
+    # Pre/post-match ratings per team row, for the builders and FeatureStore
+    if len(ts_df):
+        ledger.attach_elo(ts_df)
+        ledger.save(ledger_root)
+
+    print(f"  Wrote {out_elos_path} ({len(out_elos)} teams, {note})")
+
 
-    print(f"  Wrote {out_elos_path} ({len(rows)} teams)")
-    
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compute V2 Elo ratings per league")
+    parser.add_argument("--leagues", nargs="+", default=["Bundesliga", "EPL", "La_liga", "Ligue_1", "Serie_A"])
+    parser.add_argument(
+        "--full-recompute",
+        action="store_true",
+        help="Rerate the whole history with K weights relative to the latest match (original semantics)",
+    )
+    parser.add_argument("--ledger-root", type=Path, default=LEDGER_ROOT)
+    return parser.parse_args(argv)
 
-def main():
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
     if not BASE_DIR.exists():
         print("understat_data not found")
         return
-    
-    # Only process the main football leagues
-    target_leagues = ["Bundesliga", "EPL", "La_liga", "Ligue_1", "Serie_A"]
-    
+
     print("Computing Elo for leagues...")
-    for league_name in target_leagues:
+    for league_name in args.leagues:
         league_dir = BASE_DIR / league_name
         if league_dir.exists() and league_dir.is_dir():
             print(f"Processing {league_name}")
-            compute_elos_for_league(league_dir)
+            compute_elos_for_league(league_dir, args.ledger_root, args.full_recompute)
         else:
             print(f"  Skip {league_name}: directory not found")
     print("Done.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,117 @@
+"""Synthetic Understat-style leagues for benchmarks and tests.
+
+`write_synthetic_league` lays out any number of seasons the way the scraped
+exports are stored, so the streaming, ledger and Elo paths can be exercised
+on more history than the real data holds. `scripts/bench_dataset_build.py`
+and the tests both import it from here.
+"""
+
+from __future__ import annotations
+
+import csv
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+
+def _write_rows(path: Path, rows: List[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_synthetic_league(
+    base_dir: Path,
+    league: str = "Synthetic",
+    seasons: int = 20,
+    teams: int = 20,
+    first_season: int = 2000,
+    seed: int = 7,
+) -> None:
+    """A double round-robin league laid out like the Understat exports under `base_dir/league`.
+
+    Writes `<season>/league_results.csv`, `Team_Results/team_results.csv`,
+    `Team_Results/team_elos_timeseries.csv` and `team_elos_v2.csv`. Every round
+    is split over three kickoff times, so matches share kickoffs as in real data.
+    """
+
+    rng = np.random.default_rng(seed)
+    names = [f"Club {idx:02d}" for idx in range(teams)]
+    strength = rng.normal(0.0, 0.4, size=teams)
+    elo = {name: 1500.0 for name in names}
+    record = {name: [0, 0, 0] for name in names}
+    shots, elo_rows = [], []
+    match_id = 100000
+    # Circle-method pairings, mirrored for the second half of the season.
+    rotation = list(range(teams))
+    rounds = []
+    for _ in range(teams - 1):
+        rounds.append([(rotation[idx], rotation[teams - 1 - idx]) for idx in range(teams // 2)])
+        rotation = [rotation[0], rotation[-1], *rotation[1:-1]]
+    rounds += [[(away, home) for home, away in pairs] for pairs in rounds]
+    for season in range(first_season, first_season + seasons):
+        results = []
+        start = datetime(season, 8, 10)
+        for round_idx, pairs in enumerate(rounds):
+            for pair_idx, (home_idx, away_idx) in enumerate(pairs):
+                home, away = names[home_idx], names[away_idx]
+                kickoff = start + timedelta(days=7 * round_idx, hours=12 + 3 * (pair_idx % 3))
+                home_xg = float(np.exp(0.2 + strength[home_idx] - strength[away_idx]) * rng.uniform(0.4, 1.6))
+                away_xg = float(np.exp(strength[away_idx] - strength[home_idx]) * rng.uniform(0.4, 1.6))
+                home_goals, away_goals = int(rng.poisson(home_xg)), int(rng.poisson(away_xg))
+                p_home = 1.0 / (1.0 + 10 ** ((elo[away] - elo[home] - 60.0) / 400.0))
+                p_draw = 0.25
+                win = round(max(0.01, p_home - p_draw / 2), 4)
+                loss = round(max(0.01, 1.0 - win - p_draw), 4)
+                results.append(
+                    {
+                        "id": str(match_id),
+                        "isResult": "True",
+                        "h": f"{{'id': '{home_idx + 1}', 'title': '{home}', 'short_title': 'C{home_idx:02d}'}}",
+                        "a": f"{{'id': '{away_idx + 1}', 'title': '{away}', 'short_title': 'C{away_idx:02d}'}}",
+                        "goals": f"{{'h': '{home_goals}', 'a': '{away_goals}'}}",
+                        "xG": f"{{'h': '{home_xg:.6f}', 'a': '{away_xg:.6f}'}}",
+                        "datetime": kickoff.strftime("%Y-%m-%d %H:%M:%S"),
+                        "forecast": f"{{'w': '{win}', 'd': '{p_draw}', 'l': '{loss}'}}",
+                    }
+                )
+                home_shots, away_shots = int(rng.poisson(4 + 5 * home_xg)), int(rng.poisson(4 + 5 * away_xg))
+                shots.append({"match_id": match_id, "team": home, "shots_for": home_shots, "shots_against": away_shots})
+                shots.append({"match_id": match_id, "team": away, "shots_for": away_shots, "shots_against": home_shots})
+                actual = 1.0 if home_goals > away_goals else 0.0 if home_goals < away_goals else 0.5
+                k_eff = 20.0
+                delta = k_eff * (actual - (p_home + 0.5 * 0.0))
+                elo[home] += delta
+                elo[away] -= delta
+                elo_rows.append(
+                    {
+                        "match_id": match_id,
+                        "date": kickoff.strftime("%Y-%m-%d %H:%M:%S"),
+                        "home_team": home,
+                        "away_team": away,
+                        "home_goals": home_goals,
+                        "away_goals": away_goals,
+                        "p_home": round(p_home, 6),
+                        "p_draw": 0.0,
+                        "k_eff": k_eff,
+                        "home_elo_post": round(elo[home], 2),
+                        "away_elo_post": round(elo[away], 2),
+                    }
+                )
+                for name, outcome in ((home, actual), (away, 1.0 - actual)):
+                    record[name][0 if outcome == 1.0 else 1 if outcome == 0.5 else 2] += 1
+                match_id += 1
+        _write_rows(base_dir / league / str(season) / "league_results.csv", results)
+    _write_rows(base_dir / league / "Team_Results" / "team_results.csv", shots)
+    _write_rows(base_dir / league / "Team_Results" / "team_elos_timeseries.csv", elo_rows)
+    _write_rows(
+        base_dir / league / "team_elos_v2.csv",
+        [
+            {"team": name, "final_elo": round(elo[name], 2), "played": sum(counts), "wins": counts[0], "draws": counts[1], "losses": counts[2]}
+            for name, counts in record.items()
+        ],
+    )
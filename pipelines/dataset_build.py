@@ -0,0 +1,1363 @@
+"""Stage-cached build engine behind the Dataset_Version_N builders.
+
+`build_dataset_version{3,4,5,7}.py` each re-ran the whole chain: parse the
+Understat league results, run the `league_v2` rolling features, join shots,
+reconstruct Elo and compute volatility. Here the chain is a set of named
+`Stage`s with declared inputs. A stage's output is pickled under
+`understat_data/stage_cache/<stage>/<key>.pkl`, where the key hashes the stage's
+code, parameters, source files and upstream keys. A build reuses every stage
+whose key is unchanged: after a new matchday only stages downstream of the
+changed files rerun, and adding a late-stage feature reruns only that stage.
+
+Recipes:
+
+- v3: `Dataset.csv` + shot counts + Elo columns read straight from the timeseries.
+- v4: v3 + per-team Elo summary standings (pre-match Elo reconstructed from post).
+- v5: base table rebuilt from `<league>/<season>/league_results.csv` through
+  `analysis.build_league_results_v2`, then shots, Elo, summary, Elo gaps with
+  season z-scores and the clipped market-vs-Elo edge.
+- v7: v5 sorted chronologically, plus rolling volatility / decay diagnostics.
+
+v5 and v7 can also be built for several leagues at once (`build_leagues`):
+each league runs in its own worker process and lands in
+`Dataset_Version_N_leagues/league=<league>/`, next to the concatenated table.
+
+Usage:
+    python -m pipelines.dataset_build 7
+    python -m pipelines.dataset_build 5 --output /tmp/v5.csv --no-cache
+    python -m pipelines.dataset_build 7 --leagues all --jobs 4
+    python -m pipelines.dataset_build 7 --stream --league Serie_A   # see pipelines/dataset_stream.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import math
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from types import CodeType, ModuleType
+from typing import AbstractSet, Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from analysis import build_league_results_v2 as league_v2
+from pipelines import match_table, team_ledger
+from pipelines.frame_snapshot import file_digest
+from pipelines.typed_dataset import write_typed_dataset
+
+LOGGER = logging.getLogger(__name__)
+
+BASE_DIR = Path("understat_data")
+STAGE_CACHE_ROOT = BASE_DIR / "stage_cache"
+MATCH_TABLE_DIRNAME = "match_tables"
+LEDGER_DIRNAME = "team_ledger"
+SOURCE_DATASET_NAME = "Dataset.csv"
+OUTPUT_TEMPLATE = "Dataset_Version_{version}.csv"
+PARTITIONED_OUTPUT_TEMPLATE = "Dataset_Version_{version}_leagues"
+PARTITION_TEMPLATE = "league={league}"
+TARGET_LEAGUE = "EPL"
+VOLATILITY_WINDOW = 5
+EXP_DECAY_ALPHA = 0.55
+STAGE_CACHE_KEEP = 16
+
+TEAM_RESULTS_SUBPATH = Path("Team_Results") / "team_results.csv"
+TEAM_ELO_TIMESERIES_SUBPATH = Path("Team_Results") / "team_elos_timeseries.csv"
+TEAM_ELO_SUMMARY_FILENAME = "team_elos_v2.csv"
+
+ShotsKey = Tuple[str, str, str]  # (league, match_id, team_name)
+EloKey = Tuple[str, str]  # (league, match_id)
+SummaryKey = Tuple[str, str]  # (league, team_name)
+Rows = List[Dict[str, object]]
+Columns = List[Dict[str, str]]
+
+SHOT_COLUMNS = ["home_shots_for", "away_shots_for"]
+ELO_COLUMNS = ["elo_home_pre", "elo_away_pre", "elo_home_expectation"]
+SUMMARY_COLUMNS = [
+    f"{side}_{name}"
+    for side in ("home", "away")
+    for name in (
+        "elo_final",
+        "elo_matches_played",
+        "elo_wins",
+        "elo_draws",
+        "elo_losses",
+        "elo_points_pct",
+    )
+]
+ELO_GAP_COLUMNS = [
+    "elo_gap_pre",
+    "elo_expectation_gap",
+    "elo_gap_pre_season_z",
+    "elo_expectation_gap_season_z",
+    "market_vs_elo_edge",
+]
+VOLATILITY_METRICS = ("goal", "xg", "shot")
+VOLATILITY_COLUMNS = [
+    column
+    for metric in VOLATILITY_METRICS
+    for column in (
+        f"home_{metric}_diff_std5",
+        f"away_{metric}_diff_std5",
+        f"{metric}_diff_std_gap5",
+        f"home_{metric}_diff_exp_decay",
+        f"away_{metric}_diff_exp_decay",
+        f"{metric}_diff_exp_decay_gap",
+    )
+]
+
+
+# Column groups recorded in the typed Parquet mirror, after the base table's own.
+FEATURE_GROUPS: Dict[str, List[str]] = {
+    "shots": SHOT_COLUMNS,
+    "elo": ELO_COLUMNS + ["elo_mean_pre"],
+    "elo_summary": SUMMARY_COLUMNS,
+    "elo_gaps": ELO_GAP_COLUMNS,
+    "volatility": VOLATILITY_COLUMNS,
+}
+
+
+# --------------------------------------------------------------------------- engine
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One named build step computing `func(*upstream outputs, **params)`.
+
+    `sources` are files whose contents feed the key. The stage's code is the
+    source of `func` and of every function, class and constant of its module
+    that `func` reaches by name (`_reachable_digest`), plus the functions or
+    modules outside it listed in `code`. Bump `version` when behaviour changes
+    in a way the hashed source misses.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    params: Mapping[str, Any] = field(default_factory=dict)
+    sources: Tuple[Path, ...] = ()
+    code: Tuple[Union[Callable[..., Any], ModuleType], ...] = ()
+    version: int = 1
+    cache: bool = True
+
+
+@dataclass
+class StageRun:
+    name: str
+    key: str
+    status: str  # "cached", "built" or "uncached"
+    seconds: float
+
+
+# Module-level values whose repr is their content, hashed when a stage reaches them.
+_CONSTANT_TYPES = (bool, int, float, str, bytes, tuple, list, dict, Path)
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(obj: Union[Callable[..., Any], ModuleType]) -> str:
+    return hashlib.sha256(inspect.getsource(obj).encode("utf-8")).hexdigest()
+
+
+def _code_objects(code: CodeType) -> List[CodeType]:
+    """`code` and the code of the functions, lambdas and comprehensions nested in it."""
+
+    nested = [const for const in code.co_consts if isinstance(const, CodeType)]
+    return [code, *(inner for const in nested for inner in _code_objects(const))]
+
+
+@functools.lru_cache(maxsize=None)
+def _reachable_digest(func: Callable[..., Any]) -> str:
+    """Hash of `func` plus every function, class and constant of its module it reaches by name.
+
+    Globals are followed through `co_names` transitively, so editing a helper
+    changes the keys of the stages that call it and of no other stage.
+    Attribute names share `co_names` with globals, which can only add a
+    definition to the hash, never miss one.
+    """
+
+    namespace = func.__globals__
+    pending: List[Any] = [func]
+    seen = {func.__name__}
+    parts: List[str] = []
+    while pending:
+        obj = pending.pop()
+        parts.append(inspect.getsource(obj))
+        members = vars(obj).values() if inspect.isclass(obj) else (obj,)
+        codes = [code for member in members if inspect.isfunction(member) for code in _code_objects(member.__code__)]
+        for name in (name for code in codes for name in code.co_names):
+            if name in seen or name not in namespace:
+                continue
+            seen.add(name)
+            value = inspect.unwrap(namespace[name]) if callable(namespace[name]) else namespace[name]
+            if inspect.isfunction(value) or inspect.isclass(value):
+                if value.__module__ == func.__module__:
+                    pending.append(value)
+            elif isinstance(value, (set, frozenset)):
+                parts.append(f"{name} = {sorted(map(repr, value))}")  # set order varies per process
+            elif isinstance(value, _CONSTANT_TYPES):
+                parts.append(f"{name} = {value!r}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def stage_key(stage: Stage, upstream: Mapping[str, str]) -> str:
+    """Hash of everything a stage's output depends on."""
+
+    payload = json.dumps(
+        {
+            "stage": stage.name,
+            "version": stage.version,
+            "code": [_reachable_digest(stage.func), *(_source_digest(obj) for obj in stage.code)],
+            "params": dict(stage.params),
+            "inputs": [upstream[name] for name in stage.inputs],
+            "sources": {str(path): file_digest(path) for path in stage.sources},
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+
+
+class StageCache:
+    """Pickled stage outputs, newest `keep` per stage."""
+
+    def __init__(self, root: Path = STAGE_CACHE_ROOT, keep: int = STAGE_CACHE_KEEP):
+        self.root = Path(root)
+        self.keep = keep
+
+    def path(self, name: str, key: str) -> Path:
+        return self.root / name / f"{key}.pkl"
+
+    def load(self, name: str, key: str) -> Tuple[bool, Any]:
+        path = self.path(name, key)
+        try:
+            with path.open("rb") as fh:
+                value = pickle.load(fh)
+        except FileNotFoundError:
+            return False, None
+        except Exception as exc:  # truncated or written by an incompatible version
+            LOGGER.warning("Ignoring unreadable stage cache %s: %s", path, exc)
+            return False, None
+        try:
+            os.utime(path)  # keep recently used entries out of pruning
+        except FileNotFoundError:  # pruned by a concurrent build since it was read
+            pass
+        return True, value
+
+    def store(self, name: str, key: str, value: Any) -> None:
+        path = self.path(name, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=path.parent, suffix=".tmp", delete=False) as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fh.name, path)
+        # build_leagues workers share this directory, so entries can vanish between glob and stat.
+        entries = []
+        for entry in path.parent.glob("*.pkl"):
+            try:
+                entries.append((entry.stat().st_mtime_ns, entry))
+            except FileNotFoundError:
+                continue
+        entries.sort(key=lambda item: item[0], reverse=True)
+        for _, stale in entries[self.keep :]:
+            stale.unlink(missing_ok=True)
+
+
+class BuildEngine:
+    """Resolves stages in dependency order, reusing cached outputs by key."""
+
+    def __init__(self, stages: Mapping[str, Stage], cache: Optional[StageCache] = None):
+        self.stages = dict(stages)
+        self.cache = cache
+        self.runs: List[StageRun] = []
+        self._keys: Dict[str, str] = {}
+        self._outputs: Dict[str, Any] = {}
+
+    def key(self, name: str) -> str:
+        if name not in self._keys:
+            stage = self.stages[name]
+            self._keys[name] = stage_key(stage, {upstream: self.key(upstream) for upstream in stage.inputs})
+        return self._keys[name]
+
+    def run(self, name: str) -> Any:
+        if name in self._outputs:
+            return self._outputs[name]
+        stage = self.stages[name]
+        inputs = [self.run(upstream) for upstream in stage.inputs]
+        key = self.key(name)
+        start = time.perf_counter()
+        use_cache = self.cache is not None and stage.cache
+        hit, value = self.cache.load(stage.name, key) if use_cache else (False, None)
+        if not hit:
+            value = stage.func(*inputs, **stage.params)
+            if use_cache:
+                self.cache.store(stage.name, key, value)
+        status = "cached" if hit else ("built" if use_cache else "uncached")
+        self.runs.append(StageRun(name, key, status, time.perf_counter() - start))
+        self._outputs[name] = value
+        return value
+
+    def rebuilt(self) -> List[str]:
+        return [run.name for run in self.runs if run.status != "cached"]
+
+
+# --------------------------------------------------------------------------- parsing helpers
+
+
+def _safe_int(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return int(value)
+    value_str = str(value).strip()
+    if not value_str:
+        return None
+    try:
+        return int(float(value_str))
+    except ValueError:
+        return None
+
+
+def _safe_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return float(value)
+    value_str = str(value).strip()
+    if not value_str:
+        return None
+    try:
+        return float(value_str)
+    except ValueError:
+        return None
+
+
+def _format_float(value: Optional[float], decimals: int = 3) -> str:
+    if value is None:
+        return ""
+    fmt = f"{{:.{decimals}f}}"
+    return fmt.format(value)
+
+
+def _score_from_goals(home_goals: Optional[int], away_goals: Optional[int]) -> Optional[float]:
+    if home_goals is None or away_goals is None:
+        return None
+    if home_goals > away_goals:
+        return 1.0
+    if home_goals < away_goals:
+        return 0.0
+    return 0.5
+
+
+def _points_pct(wins: Optional[int], draws: Optional[int], played: Optional[int]) -> Optional[float]:
+    if wins is None or draws is None or played in (None, 0):
+        return None
+    total_points = wins * 3 + draws
+    return total_points / (played * 3)
+
+
+def _derive_outcome(home_goals: int, away_goals: int) -> Tuple[str, str, int, int, int]:
+    if home_goals > away_goals:
+        return "Home Win", "H", 1, 0, 0
+    if home_goals < away_goals:
+        return "Away Win", "A", 0, 0, 1
+    return "Draw", "D", 0, 1, 0
+
+
+def _build_match_record(match: Mapping[str, object], season_label: str, league: str) -> Optional[Dict[str, object]]:
+    """A `league_v2` input row from one `match_table.match_records` entry."""
+
+    match_id = match["match_id"]
+    if match_id is None or not match["is_result"]:
+        return None
+
+    season_val = _safe_int(season_label)
+    if season_val is None:
+        return None
+
+    match_dt = match["kickoff"]
+    match_dt_str = match_dt.strftime("%Y-%m-%d %H:%M:%S") if match_dt else str(match["datetime"] or "").strip()
+    match_date_str = match_dt.date().isoformat() if match_dt else ""
+    match_time_str = match_dt.time().isoformat() if match_dt else ""
+
+    home_goals = match["home_goals"]
+    away_goals = match["away_goals"]
+    home_xg = match["home_xg"]
+    away_xg = match["away_xg"]
+
+    home_goals = 0 if home_goals is None else home_goals
+    away_goals = 0 if away_goals is None else away_goals
+    home_xg = 0.0 if home_xg is None else home_xg
+    away_xg = 0.0 if away_xg is None else away_xg
+
+    match_outcome, outcome_code, home_flag, draw_flag, away_flag = _derive_outcome(home_goals, away_goals)
+
+    forecast_home = match["forecast_home_win"]
+    forecast_draw = match["forecast_draw"]
+    forecast_away = match["forecast_away_win"]
+
+    return {
+        "match_id": match_id,
+        "league": league,
+        "season": season_val,
+        "match_datetime_utc": match_dt_str,
+        "match_date": match_date_str,
+        "match_time": match_time_str,
+        "is_result": True,
+        "home_team_id": match["home_team_id"],
+        "home_team_name": match["home_team_name"] or "",
+        "home_team_short": match["home_team_short"] or "",
+        "away_team_id": match["away_team_id"],
+        "away_team_name": match["away_team_name"] or "",
+        "away_team_short": match["away_team_short"] or "",
+        "home_goals": home_goals,
+        "away_goals": away_goals,
+        "total_goals": home_goals + away_goals,
+        "goal_difference": home_goals - away_goals,
+        "home_xg": round(home_xg, 6),
+        "away_xg": round(away_xg, 6),
+        "xg_difference": round(home_xg - away_xg, 6),
+        "forecast_home_win": forecast_home if forecast_home is not None else 0.0,
+        "forecast_draw": forecast_draw if forecast_draw is not None else 0.0,
+        "forecast_away_win": forecast_away if forecast_away is not None else 0.0,
+        "match_outcome": match_outcome,
+        "match_outcome_code": outcome_code,
+        "home_win_flag": home_flag,
+        "draw_flag": draw_flag,
+        "away_win_flag": away_flag,
+    }
+
+
+def _row_identity(row: Mapping[str, object]) -> Tuple[str, str, str, str, str]:
+    """(league, match_id, home, away, season) as the builders key their lookups."""
+
+    return tuple(
+        str(row.get(column, "")).strip()
+        for column in ("league", "match_id", "home_team_name", "away_team_name", "season")
+    )
+
+
+def _league_dirs(base_dir: Path, leagues: Optional[Sequence[str]] = None) -> List[Path]:
+    """League directories under `base_dir`, all of them or only those named in `leagues`."""
+
+    return [path for path in Path(base_dir).iterdir() if path.is_dir() and (leagues is None or path.name in leagues)]
+
+
+def _league_files(
+    base_dir: Path, subpath: Union[str, Path], leagues: Optional[Sequence[str]] = None
+) -> Tuple[Path, ...]:
+    return tuple(sorted(path for path in (league / subpath for league in _league_dirs(base_dir, leagues)) if path.exists()))
+
+
+def _season_results_files(league_root: Path) -> Tuple[Path, ...]:
+    if not league_root.exists():
+        return ()
+    return tuple(
+        sorted(
+            season_dir / "league_results.csv"
+            for season_dir in league_root.iterdir()
+            if season_dir.is_dir() and season_dir.name.isdigit() and (season_dir / "league_results.csv").exists()
+        )
+    )
+
+
+# --------------------------------------------------------------------------- stages
+
+
+def read_source_dataset(path: str) -> Tuple[Rows, List[str]]:
+    """Rows and header of the collated `Dataset.csv` the v3/v4 builds extend."""
+
+    source = Path(path)
+    if not source.exists():
+        raise FileNotFoundError(f"Base dataset missing at {source}")
+    with open(source, newline="") as fp:
+        reader = csv.DictReader(fp)
+        return list(reader), list(reader.fieldnames or [])
+
+
+def season_records(results_path: Path, league: str, match_table_root: Optional[str] = None) -> Rows:
+    """Played matches of one `<season>/league_results.csv`."""
+
+    table = match_table.load_match_table(results_path, Path(match_table_root) if match_table_root else None)
+    season_label = Path(results_path).parent.name
+    records = (_build_match_record(match, season_label, league) for match in match_table.match_records(table))
+    return [record for record in records if record]
+
+
+def collect_league_results(league_root: str, league: str, match_table_root: Optional[str] = None) -> Rows:
+    """Played matches of every `<league_root>/<season>/league_results.csv`, via the cached match tables."""
+
+    root = Path(league_root)
+    if not root.exists():
+        raise FileNotFoundError(f"League directory missing at {root}")
+
+    records: Rows = []
+    for results_path in _season_results_files(root):
+        records.extend(season_records(results_path, league, match_table_root))
+    if not records:
+        raise RuntimeError(f"No league results found under {root}")
+    return records
+
+
+def league_frame(records: Rows) -> pd.DataFrame:
+    """Parsed match records as the typed, chronologically sorted frame `league_v2` expects."""
+
+    df = pd.DataFrame(records)
+
+    df["match_datetime_utc"] = pd.to_datetime(df["match_datetime_utc"])
+    df["match_date"] = df["match_datetime_utc"].dt.normalize()
+    df["match_weekday"] = df["match_date"].dt.day_name()
+    df["season"] = df["season"].astype(int)
+
+    numeric_cols = [
+        "home_goals",
+        "away_goals",
+        "total_goals",
+        "goal_difference",
+        "home_xg",
+        "away_xg",
+        "xg_difference",
+        "forecast_home_win",
+        "forecast_draw",
+        "forecast_away_win",
+    ]
+    for col in numeric_cols:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    return df.sort_values("match_datetime_utc").reset_index(drop=True)
+
+
+def frame_rows(enriched: pd.DataFrame) -> Tuple[Rows, List[str]]:
+    """A finished `league_v2` frame as CSV-ready rows: dates as text, missing values blank."""
+
+    for col, fmt in (("match_datetime_utc", "%Y-%m-%d %H:%M:%S"), ("match_date", "%Y-%m-%d")):
+        if col in enriched.columns and pd.api.types.is_datetime64_any_dtype(enriched[col]):
+            enriched[col] = enriched[col].dt.strftime(fmt)
+
+    output_records: Rows = []
+    for record in enriched.to_dict(orient="records"):
+        output_records.append({key: "" if pd.isna(value) else value for key, value in record.items()})
+    return output_records, list(enriched.columns)
+
+
+def league_feature_rows(records: Rows) -> Tuple[Rows, List[str]]:
+    """Run the `league_v2` rolling-feature chain over the parsed matches."""
+
+    df = league_frame(records)
+    long_df = league_v2.compute_team_view(df.copy())
+    long_df = league_v2.add_rolling_features(long_df)
+    enriched = league_v2.pivot_features(df.copy(), long_df)
+    enriched = league_v2.add_market_features(enriched)
+    enriched = league_v2.add_targets(enriched)
+    enriched = league_v2.add_momentum_standardisation(enriched)
+    enriched = league_v2.prune_inference_columns(enriched)
+    enriched = league_v2.reorder_columns(enriched)
+    return frame_rows(enriched)
+
+
+def passthrough(base: Tuple[Rows, List[str]]) -> Tuple[Rows, List[str]]:
+    return base
+
+
+def sort_chronologically(base: Tuple[Rows, List[str]]) -> Tuple[Rows, List[str]]:
+    rows, fieldnames = base
+    ordered = sorted(rows, key=lambda r: (str(r.get("match_datetime_utc", "")), str(r.get("match_id", ""))))
+    return ordered, fieldnames
+
+
+def load_team_shot_counts(
+    base_dir: str,
+    strip_keys: bool = True,
+    leagues: Optional[Sequence[str]] = None,
+    match_ids: Optional[AbstractSet[str]] = None,
+) -> Dict[ShotsKey, Dict[str, Optional[int]]]:
+    shot_map: Dict[ShotsKey, Dict[str, Optional[int]]] = {}
+    for results_path in _league_files(Path(base_dir), TEAM_RESULTS_SUBPATH, leagues):
+        league = results_path.parent.parent.name
+        with open(results_path, newline="") as fp:
+            reader = csv.DictReader(fp)
+            for row in reader:
+                match_id = row.get("match_id")
+                team_name = row.get("team")
+                if not match_id or not team_name:
+                    continue
+                if strip_keys:
+                    match_id, team_name = str(match_id).strip(), team_name.strip()
+                if match_ids is not None and match_id not in match_ids:
+                    continue
+                shot_map[(league, match_id, team_name)] = {
+                    "shots_for": _safe_int(row.get("shots_for")),
+                    "shots_against": _safe_int(row.get("shots_against")),
+                }
+    return shot_map
+
+
+def load_elo_timeseries(
+    base_dir: str,
+    leagues: Optional[Sequence[str]] = None,
+    match_ids: Optional[AbstractSet[str]] = None,
+) -> Dict[EloKey, Dict[str, Optional[float]]]:
+    """
+    The V2 timeseries exports post-match ratings and metadata. Reconstruct the
+    pre-match ratings by reversing the final update. `match_ids` limits the map
+    to those matches (the streaming build reads one season at a time).
+    """
+    elo_map: Dict[EloKey, Dict[str, Optional[float]]] = {}
+    for elo_path in _league_files(Path(base_dir), TEAM_ELO_TIMESERIES_SUBPATH, leagues):
+        league = elo_path.parent.parent.name
+        with open(elo_path, newline="") as fp:
+            reader = csv.DictReader(fp)
+            for row in reader:
+                match_id = row.get("match_id")
+                if not match_id or (match_ids is not None and str(match_id).strip() not in match_ids):
+                    continue
+
+                home_goals = _safe_int(row.get("home_goals"))
+                away_goals = _safe_int(row.get("away_goals"))
+                expectation = None
+                p_home = _safe_float(row.get("p_home"))
+                p_draw = _safe_float(row.get("p_draw"))
+                if p_home is not None and p_draw is not None:
+                    expectation = p_home + 0.5 * p_draw
+
+                k_eff = _safe_float(row.get("k_eff"))
+                actual = _score_from_goals(home_goals, away_goals)
+
+                home_post = _safe_float(row.get("home_elo_post"))
+                away_post = _safe_float(row.get("away_elo_post"))
+                delta = None
+                if expectation is not None and actual is not None and k_eff is not None:
+                    delta = k_eff * (actual - expectation)
+
+                home_pre = away_pre = None
+                if delta is not None and home_post is not None and away_post is not None:
+                    home_pre = home_post - delta
+                    away_pre = away_post + delta
+
+                elo_map[(league, str(match_id).strip())] = {
+                    "home_team": row.get("home_team", "").strip(),
+                    "away_team": row.get("away_team", "").strip(),
+                    "home_elo_pre": home_pre,
+                    "away_elo_pre": away_pre,
+                    "elo_expectation_home": expectation,
+                }
+    return elo_map
+
+
+def league_ledger_path(base_dir: Path, league: str) -> Optional[Path]:
+    """The league's persisted `TeamLedger` under `base_dir`, if one has been saved."""
+
+    path = team_ledger.TeamLedger.path(league, Path(base_dir) / LEDGER_DIRNAME)
+    return path if path.exists() else None
+
+
+def ledger_shot_counts(base_dir: str, league: str) -> Dict[ShotsKey, Dict[str, Optional[int]]]:
+    """`load_team_shot_counts` for one league, read from its team ledger."""
+
+    return team_ledger.TeamLedger.load(league, Path(base_dir) / LEDGER_DIRNAME).shot_counts()
+
+
+def ledger_elo_timeseries(base_dir: str, league: str) -> Dict[EloKey, Dict[str, Optional[float]]]:
+    """`load_elo_timeseries` for one league, read from its team ledger."""
+
+    return team_ledger.TeamLedger.load(league, Path(base_dir) / LEDGER_DIRNAME).elo_timeseries()
+
+
+def load_elo_timeseries_direct(base_dir: str) -> Dict[EloKey, Dict[str, Optional[float]]]:
+    """The v3 reading: pre-match columns (`home_elo_pre`, `E_home`) taken as exported."""
+
+    elo_map: Dict[EloKey, Dict[str, Optional[float]]] = {}
+    for elo_path in _league_files(Path(base_dir), TEAM_ELO_TIMESERIES_SUBPATH):
+        league = elo_path.parent.parent.name
+        with open(elo_path, newline="") as fp:
+            reader = csv.DictReader(fp)
+            for row in reader:
+                match_id = row.get("match_id")
+                if not match_id:
+                    continue
+                elo_map[(league, match_id)] = {
+                    "home_team": row.get("home_team"),
+                    "away_team": row.get("away_team"),
+                    "home_elo_pre": _safe_float(row.get("home_elo_pre")),
+                    "away_elo_pre": _safe_float(row.get("away_elo_pre")),
+                    "elo_expectation_home": _safe_float(row.get("E_home")),
+                }
+    return elo_map
+
+
+def load_elo_summary(base_dir: str, leagues: Optional[Sequence[str]] = None) -> Dict[SummaryKey, Dict[str, Optional[float]]]:
+    summary: Dict[SummaryKey, Dict[str, Optional[float]]] = {}
+    for summary_path in _league_files(Path(base_dir), TEAM_ELO_SUMMARY_FILENAME, leagues):
+        league = summary_path.parent.name
+        with open(summary_path, newline="") as fp:
+            reader = csv.DictReader(fp)
+            for row in reader:
+                team = row.get("team")
+                if not team:
+                    continue
+
+                played = _safe_int(row.get("played"))
+                wins = _safe_int(row.get("wins"))
+                draws = _safe_int(row.get("draws"))
+                losses = _safe_int(row.get("losses"))
+
+                summary[(league, team.strip())] = {
+                    "final_elo": _safe_float(row.get("final_elo")),
+                    "played": played,
+                    "wins": wins,
+                    "draws": draws,
+                    "losses": losses,
+                    "points_pct": _points_pct(wins, draws, played),
+                }
+    return summary
+
+
+def _summary_columns(side: str, entry: Optional[Dict[str, Optional[float]]]) -> Dict[str, str]:
+    if not entry:
+        return {f"{side}_{name}": "" for name in ("elo_final", "elo_matches_played", "elo_wins", "elo_draws", "elo_losses", "elo_points_pct")}
+
+    def _count(name: str) -> str:
+        return str(entry[name]) if entry.get(name) is not None else ""
+
+    return {
+        f"{side}_elo_final": _format_float(entry.get("final_elo"), decimals=2),
+        f"{side}_elo_matches_played": _count("played"),
+        f"{side}_elo_wins": _count("wins"),
+        f"{side}_elo_draws": _count("draws"),
+        f"{side}_elo_losses": _count("losses"),
+        f"{side}_elo_points_pct": _format_float(entry.get("points_pct"), decimals=4),
+    }
+
+
+def match_columns(
+    base: Tuple[Rows, List[str]],
+    shot_map: Dict[ShotsKey, Dict[str, Optional[int]]],
+    elo_map: Dict[EloKey, Dict[str, Optional[float]]],
+    elo_summary: Optional[Dict[SummaryKey, Dict[str, Optional[float]]]] = None,
+    *,
+    elo_gaps: bool = False,
+) -> Dict[str, object]:
+    """Per-row shot, Elo, Elo-summary and market-vs-Elo columns.
+
+    Returns `columns` (one dict per base row), the raw `gaps` (Elo gap and
+    expectation gap, or None) that `season_z_columns` standardises, and the
+    missing-coverage `counts` the builders print.
+    """
+
+    rows, _ = base
+    columns: Columns = []
+    gaps: List[Tuple[Optional[float], Optional[float]]] = []
+    counts = {"shots": 0, "elo": 0, "summary_home": 0, "summary_away": 0}
+    for row in rows:
+        league, match_id, home_team, away_team, _ = _row_identity(row)
+        out: Dict[str, str] = {}
+
+        # Team shot counts
+        for side, team in (("home", home_team), ("away", away_team)):
+            shots = shot_map.get((league, match_id, team))
+            if shots and shots.get("shots_for") is not None:
+                out[f"{side}_shots_for"] = str(shots["shots_for"])
+            else:
+                out[f"{side}_shots_for"] = ""
+                counts["shots"] += 1
+
+        # Match-level Elo features
+        elo_entry = elo_map.get((league, match_id))
+        gap_value = None
+        expect_gap_value = None
+        if elo_entry and (
+            (not elo_entry.get("home_team") or elo_entry["home_team"] == home_team)
+            and (not elo_entry.get("away_team") or elo_entry["away_team"] == away_team)
+        ):
+            out["elo_home_pre"] = _format_float(elo_entry.get("home_elo_pre"))
+            out["elo_away_pre"] = _format_float(elo_entry.get("away_elo_pre"))
+            out["elo_home_expectation"] = _format_float(elo_entry.get("elo_expectation_home"), decimals=6)
+            if elo_gaps:
+                home_pre = elo_entry.get("home_elo_pre")
+                away_pre = elo_entry.get("away_elo_pre")
+                expectation = elo_entry.get("elo_expectation_home")
+                if home_pre is not None and away_pre is not None:
+                    gap_value = home_pre - away_pre
+                    out["elo_mean_pre"] = _format_float((home_pre + away_pre) / 2.0, decimals=3)
+                else:
+                    out["elo_mean_pre"] = ""
+                if expectation is not None:
+                    expect_gap_value = 2 * expectation - 1.0
+        else:
+            out.update({column: "" for column in ELO_COLUMNS})
+            if elo_gaps:
+                out["elo_mean_pre"] = ""
+            counts["elo"] += 1
+
+        # Team summary Elo features
+        if elo_summary is not None:
+            for side, team in (("home", home_team), ("away", away_team)):
+                entry = elo_summary.get((league, team))
+                out.update(_summary_columns(side, entry))
+                if not entry:
+                    counts[f"summary_{side}"] += 1
+
+        # Market vs Elo edge (clipped to mitigate outliers)
+        if elo_gaps:
+            forecast_home = _safe_float(row.get("forecast_home_win"))
+            if forecast_home is not None and expect_gap_value is not None:
+                # expectation gap is 2*E -1, so recover E
+                expectation_home = (expect_gap_value + 1.0) / 2.0
+            else:
+                expectation = out["elo_home_expectation"]
+                expectation_home = None if expectation == "" else _safe_float(expectation)
+            if forecast_home is not None and expectation_home is not None:
+                diff = max(-0.35, min(0.35, forecast_home - expectation_home))
+                out["market_vs_elo_edge"] = _format_float(diff, decimals=6)
+            else:
+                out["market_vs_elo_edge"] = ""
+
+        columns.append(out)
+        gaps.append((gap_value, expect_gap_value))
+    return {"columns": columns, "gaps": gaps, "counts": counts}
+
+
+def _mean_std(values: List[float]) -> Tuple[float, float]:
+    mean_val = sum(values) / len(values)
+    variance = sum((val - mean_val) ** 2 for val in values) / len(values)
+    return mean_val, variance**0.5
+
+
+def season_z_columns(base: Tuple[Rows, List[str]], matched: Dict[str, object]) -> Columns:
+    """Elo gap and expectation gap, raw and z-scored within each (league, season)."""
+
+    rows, _ = base
+    gaps: List[Tuple[Optional[float], Optional[float]]] = matched["gaps"]  # type: ignore[assignment]
+    seasons = [(identity[0], identity[4]) for identity in map(_row_identity, rows)]
+    gap_values: Dict[Tuple[str, str], List[float]] = {}
+    expect_values: Dict[Tuple[str, str], List[float]] = {}
+    for key, (gap, expect_gap) in zip(seasons, gaps):
+        if gap is not None:
+            gap_values.setdefault(key, []).append(gap)
+        if expect_gap is not None:
+            expect_values.setdefault(key, []).append(expect_gap)
+    gap_stats = {key: _mean_std(values) for key, values in gap_values.items()}
+    expect_stats = {key: _mean_std(values) for key, values in expect_values.items()}
+
+    def _pair(value: Optional[float], stats: Optional[Tuple[float, float]]) -> Tuple[str, str]:
+        if value is None:
+            return "", ""
+        if not stats:
+            return _format_float(value, decimals=3), ""
+        mean_val, std_val = stats
+        z_value = 0.0 if std_val in (None, 0.0) else (value - mean_val) / (std_val or 1.0)
+        return _format_float(value, decimals=3), _format_float(z_value, decimals=4)
+
+    columns: Columns = []
+    for key, (gap, expect_gap) in zip(seasons, gaps):
+        gap_text, gap_z = _pair(gap, gap_stats.get(key))
+        expect_text, expect_z = _pair(expect_gap, expect_stats.get(key))
+        columns.append(
+            {
+                "elo_gap_pre": gap_text,
+                "elo_gap_pre_season_z": gap_z,
+                "elo_expectation_gap": expect_text,
+                "elo_expectation_gap_season_z": expect_z,
+            }
+        )
+    return columns
+
+
+def _shot_difference(shots: Optional[Dict[str, Optional[int]]]) -> Optional[int]:
+    if not shots:
+        return None
+    shots_for, shots_against = shots.get("shots_for"), shots.get("shots_against")
+    if shots_for is None or shots_against is None:
+        return None
+    return shots_for - shots_against
+
+
+def _exp_decay(teams: pd.Series, values: np.ndarray, alpha: float) -> np.ndarray:
+    """`alpha * value + (1 - alpha) * previous` along each team's entries, in order."""
+
+    if not len(values):
+        return values.copy()
+    grouped = pd.Series(np.arange(len(values)), index=teams.index).groupby(teams, sort=False)
+    previous = grouped.shift(1).to_numpy()
+    rank = grouped.cumcount().to_numpy()
+    order = np.argsort(rank, kind="stable")
+    # bounds[r]:bounds[r + 1] slices `order` to the entries that are each team's r-th.
+    bounds = np.searchsorted(rank[order], np.arange(rank.max() + 2))
+    decay = values.copy()
+    for start, stop in zip(bounds[1:-1], bounds[2:]):
+        idx = order[start:stop]
+        decay[idx] = alpha * values[idx] + (1.0 - alpha) * decay[previous[idx].astype(np.intp)]
+    return decay
+
+
+def _team_volatility(long: pd.DataFrame, metric: str, window: int, alpha: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Each team's rolling std and exponential average of `metric` before every entry of `long`.
+
+    Missing values are skipped, so a team's state carries over them unchanged.
+    The std sums each window oldest-first and the average steps through each
+    team's history in lockstep across teams, evaluating the same expressions
+    as the per-match loop it replaced so the formatted output is identical.
+    """
+
+    observed = long.loc[long[metric].notna(), ["team", metric]]
+    grouped = observed.groupby("team", sort=False)[metric]
+    lags = [grouped.shift(lag).to_numpy() for lag in range(window - 1, -1, -1)]
+    count = np.zeros(len(observed))
+    total = np.zeros(len(observed))
+    for values in lags:
+        present = ~np.isnan(values)
+        count += present
+        total += np.where(present, values, 0.0)
+    mean = total / count
+    squares = np.zeros(len(observed))
+    for values in lags:
+        squares += np.where(np.isnan(values), 0.0, (values - mean) ** 2)
+    decay = _exp_decay(observed["team"], observed[metric].to_numpy(), alpha)
+    after = pd.DataFrame({"std": (squares / count) ** 0.5, "decay": decay}, index=observed.index).reindex(long.index)
+    teams = long["team"]
+    before = after.groupby(teams, sort=False).ffill().groupby(teams, sort=False).shift(1)
+    return before["std"].to_numpy(), before["decay"].to_numpy()
+
+
+def _format_array(values: np.ndarray, decimals: int = 4) -> List[str]:
+    fmt = f"{{:.{decimals}f}}".format
+    return ["" if value != value else fmt(value) for value in values.tolist()]
+
+
+def volatility_columns(
+    base: Tuple[Rows, List[str]],
+    shot_map: Dict[ShotsKey, Dict[str, Optional[int]]],
+    window: int = VOLATILITY_WINDOW,
+    alpha: float = EXP_DECAY_ALPHA,
+) -> Columns:
+    """Each team's rolling std and exponential average of goal, xG and shot differences before the match."""
+
+    rows, _ = base
+    if not rows:
+        return []
+    identities = [_row_identity(row) for row in rows]
+    goal_diff = np.array([_safe_float(row.get("goal_difference")) for row in rows], dtype=float)
+    xg_diff = np.array([_safe_float(row.get("xg_difference")) for row in rows], dtype=float)
+    shot_diff = np.array(
+        [
+            [_shot_difference(shot_map.get((league, match_id, team))) for team in (home_team, away_team)]
+            for league, match_id, home_team, away_team, _ in identities
+        ],
+        dtype=float,
+    )
+    # One entry per (match, side): home at even positions, away at odd ones; teams as integer codes.
+    long = pd.DataFrame(
+        {
+            "team": pd.factorize(np.array([team for identity in identities for team in identity[2:4]]))[0],
+            "goal": np.column_stack((goal_diff, -goal_diff)).ravel(),
+            "xg": np.column_stack((xg_diff, -xg_diff)).ravel(),
+            "shot": shot_diff.ravel(),
+        }
+    )
+
+    data: Dict[str, List[str]] = {}
+    for metric in VOLATILITY_METRICS:
+        std, decay = _team_volatility(long, metric, window, alpha)
+        home_std, away_std = std[0::2], std[1::2]
+        home_exp, away_exp = decay[0::2], decay[1::2]
+        data[f"home_{metric}_diff_std5"] = _format_array(home_std)
+        data[f"away_{metric}_diff_std5"] = _format_array(away_std)
+        data[f"home_{metric}_diff_exp_decay"] = _format_array(home_exp)
+        data[f"away_{metric}_diff_exp_decay"] = _format_array(away_exp)
+        data[f"{metric}_diff_std_gap5"] = _format_array(home_std - away_std)
+        data[f"{metric}_diff_exp_decay_gap"] = _format_array(home_exp - away_exp)
+    names = list(data)
+    return [dict(zip(names, values)) for values in zip(*data.values())]
+
+
+# --------------------------------------------------------------------------- recipes
+
+
+@dataclass(frozen=True)
+class BuildConfig:
+    base_dir: Path = BASE_DIR
+    league: str = TARGET_LEAGUE
+    volatility_window: int = VOLATILITY_WINDOW
+    exp_decay_alpha: float = EXP_DECAY_ALPHA
+
+
+@dataclass
+class BuildResult:
+    version: str
+    rows: Rows
+    fieldnames: List[str]
+    counts: Dict[str, int]
+    runs: List[StageRun]
+    output: Optional[Path] = None
+    typed_output: Optional[Path] = None
+
+
+# Column groups each version appends to its base table, in output order.
+VERSION_COLUMNS: Dict[str, List[str]] = {
+    "3": SHOT_COLUMNS + ELO_COLUMNS,
+    "4": SHOT_COLUMNS + ELO_COLUMNS + SUMMARY_COLUMNS,
+    "5": SHOT_COLUMNS + ELO_COLUMNS + ["elo_mean_pre"] + SUMMARY_COLUMNS + ELO_GAP_COLUMNS,
+}
+VERSION_COLUMNS["7"] = VERSION_COLUMNS["5"] + VOLATILITY_COLUMNS
+# Versions rebuilt from one league's season files, and so buildable per league.
+PARTITION_VERSIONS = ("5", "7")
+# Stages whose per-row columns are merged into the base rows.
+VERSION_PARTS: Dict[str, Tuple[str, ...]] = {
+    "3": ("match_columns",),
+    "4": ("match_columns",),
+    "5": ("match_columns", "season_z"),
+    "7": ("match_columns", "season_z", "volatility"),
+}
+
+
+def dataset_stages(version: str, config: BuildConfig = BuildConfig()) -> Dict[str, Stage]:
+    """The stage graph for one dataset version; `base` is the table the columns attach to."""
+
+    if version not in VERSION_COLUMNS:
+        raise ValueError(f"Unknown dataset version {version!r}; expected one of {sorted(VERSION_COLUMNS)}")
+    base_dir = Path(config.base_dir)
+    root = str(base_dir)
+    # v5/v7 rows all come from `config.league`, so their lookups only read that league's files.
+    leagues = [config.league] if version in PARTITION_VERSIONS else None
+    # v5/v7 read shots and Elo from the league's team ledger once one has been saved.
+    ledger = league_ledger_path(base_dir, config.league) if leagues else None
+    if ledger is not None:
+        shots = Stage(
+            "ledger_shots",
+            ledger_shot_counts,
+            params={"base_dir": root, "league": config.league},
+            sources=(ledger,),
+            code=(team_ledger,),
+        )
+    else:
+        shots = Stage(
+            "shots",
+            load_team_shot_counts,
+            params={"base_dir": root, "strip_keys": version != "3", "leagues": leagues},
+            sources=_league_files(base_dir, TEAM_RESULTS_SUBPATH, leagues),
+        )
+    stages: Dict[str, Stage] = {"shots": shots}
+    if version in ("3", "4"):
+        source = base_dir / SOURCE_DATASET_NAME
+        stages["base"] = Stage(
+            "source_dataset",
+            read_source_dataset,
+            params={"path": str(source)},
+            sources=(source,) if source.exists() else (),
+            cache=False,
+        )
+    else:
+        league_root = base_dir / config.league
+        stages["league_results"] = Stage(
+            "league_results",
+            collect_league_results,
+            params={
+                "league_root": str(league_root),
+                "league": config.league,
+                "match_table_root": str(base_dir / MATCH_TABLE_DIRNAME),
+            },
+            sources=_season_results_files(league_root),
+            code=(match_table,),
+        )
+        stages["league_features"] = Stage(
+            "league_features",
+            league_feature_rows,
+            inputs=("league_results",),
+            code=(league_v2, team_ledger),
+        )
+        if version == "7":
+            stages["base"] = Stage("sorted_rows", sort_chronologically, inputs=("league_features",), cache=False)
+        else:
+            stages["base"] = Stage("league_rows", passthrough, inputs=("league_features",), cache=False)
+    if version == "3":
+        stages["elo_timeseries"] = Stage(
+            "elo_timeseries_direct",
+            load_elo_timeseries_direct,
+            params={"base_dir": root},
+            sources=_league_files(base_dir, TEAM_ELO_TIMESERIES_SUBPATH),
+        )
+    elif ledger is not None:
+        stages["elo_timeseries"] = Stage(
+            "ledger_elo_timeseries",
+            ledger_elo_timeseries,
+            params={"base_dir": root, "league": config.league},
+            sources=(ledger,),
+            code=(team_ledger,),
+        )
+    else:
+        stages["elo_timeseries"] = Stage(
+            "elo_timeseries",
+            load_elo_timeseries,
+            params={"base_dir": root, "leagues": leagues},
+            sources=_league_files(base_dir, TEAM_ELO_TIMESERIES_SUBPATH, leagues),
+        )
+    if version != "3":
+        stages["elo_summary"] = Stage(
+            "elo_summary",
+            load_elo_summary,
+            params={"base_dir": root, "leagues": leagues},
+            sources=_league_files(base_dir, TEAM_ELO_SUMMARY_FILENAME, leagues),
+        )
+    stages["match_columns"] = Stage(
+        "match_columns",
+        match_columns,
+        inputs=("base", "shots", "elo_timeseries") + (("elo_summary",) if "elo_summary" in stages else ()),
+        params={"elo_gaps": version in ("5", "7")},
+    )
+    if version in ("5", "7"):
+        stages["season_z"] = Stage(
+            "season_z",
+            season_z_columns,
+            inputs=("base", "match_columns"),
+        )
+    if version == "7":
+        stages["volatility"] = Stage(
+            "volatility",
+            volatility_columns,
+            inputs=("base", "shots"),
+            params={"window": config.volatility_window, "alpha": config.exp_decay_alpha},
+        )
+    # Engine lookups go by graph slot; the Stage name is what keys and caches the output.
+    return stages
+
+
+def assemble_rows(version: str, base: Tuple[Rows, List[str]], parts: Sequence[Any]) -> Tuple[Rows, List[str]]:
+    """Base rows extended with the per-row columns of `VERSION_PARTS[version]`, and the output header."""
+
+    base_rows, base_fieldnames = base
+    matched = parts[0]
+    column_lists: List[Columns] = [matched["columns"], *parts[1:]]
+    rows = [dict(row) for row in base_rows]
+    for columns in column_lists:
+        for row, extra in zip(rows, columns):
+            row.update(extra)
+    new_columns = VERSION_COLUMNS[version]
+    return rows, base_fieldnames + [col for col in new_columns if col not in base_fieldnames]
+
+
+def build_dataset(
+    version: str,
+    output: Optional[Path] = None,
+    config: BuildConfig = BuildConfig(),
+    cache: Optional[StageCache] = StageCache(),
+    typed: bool = True,
+) -> BuildResult:
+    """Build `Dataset_Version_<version>` through the stage graph and write it as CSV.
+
+    With `typed`, a Parquet mirror is written next to the CSV (when pyarrow is installed).
+    """
+
+    version = str(version)
+    engine = BuildEngine(dataset_stages(version, config), cache)
+    base = engine.run("base")
+    parts = [engine.run(name) for name in VERSION_PARTS[version]]
+    matched = parts[0]
+    rows, fieldnames = assemble_rows(version, base, parts)
+
+    output = Path(output) if output else Path(config.base_dir) / OUTPUT_TEMPLATE.format(version=version)
+    with open(output, "w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    typed_output = None
+    if typed:
+        typed_output = write_typed_dataset(
+            output,
+            {**league_v2.FEATURE_GROUPS, **FEATURE_GROUPS},
+            {"dataset_version": version, "stage_keys": {run.name: run.key for run in engine.runs}},
+        )
+    return BuildResult(version, rows, fieldnames, dict(matched["counts"]), engine.runs, output, typed_output)
+
+
+@dataclass
+class LeagueBuild:
+    """A league-partitioned build: one `BuildResult` per league plus their concatenation."""
+
+    version: str
+    results: Dict[str, BuildResult]
+    seconds: Dict[str, float]
+    wall_seconds: float
+    jobs: int
+    fieldnames: List[str]
+    rows: int
+    output: Path
+    typed_output: Optional[Path] = None
+
+
+def available_leagues(base_dir: Path = BASE_DIR) -> List[str]:
+    """Leagues under `base_dir` with at least one `<season>/league_results.csv`."""
+
+    return sorted(path.name for path in _league_dirs(base_dir) if _season_results_files(path))
+
+
+def _build_league(
+    version: str,
+    league: str,
+    output: Path,
+    config: BuildConfig,
+    cache: Optional[StageCache],
+    typed: bool,
+) -> Tuple[BuildResult, float]:
+    start = time.perf_counter()
+    result = build_dataset(version, output, replace(config, league=league), cache, typed)
+    return result, time.perf_counter() - start
+
+
+def build_leagues(
+    version: str,
+    leagues: Optional[Sequence[str]] = None,
+    output_dir: Optional[Path] = None,
+    config: BuildConfig = BuildConfig(),
+    cache: Optional[StageCache] = StageCache(),
+    jobs: Optional[int] = None,
+    typed: bool = True,
+) -> LeagueBuild:
+    """Build `version` for each league in its own process, then concatenate.
+
+    Leagues share no rows, so each one runs the whole stage graph on its own
+    files in a worker and writes `<output_dir>/league=<league>/<dataset>.csv`.
+    The parent writes `<output_dir>/<dataset>.csv` with every league's rows in
+    `leagues` order. `jobs=1` builds in-process, one league after another.
+    """
+
+    version = str(version)
+    if version not in PARTITION_VERSIONS:
+        raise ValueError(f"Dataset version {version!r} is not built per league; expected one of {PARTITION_VERSIONS}")
+    base_dir = Path(config.base_dir)
+    leagues = list(leagues or available_leagues(base_dir))
+    missing = [league for league in leagues if not _season_results_files(base_dir / league)]
+    if missing:
+        raise FileNotFoundError(f"No <season>/league_results.csv under {base_dir} for: {', '.join(missing)}")
+    output_dir = Path(output_dir) if output_dir else base_dir / PARTITIONED_OUTPUT_TEMPLATE.format(version=version)
+    filename = OUTPUT_TEMPLATE.format(version=version)
+    outputs = {league: output_dir / PARTITION_TEMPLATE.format(league=league) / filename for league in leagues}
+    for path in outputs.values():
+        path.parent.mkdir(parents=True, exist_ok=True)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(leagues)))
+
+    start = time.perf_counter()
+    args = {league: (version, league, outputs[league], config, cache, typed) for league in leagues}
+    if jobs == 1:
+        built = {league: _build_league(*args[league]) for league in leagues}
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {league: pool.submit(_build_league, *args[league]) for league in leagues}
+            built = {league: future.result() for league, future in futures.items()}
+
+    results = {league: result for league, (result, _) in built.items()}
+    fieldnames: List[str] = []
+    for result in results.values():
+        fieldnames.extend(column for column in result.fieldnames if column not in fieldnames)
+    output = output_dir / filename
+    with open(output, "w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in results.values():
+            writer.writerows(result.rows)
+    typed_output = None
+    if typed:
+        typed_output = write_typed_dataset(
+            output,
+            {**league_v2.FEATURE_GROUPS, **FEATURE_GROUPS},
+            {"dataset_version": version, "leagues": leagues},
+        )
+    return LeagueBuild(
+        version,
+        results,
+        {league: seconds for league, (_, seconds) in built.items()},
+        time.perf_counter() - start,
+        jobs,
+        fieldnames,
+        sum(len(result.rows) for result in results.values()),
+        output,
+        typed_output,
+    )
+
+
+def print_build_summary(result: BuildResult) -> None:
+    """The summary lines the original builder scripts printed."""
+
+    print(f"Enriched dataset written to {result.output}")
+    if result.typed_output:
+        print(f"Typed mirror written to {result.typed_output}")
+    print(f"Rows processed: {len(result.rows)}")
+    print(f"Shot features missing in {result.counts['shots']} team entries")
+    print(f"Elo features missing in {result.counts['elo']} matches")
+    if result.version != "3":
+        print(f"Elo summary missing for {result.counts['summary_home']} home teams")
+        print(f"Elo summary missing for {result.counts['summary_away']} away teams")
+
+
+def print_league_build_summary(build: LeagueBuild) -> None:
+    for league, result in build.results.items():
+        print(f"  {league:<12} {len(result.rows):6d} rows  {build.seconds[league]:7.2f}s  {result.output}")
+    print(f"Combined dataset written to {build.output}")
+    if build.typed_output:
+        print(f"Typed mirror written to {build.typed_output}")
+    print(
+        f"Rows processed: {build.rows} across {len(build.results)} leagues in {build.wall_seconds:.2f}s "
+        f"wall time ({build.jobs} worker{'s' if build.jobs != 1 else ''})"
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build a Dataset_Version_N CSV from cached stages")
+    parser.add_argument("version", choices=sorted(VERSION_COLUMNS))
+    parser.add_argument("--output", type=Path, help="Output CSV (default: understat_data/Dataset_Version_N.csv)")
+    parser.add_argument("--base-dir", type=Path, default=BASE_DIR)
+    parser.add_argument("--league", default=TARGET_LEAGUE)
+    parser.add_argument(
+        "--leagues",
+        nargs="+",
+        help="Build v5/v7 for each of these leagues (`all` for every league found) into a league-partitioned output",
+    )
+    parser.add_argument("--jobs", type=int, help="Worker processes for --leagues (default: one per core)")
+    parser.add_argument("--output-dir", type=Path, help="Partitioned output directory (default: understat_data/Dataset_Version_N_leagues)")
+    parser.add_argument("--cache-dir", type=Path, default=STAGE_CACHE_ROOT)
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage and leave the cache untouched")
+    parser.add_argument("--no-typed", action="store_true", help="Skip the Parquet mirror next to the CSV")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Build v5/v7 one season at a time in bounded memory (no stage cache, no typed mirror)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    config = BuildConfig(base_dir=args.base_dir, league=args.league)
+    cache = None if args.no_cache else StageCache(args.cache_dir)
+    if args.stream:
+        from pipelines.dataset_stream import stream_dataset
+
+        streamed = stream_dataset(args.version, args.output, config)
+        print(f"Enriched dataset written to {streamed.output}")
+        print(f"Rows processed: {streamed.rows} in {streamed.chunks} season chunks")
+        return
+    if args.leagues:
+        leagues = None if args.leagues == ["all"] else args.leagues
+        build = build_leagues(args.version, leagues, args.output_dir, config, cache, args.jobs, typed=not args.no_typed)
+        print_league_build_summary(build)
+        return
+    result = build_dataset(args.version, args.output, config, cache, typed=not args.no_typed)
+    for run in result.runs:
+        print(f"  {run.name:<24} {run.status:<9} {run.seconds * 1e3:9.1f}ms  {run.key}")
+    print_build_summary(result)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,229 @@
+"""Bounded-memory streaming builds of the v5/v7 datasets.
+
+`dataset_build.build_dataset` holds the whole history at once: every base row
+as a dict, the full shot and Elo maps, and a second pass over all rows for the
+season z-scores. `stream_dataset` walks a league's seasons in chronological
+order instead, one `<season>/league_results.csv` per chunk, and appends each
+finished chunk to the output CSV. Between chunks it keeps only:
+
+- each team's last `CONTEXT_MATCHES` matches (and their shot counts), replayed
+  ahead of the next chunk so rolling windows, rest days, 14-day congestion
+  counts and exponential averages carry on from where the last chunk ended;
+- each team's running match count and the date of the first match, so
+  `match_number` and `match_day_index` still count from the start of history;
+- the Elo summary table, one row per team.
+
+Shot counts and the Elo timeseries are read per chunk, filtered to the chunk's
+matches, from the league's team ledger when one is saved (the ledger itself is
+small) and otherwise from the Team_Results CSVs. Season z-scores need the whole season, which is exactly one chunk.
+
+The replayed history is shorter than the full one, and two things follow
+from that:
+
+- Exponential averages (decay 0.5 and 0.55) converge to the batch values well
+  within `CONTEXT_MATCHES` matches.
+- pandas' rolling sums carry a compensated running total over each team's
+  whole history. So the rolling xG sums, and the deltas built from them, can
+  differ from the batch build in the last digit (relative error around 1e-15).
+
+Everything else is identical. v7 row order is identical too; v5 may order
+matches that share a kickoff time differently, since the batch build leaves
+those ties to an unstable sort.
+
+Usage:
+    python -m pipelines.dataset_build 7 --stream --league Serie_A --output /tmp/v7_serie_a.csv
+"""
+
+from __future__ import annotations
+
+import csv
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from analysis import build_league_results_v2 as league_v2
+from pipelines.team_ledger import TeamLedger
+from pipelines.dataset_build import (
+    LEDGER_DIRNAME,
+    MATCH_TABLE_DIRNAME,
+    OUTPUT_TEMPLATE,
+    PARTITION_VERSIONS,
+    BuildConfig,
+    Rows,
+    ShotsKey,
+    _season_results_files,
+    assemble_rows,
+    frame_rows,
+    league_frame,
+    league_ledger_path,
+    load_elo_summary,
+    load_elo_timeseries,
+    load_team_shot_counts,
+    match_columns,
+    season_records,
+    season_z_columns,
+    sort_chronologically,
+    volatility_columns,
+)
+
+CONTEXT_MATCHES = 64
+
+
+@dataclass
+class StreamResult:
+    version: str
+    rows: int
+    chunks: int
+    fieldnames: List[str]
+    counts: Dict[str, int]
+    output: Path
+
+
+class TeamHistory:
+    """The per-team state carried from one chunk to the next."""
+
+    def __init__(self, depth: int = CONTEXT_MATCHES):
+        self.depth = depth
+        self.recent: Dict[int, Deque[int]] = {}
+        self.played: Dict[int, int] = {}
+        self.records: Dict[int, Dict[str, object]] = {}
+        self.shots: Dict[ShotsKey, Dict[str, Optional[int]]] = {}
+
+    def context(self) -> Rows:
+        """Every team's last `depth` matches, oldest first."""
+
+        match_ids = {match_id for recent in self.recent.values() for match_id in recent}
+        return sorted(
+            (self.records[match_id] for match_id in match_ids),
+            key=lambda record: (str(record["match_datetime_utc"]), str(record["match_id"])),
+        )
+
+    def match_number_offsets(self, context: Rows) -> Dict[int, int]:
+        """What to add to a team's `match_number` counted over `context` + chunk to count over all history."""
+
+        replayed: Dict[int, int] = {}
+        for record in context:
+            for side in ("home_team_id", "away_team_id"):
+                replayed[record[side]] = replayed.get(record[side], 0) + 1
+        return {team: self.played[team] - count for team, count in replayed.items()}
+
+    def add(self, records: Rows, shot_map: Dict[ShotsKey, Dict[str, Optional[int]]]) -> None:
+        for record in sorted(records, key=lambda record: (str(record["match_datetime_utc"]), str(record["match_id"]))):
+            self.records[record["match_id"]] = record
+            for side in ("home_team_id", "away_team_id"):
+                team = record[side]
+                self.recent.setdefault(team, deque(maxlen=self.depth)).append(record["match_id"])
+                self.played[team] = self.played.get(team, 0) + 1
+        kept = {match_id for recent in self.recent.values() for match_id in recent}
+        self.records = {match_id: record for match_id, record in self.records.items() if match_id in kept}
+        shots = {**self.shots, **shot_map}
+        self.shots = {key: value for key, value in shots.items() if int(key[1]) in kept}
+
+
+def league_chunk_rows(records: Rows, history: TeamHistory, origin: Optional[pd.Timestamp]) -> Tuple[Rows, List[str], pd.Timestamp]:
+    """`dataset_build.league_feature_rows` for one chunk, continuing from `history`.
+
+    Returns the rows, their header and the first match date of the history.
+    """
+
+    context = history.context()
+    df = league_frame(context + records)
+    if origin is None:
+        origin = df["match_date"].min()
+    long_df = league_v2.compute_team_view(df.copy())
+    long_df = league_v2.add_rolling_features(long_df)
+    offsets = history.match_number_offsets(context)
+    long_df["match_number"] += long_df["team_id"].map(offsets).fillna(0).astype(int)
+    enriched = league_v2.pivot_features(df.copy(), long_df)
+    chunk_ids = {record["match_id"] for record in records}
+    enriched = enriched[enriched["match_id"].isin(chunk_ids)].reset_index(drop=True)
+    enriched["match_day_index"] = (enriched["match_date"] - origin).dt.days.astype(float)
+    enriched = league_v2.add_market_features(enriched)
+    enriched = league_v2.add_targets(enriched)
+    enriched = league_v2.add_momentum_standardisation(enriched)
+    enriched = league_v2.prune_inference_columns(enriched)
+    enriched = league_v2.reorder_columns(enriched)
+    rows, fieldnames = frame_rows(enriched)
+    return rows, fieldnames, origin
+
+
+def stream_dataset(
+    version: str,
+    output: Optional[Path] = None,
+    config: BuildConfig = BuildConfig(),
+    context_matches: int = CONTEXT_MATCHES,
+) -> StreamResult:
+    """Build v5/v7 for `config.league` one season at a time, appending each season to `output`.
+
+    Stages are not cached and no typed mirror is written; run
+    `typed_dataset.write_typed_dataset` on the output if one is wanted.
+    """
+
+    version = str(version)
+    if version not in PARTITION_VERSIONS:
+        raise ValueError(f"Dataset version {version!r} cannot be streamed; expected one of {PARTITION_VERSIONS}")
+    base_dir = Path(config.base_dir)
+    league_root = base_dir / config.league
+    season_files = _season_results_files(league_root)
+    if not season_files:
+        raise FileNotFoundError(f"No <season>/league_results.csv under {league_root}")
+    root, leagues = str(base_dir), [config.league]
+    match_table_root = str(base_dir / MATCH_TABLE_DIRNAME)
+    output = Path(output) if output else base_dir / OUTPUT_TEMPLATE.format(version=version)
+
+    elo_summary = load_elo_summary(root, leagues)
+    ledger = None
+    if league_ledger_path(base_dir, config.league) is not None:
+        ledger = TeamLedger.load(config.league, base_dir / LEDGER_DIRNAME)
+    history = TeamHistory(context_matches)
+    origin: Optional[pd.Timestamp] = None
+    counts = {"shots": 0, "elo": 0, "summary_home": 0, "summary_away": 0}
+    fieldnames: List[str] = []
+    total_rows = chunks = 0
+    with open(output, "w", newline="") as fp:
+        writer: Optional[csv.DictWriter] = None
+        for results_path in season_files:
+            records = season_records(results_path, config.league, match_table_root)
+            if not records:
+                continue
+            chunk_ids = {str(record["match_id"]) for record in records}
+            base_rows, base_fieldnames, origin = league_chunk_rows(records, history, origin)
+            base = (base_rows, base_fieldnames)
+            if version == "7":
+                base = sort_chronologically(base)
+            if ledger is not None:
+                shot_map = ledger.shot_counts(chunk_ids)
+                elo_map = ledger.elo_timeseries(chunk_ids)
+            else:
+                shot_map = load_team_shot_counts(root, True, leagues, chunk_ids)
+                elo_map = load_elo_timeseries(root, leagues, chunk_ids)
+            matched = match_columns(base, shot_map, elo_map, elo_summary, elo_gaps=True)
+            parts = [matched, season_z_columns(base, matched)]
+            if version == "7":
+                context = sort_chronologically((history.context(), []))[0]
+                volatility = volatility_columns(
+                    (context + base[0], []),
+                    {**history.shots, **shot_map},
+                    config.volatility_window,
+                    config.exp_decay_alpha,
+                )
+                parts.append(volatility[len(context) :])
+            rows, chunk_fieldnames = assemble_rows(version, base, parts)
+            if writer is None:
+                fieldnames = chunk_fieldnames
+                writer = csv.DictWriter(fp, fieldnames=fieldnames)
+                writer.writeheader()
+            elif chunk_fieldnames != fieldnames:
+                raise RuntimeError(f"{results_path} produced different columns than the earlier seasons")
+            writer.writerows(rows)
+            for name, value in matched["counts"].items():
+                counts[name] += value
+            total_rows += len(rows)
+            chunks += 1
+            history.add(records, shot_map)
+    if not chunks:
+        raise RuntimeError(f"No league results found under {league_root}")
+    return StreamResult(version, total_rows, chunks, fieldnames, counts, output)
@@ -0,0 +1,403 @@
+"""Long-running feature service that keeps one FeatureStore warm.
+
+The web predict route and local tooling used to pay the full FeatureStore cold
+start (dataset parse, augmentation, team caches) on every call. This module
+serves fixture features over a small asyncio HTTP/1.1 server, on TCP or a Unix
+socket, from a single store loaded at startup.
+
+Endpoints:
+
+- `GET /health`: liveness plus the dataset version and row count.
+- `GET /version`: dataset version, content digest, rolling window and the
+  feature columns of every model.
+- `GET /fixture?season=&home=&away=` or `GET /fixture?match_id=`: one
+  fixture's feature vector as JSON.
+- `POST /batch`: body `{"fixtures": [...], "model": "..."}`. A fixture is a
+  match id, a `[season, home, away]` list or a `{"season", "home", "away"}`
+  object. Without `model` the reply is a JSON list of fixture vectors. With
+  `model` it is that model's float32 matrix (`"fixtures": null` selects every
+  row): JSON by default, or the binary layout below when the request sends
+  `Accept: application/octet-stream`.
+- `POST /refresh`: pick up dataset changes via `FeatureStore.refresh()`.
+- `GET /stats`: hit/miss/eviction counters of the in-memory fixture cache tier.
+
+The binary matrix layout is little-endian: the 4-byte magic `FSM1`, uint32
+rows, uint32 columns, `rows` int64 match ids, then `rows * columns` float32
+values in row-major order. The column names come back in the
+`X-Feature-Columns` header (comma separated) and match `/version`.
+
+Requests are answered on the event loop thread. Store lookups are hash-index
+hits that take microseconds, and keeping them on one thread means the store's
+lazily built state never needs locking. `/refresh` may re-read and re-augment
+the dataset, so it runs on a worker thread instead; other requests wait for it
+on an `asyncio.Lock` rather than reading the store while it is swapped, and the
+loop keeps accepting connections meanwhile.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import struct
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from pipelines.feature_store import FeatureStore, FixtureFeatures, FixtureRef, TieredFeatureCache, _env_number
+
+LOGGER = logging.getLogger(__name__)
+
+BINARY_MAGIC = b"FSM1"
+BINARY_HEADER = struct.Struct("<4sII")
+BINARY_CONTENT_TYPE = "application/octet-stream"
+JSON_CONTENT_TYPE = "application/json"
+MAX_BODY_BYTES = 8 << 20
+# The service outlives many requests for the same fixtures, so it keeps a larger memory tier than the CLI.
+SERVICE_MEMORY_CACHE_SIZE = 16384
+SERVICE_MEMORY_CACHE_TTL = 3600.0
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class RequestError(Exception):
+    """A client error that maps to an HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Response:
+    status: int
+    body: bytes
+    content_type: str = JSON_CONTENT_TYPE
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, payload: object, status: int = 200) -> "Response":
+        return cls(status, json.dumps(payload).encode("utf-8"))
+
+    def encode(self, keep_alive: bool) -> bytes:
+        lines = [
+            f"HTTP/1.1 {self.status} {REASONS.get(self.status, 'Unknown')}",
+            f"Content-Type: {self.content_type}",
+            f"Content-Length: {len(self.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in self.headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.body
+
+
+def encode_matrix(matrix: np.ndarray, match_ids: np.ndarray) -> bytes:
+    """Serialise a feature matrix in the binary layout described in the module docstring."""
+
+    rows, columns = matrix.shape
+    return b"".join(
+        (
+            BINARY_HEADER.pack(BINARY_MAGIC, rows, columns),
+            np.ascontiguousarray(match_ids, dtype="<i8").tobytes(),
+            np.ascontiguousarray(matrix, dtype="<f4").tobytes(),
+        )
+    )
+
+
+def decode_matrix(payload: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of `encode_matrix`; returns `(matrix, match_ids)`."""
+
+    magic, rows, columns = BINARY_HEADER.unpack_from(payload)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Not a feature matrix payload")
+    offset = BINARY_HEADER.size
+    match_ids = np.frombuffer(payload, dtype="<i8", count=rows, offset=offset)
+    offset += match_ids.nbytes
+    matrix = np.frombuffer(payload, dtype="<f4", count=rows * columns, offset=offset).reshape(rows, columns)
+    return matrix, match_ids
+
+
+def _fixture_ref(value: object) -> FixtureRef:
+    if isinstance(value, bool):
+        raise RequestError(400, f"Invalid fixture reference: {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, dict):
+        value = [value.get("season"), value.get("home"), value.get("away")]
+    if isinstance(value, list) and len(value) == 3 and value[1] and value[2]:
+        season, home, away = value
+        return (str(season) if season else None, str(home), str(away))
+    raise RequestError(400, f"Invalid fixture reference: {value!r}")
+
+
+def _content_length(headers: Dict[str, str]) -> Optional[int]:
+    """The request's body length; None when the header is not a non-negative integer."""
+
+    value = headers.get("content-length") or "0"
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+def _fixture_payload(fixture: FixtureFeatures) -> Dict[str, object]:
+    # Shallow on purpose: dataclasses.asdict deep-copies the feature dict.
+    return {
+        "match_id": fixture.match_id,
+        "home_team": fixture.home_team,
+        "away_team": fixture.away_team,
+        "season": fixture.season,
+        "features": fixture.features,
+    }
+
+
+class FeatureService:
+    """Routes HTTP requests to a warm `FeatureStore`; transport lives in `serve`."""
+
+    def __init__(self, store: FeatureStore):
+        self.store = store
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/version"): self.version,
+            ("GET", "/fixture"): self.fixture,
+            ("POST", "/batch"): self.batch,
+            ("POST", "/refresh"): self.refresh,
+            ("GET", "/stats"): self.stats,
+        }
+        self._store_lock = asyncio.Lock()
+
+    def warm(self) -> None:
+        """Load the frame and every model matrix so the first request is as fast as the rest."""
+
+        _ = self.store.df
+        for model_name in self.store.model_features:
+            self.store.get_feature_matrix([], model_name)
+
+    def handle(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Response:
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return Response.json({"error": f"{method} not allowed on {url.path}"}, status=405)
+            return Response.json({"error": f"Unknown path {url.path}"}, status=404)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            return handler(query=query, headers=headers, body=body)
+        except RequestError as exc:
+            return Response.json({"error": str(exc)}, status=exc.status)
+        except ValueError as exc:
+            # FeatureStore raises ValueError for unknown fixtures and models.
+            return Response.json({"error": str(exc)}, status=404)
+        except Exception:  # pragma: no cover - defensive; keeps the daemon alive
+            LOGGER.exception("Unhandled error serving %s %s", method, target)
+            return Response.json({"error": "internal error"}, status=500)
+
+    async def respond(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Response:
+        """`handle` for the connection loop, with `/refresh` moved off the event loop thread."""
+
+        async with self._store_lock:
+            if (method, urlsplit(target).path) == ("POST", "/refresh"):
+                return await asyncio.to_thread(self.handle, method, target, headers, body)
+            return self.handle(method, target, headers, body)
+
+    def health(self, **_: object) -> Response:
+        return Response.json(
+            {
+                "status": "ok",
+                "dataset_version": self.store.dataset_version,
+                "rows": len(self.store.df),
+            }
+        )
+
+    def version(self, **_: object) -> Response:
+        store = self.store
+        return Response.json(
+            {
+                "dataset_version": store.dataset_version,
+                "dataset_digest": store.dataset_digest,
+                "dataset_mtime": store.dataset_mtime,
+                "cache_fingerprint": store.cache_fingerprint,
+                "rolling_window": store.rolling_window,
+                "latest_season": store.latest_season,
+                "models": store.model_features,
+            }
+        )
+
+    def fixture(self, query: Dict[str, str], **_: object) -> Response:
+        if "match_id" in query:
+            ref = _fixture_ref(query["match_id"])
+            if not isinstance(ref, int):
+                raise RequestError(400, "match_id must be an integer")
+            fixture = self.store.get_fixture_by_id(ref)
+        elif query.get("home") and query.get("away"):
+            fixture = self.store.get_fixture(query.get("season"), query["home"], query["away"])
+        else:
+            raise RequestError(400, "Pass match_id or home and away (and optionally season)")
+        return Response.json(_fixture_payload(fixture))
+
+    def batch(self, headers: Dict[str, str], body: bytes, **_: object) -> Response:
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as exc:
+            raise RequestError(400, f"Invalid JSON body: {exc}") from exc
+        if not isinstance(request, dict):
+            raise RequestError(400, "Body must be a JSON object")
+        model_name = request.get("model")
+        fixtures = request.get("fixtures")
+        if not isinstance(fixtures, list) and not (model_name and fixtures is None):
+            raise RequestError(400, "'fixtures' must be a list (or null with a model for every row)")
+        refs = None if fixtures is None else [_fixture_ref(value) for value in fixtures]
+        if not model_name:
+            return Response.json([_fixture_payload(fixture) for fixture in self.store.get_fixtures(refs)])
+
+        matrix, match_ids = self.store.get_feature_matrix(refs, model_name)
+        columns = self.store.model_features[model_name]
+        if BINARY_CONTENT_TYPE in headers.get("accept", ""):
+            return Response(
+                200,
+                encode_matrix(matrix, match_ids),
+                content_type=BINARY_CONTENT_TYPE,
+                headers={"X-Feature-Columns": ",".join(columns)},
+            )
+        return Response.json(
+            {
+                "model": model_name,
+                "columns": columns,
+                "match_ids": match_ids.tolist(),
+                "matrix": matrix.tolist(),
+            }
+        )
+
+    def refresh(self, **_: object) -> Response:
+        summary = self.store.refresh()
+        self.warm()
+        return Response.json({**asdict(summary), "dataset_digest": self.store.dataset_digest})
+
+    def stats(self, **_: object) -> Response:
+        cache = self.store.cache
+        memory = asdict(cache.stats()) if isinstance(cache, TieredFeatureCache) else None
+        return Response.json({"memory_cache": memory})
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, protocol = request_line.decode("latin-1").split()
+                except ValueError:
+                    writer.write(Response.json({"error": "Malformed request line"}, status=400).encode(False))
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = _content_length(headers)
+                if length is None:
+                    writer.write(Response.json({"error": "Invalid Content-Length"}, status=400).encode(False))
+                    break
+                if length > MAX_BODY_BYTES:
+                    writer.write(Response.json({"error": "Body too large"}, status=413).encode(False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = protocol == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write((await self.respond(method, target, headers, body)).encode(keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_server(
+    service: FeatureService,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_socket: Optional[Path] = None,
+) -> asyncio.base_events.Server:
+    """Start listening; pass `port=0` for an ephemeral port (see `server.sockets`)."""
+
+    if unix_socket is not None:
+        return await asyncio.start_unix_server(service.handle_connection, path=str(unix_socket))
+    return await asyncio.start_server(service.handle_connection, host=host, port=port)
+
+
+async def serve(service: FeatureService, **kwargs: object) -> None:
+    server = await start_server(service, **kwargs)
+    for sock in server.sockets:
+        LOGGER.info("Feature service listening on %s", sock.getsockname())
+    async with server:
+        await server.serve_forever()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve fixture features from a warm FeatureStore")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", type=Path, help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--dataset-version", dest="dataset_version", help="Dataset version label, e.g., 7")
+    parser.add_argument("--dataset", dest="dataset_path", type=Path, help="Explicit dataset CSV path")
+    parser.add_argument(
+        "--shared-memory",
+        action="store_true",
+        help="Attach to (or publish) the host-wide shared frame so several workers hold one copy",
+    )
+    parser.add_argument(
+        "--memory-cache-size",
+        type=int,
+        default=_env_number("FEATURE_MEMORY_CACHE_SIZE", SERVICE_MEMORY_CACHE_SIZE, int),
+        help="Fixture vectors kept in the in-process LRU tier (0 disables it)",
+    )
+    parser.add_argument(
+        "--memory-cache-ttl",
+        type=float,
+        default=_env_number("FEATURE_MEMORY_CACHE_TTL", SERVICE_MEMORY_CACHE_TTL),
+        help="Seconds before a memory-tier entry expires (0 never expires)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    store_kwargs = {}
+    if args.dataset_version:
+        store_kwargs["dataset_version"] = args.dataset_version
+    if args.dataset_path:
+        store_kwargs["dataset_path"] = args.dataset_path
+    store = FeatureStore(
+        shared_memory=args.shared_memory,
+        memory_cache_size=args.memory_cache_size,
+        memory_cache_ttl=args.memory_cache_ttl,
+        **store_kwargs,
+    )
+    service = FeatureService(store)
+    service.warm()
+    LOGGER.info("Loaded dataset v%s (%d rows)", service.store.dataset_version, len(service.store.df))
+    try:
+        asyncio.run(serve(service, host=args.host, port=args.port, unix_socket=args.unix_socket))
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
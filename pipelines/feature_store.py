@@ -7,33 +7,110 @@ web predictions without duplicating pandas logic.
 
 from __future__ import annotations
 
+import argparse
+import csv
+import hashlib
+import inspect
+import io
 import json
 import logging
 import os
 import sqlite3
-from dataclasses import dataclass
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+from pipelines.frame_snapshot import FrameSnapshot, file_digest, file_digests, snapshot_key
 from pipelines.notebook_catalog import (
     DEFAULT_EXPERIMENT_ROOT,
     NotebookRun,
     discover_latest_notebook_run,
     resolve_dataset_version,
 )
-from pipelines.team_cache import ensure_latest_team_caches
+from pipelines.shared_frame import SharedFrame, shared_frame_name
+from pipelines.team_cache import build_alias_table, ensure_latest_team_caches
+from pipelines.team_ledger import LEDGER_ROOT, TeamLedger
+from pipelines.typed_dataset import read_typed_dataset
 
 DEFAULT_DATASET_VERSION = "7"
 DEFAULT_ROLLING_WINDOW = 5
 CACHE_PATH = Path("understat_data") / "feature_cache.sqlite"
+# In-process LRU tier in front of the SQLite cache; FEATURE_MEMORY_CACHE_SIZE (entries,
+# 0 disables it) and FEATURE_MEMORY_CACHE_TTL (seconds, 0 never expires) override these.
+MEMORY_CACHE_SIZE = 1024
+MEMORY_CACHE_TTL = 600.0
+SNAPSHOT_ROOT = Path("understat_data") / "feature_snapshots"
 DATASET_TEMPLATE = "understat_data/Dataset_Version_{version}.csv"
 LOGGER = logging.getLogger(__name__)
 MODEL_NAMES = ("performance_dense", "momentum_policy_rl", "market_gradient_boost")
 
+FixtureRef = Union[int, Tuple[str, str, str]]
+
+KEY_COLUMNS = (
+    "match_id",
+    "league",
+    "season",
+    "match_datetime_utc",
+    "match_date",
+    "home_team_name",
+    "away_team_name",
+)
+CATEGORICAL_COLUMNS = ("league", "home_team_name", "away_team_name", "home_team", "away_team")
+_FORM_STATS = ("goals_for", "goals_against", "xg_for", "xg_against", "points")
+_SIDES = ("home", "away")
+FORM_SOURCE_COLUMNS = tuple(f"{side}_{stat}_last_5" for side in _SIDES for stat in _FORM_STATS)
+
+# (columns an augmentation step can add, dataset columns it reads). Team names and
+# season are always loaded as keys, so they are not repeated here.
+AUGMENTATION_STEPS: Tuple[Tuple[Tuple[str, ...], Tuple[str, ...]], ...] = (
+    (("prob_edge",), ("forecast_home_win", "forecast_away_win")),
+    (
+        (
+            "home_recent_games_frac",
+            "away_recent_games_frac",
+            *(f"{side}_{stat}_avg5" for side in _SIDES for stat in _FORM_STATS),
+            "att_gap_avg5",
+            "def_gap_avg5",
+            "points_gap_avg5",
+            "xg_att_gap_avg5",
+            "xg_def_gap_avg5",
+            "log_xg_ratio_avg5",
+        ),
+        FORM_SOURCE_COLUMNS,
+    ),
+    (
+        (
+            "home_shots_allowed",
+            "away_shots_allowed",
+            *(
+                f"{side}_shots_{kind}_{suffix}"
+                for suffix in ("avg5", "avg3")
+                for side in _SIDES
+                for kind in ("for", "allowed")
+            ),
+            "shot_vol_gap_avg5",
+            "shot_suppress_gap_avg5",
+            "log_shot_ratio_avg5",
+            "shots_tempo_avg5",
+            "shot_volume_gap_avg3",
+            "shot_suppress_gap_avg3",
+            "shots_tempo_avg3",
+            "shot_volume_gap_avg3_season_z",
+            "shot_suppress_gap_avg3_season_z",
+            "shots_tempo_avg3_season_z",
+        ),
+        ("home_shots_for", "away_shots_for"),
+    ),
+)
+
 FALLBACK_MODEL_FEATURES: Dict[str, Sequence[str]] = {
     "performance_dense": [
         "home_goal_diff_std5",
@@ -144,6 +221,23 @@ def _dataset_path_from_version(version: str) -> Path:
     return Path(DATASET_TEMPLATE.format(version=version))
 
 
+_AUGMENT_DIGEST: Optional[str] = None
+
+
+def augment_digest() -> str:
+    """sha256 of this module's source, which holds `_augment_dataframe` and every helper it calls.
+
+    Part of the snapshot key and the cache fingerprint, so editing the feature
+    code invalidates frames and vectors computed by the previous version.
+    """
+
+    global _AUGMENT_DIGEST
+    if _AUGMENT_DIGEST is None:
+        source = inspect.getsource(sys.modules[__name__])
+        _AUGMENT_DIGEST = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    return _AUGMENT_DIGEST
+
+
 class FeatureOrigin(str, Enum):
     DIRECT = "direct"
     DERIVED = "derived"
@@ -159,31 +253,204 @@ class FixtureFeatures:
     features: Dict[str, float]
 
 
+@dataclass
+class RefreshSummary:
+    mode: str  # "unchanged", "appended" or "rebuilt"
+    appended_rows: int = 0
+    updated_rows: int = 0
+
+
+@dataclass(frozen=True)
+class _FrameView:
+    """A frame and the lookup state derived from it, published as one object.
+
+    Readers take the view once per call, so a concurrent `refresh()` can never
+    pair the new frame with the old indexes or model matrices.
+    """
+
+    df: pd.DataFrame
+    fixture_index: Dict[Tuple[str, str, str], int]
+    match_index: Dict[int, int]
+    team_names: set[str]
+    team_aliases: Dict[str, str]
+    # model name -> (matrix, match ids), filled lazily for this frame only.
+    model_matrices: Dict[str, Tuple[np.ndarray, np.ndarray]] = field(default_factory=dict)
+
+    def resolve_team(self, name: str) -> str:
+        key = _normalize_name(name)
+        return self.team_aliases.get(key, key)
+
+
+CACHE_BUSY_TIMEOUT_MS = 5000
+# `PRAGMA user_version` of the cache file. 1 stored JSON payloads (never stamped, so it
+# reads as 0); 2 stored float32 blobs stamped with the dataset mtime; 3 keys rows by a
+# content fingerprint (see `FeatureStore.cache_fingerprint`).
+CACHE_SCHEMA_VERSION = 3
+# Keys per bulk SELECT: three parameters each, under SQLite's historical 999-parameter limit.
+CACHE_KEY_CHUNK = 300
+_CACHE_SELECT_SQL = """
+    SELECT schema_id, payload
+    FROM feature_cache
+    WHERE dataset_version = ? AND fingerprint = ? AND season = ? AND home = ? AND away = ?
+"""
+# Joining against the key list (rather than `IN (VALUES ...)`) lets SQLite probe the full primary key.
+_CACHE_SELECT_MANY_SQL = """
+    WITH wanted(season, home, away) AS (VALUES {placeholders})
+    SELECT cache.season, cache.home, cache.away, cache.schema_id, cache.payload
+    FROM wanted CROSS JOIN feature_cache AS cache
+    ON cache.dataset_version = ? AND cache.fingerprint = ? AND cache.season = wanted.season
+    AND cache.home = wanted.home AND cache.away = wanted.away
+"""
+_CACHE_UPSERT_SQL = """
+    INSERT OR REPLACE INTO feature_cache
+    (dataset_version, fingerprint, season, home, away, match_id, schema_id, payload)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_PAYLOAD_DTYPE = np.dtype("<f4")
+
+CacheKey = Tuple[str, str, str]
+
+
+@dataclass
+class CacheGcReport:
+    rows_before: int
+    rows_after: int
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def rows_deleted(self) -> int:
+        return self.rows_before - self.rows_after
+
+
 class FeatureCache:
-    """SQLite cache storing computed feature vectors per dataset version."""
+    """SQLite cache storing computed feature vectors per dataset version.
+
+    Rows are keyed by dataset version, a content fingerprint of the dataset and
+    feature schema, and the fixture. Touching or re-checking out the dataset keeps
+    the fingerprint, so entries stay valid; `gc` deletes rows of superseded
+    fingerprints and reclaims the space.
+
+    Each thread keeps one connection (reopened after a fork) in WAL mode, so
+    readers never block the writer and commits skip the per-transaction fsync.
+    Statement text is fixed per operation, so sqlite3's per-connection statement
+    cache hands back prepared statements. The `*_many` variants batch a whole
+    request into one transaction.
+
+    A row's payload is its feature values packed as little-endian float32; the
+    ordered column names are stored once in `feature_schema` and referenced by
+    `schema_id`. Reads decode the blob with `np.frombuffer`.
+    """
 
     def __init__(self, path: Path):
         self.path = path
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._schemas: Dict[int, Tuple[str, ...]] = {}
+        self._schema_ids: Dict[Tuple[str, ...], int] = {}
+        self._schema_lock = threading.Lock()
         self._ensure_schema()
 
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=CACHE_BUSY_TIMEOUT_MS / 1000, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA busy_timeout={CACHE_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self) -> None:
+        """Close the calling thread's connection; the next call reopens it."""
+
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def _ensure_schema(self) -> None:
-        with sqlite3.connect(self.path) as conn:
+        conn = self._connection()
+        if conn.execute("PRAGMA user_version").fetchone()[0] == CACHE_SCHEMA_VERSION:
+            return
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")  # serialise concurrent migrations
+            if conn.execute("PRAGMA user_version").fetchone()[0] == CACHE_SCHEMA_VERSION:
+                return
+            # Older layouts stamped rows with the dataset mtime, which says nothing about
+            # content, so their rows cannot be re-keyed; `prewarm` refills the cache.
+            dropped = 0
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feature_cache'").fetchone():
+                dropped = conn.execute("SELECT COUNT(*) FROM feature_cache").fetchone()[0]
+                conn.execute("DROP TABLE feature_cache")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS feature_schema (
+                    schema_id INTEGER PRIMARY KEY,
+                    columns TEXT NOT NULL UNIQUE
+                )
+                """
+            )
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS feature_cache (
+                CREATE TABLE feature_cache (
                     dataset_version TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
                     season TEXT NOT NULL,
                     home TEXT NOT NULL,
                     away TEXT NOT NULL,
                     match_id INTEGER NOT NULL,
-                    dataset_mtime REAL NOT NULL,
-                    payload TEXT NOT NULL,
-                    PRIMARY KEY (dataset_version, season, home, away)
+                    schema_id INTEGER NOT NULL REFERENCES feature_schema (schema_id),
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (dataset_version, fingerprint, season, home, away)
                 )
                 """
             )
-            conn.commit()
+            conn.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+        if dropped:
+            LOGGER.info(
+                "Upgraded %s to cache layout %d; dropped %d mtime-stamped rows",
+                self.path,
+                CACHE_SCHEMA_VERSION,
+                dropped,
+            )
+
+    def _schema_id(self, conn: sqlite3.Connection, columns: Tuple[str, ...]) -> int:
+        schema_id = self._schema_ids.get(columns)
+        if schema_id is None:
+            encoded = json.dumps(list(columns))
+            conn.execute("INSERT OR IGNORE INTO feature_schema (columns) VALUES (?)", (encoded,))
+            schema_id = conn.execute("SELECT schema_id FROM feature_schema WHERE columns = ?", (encoded,)).fetchone()[0]
+            with self._schema_lock:
+                self._schema_ids[columns] = schema_id
+                self._schemas[schema_id] = columns
+        return schema_id
+
+    def _columns(self, schema_id: int) -> Tuple[str, ...]:
+        columns = self._schemas.get(schema_id)
+        if columns is None:
+            row = self._connection().execute(
+                "SELECT columns FROM feature_schema WHERE schema_id = ?", (schema_id,)
+            ).fetchone()
+            columns = tuple(json.loads(row[0]))
+            with self._schema_lock:
+                self._schemas[schema_id] = columns
+                self._schema_ids[columns] = schema_id
+        return columns
+
+    def _encode(self, conn: sqlite3.Connection, features: Dict[str, float]) -> Tuple[int, bytes]:
+        values = np.fromiter(features.values(), dtype=_PAYLOAD_DTYPE, count=len(features))
+        return self._schema_id(conn, tuple(features)), values.tobytes()
+
+    def _decode(self, schema_id: int, payload: bytes) -> Dict[str, float]:
+        return dict(zip(self._columns(schema_id), self.decode_vector(payload).tolist()))
+
+    @staticmethod
+    def decode_vector(payload: bytes) -> np.ndarray:
+        """The stored feature values as a read-only float32 view of the blob."""
+
+        return np.frombuffer(payload, dtype=_PAYLOAD_DTYPE)
 
     def get(
         self,
@@ -191,24 +458,269 @@ class FeatureCache:
         season: str,
         home: str,
         away: str,
-        dataset_mtime: float,
+        fingerprint: str,
     ) -> Optional[Dict[str, float]]:
-        with sqlite3.connect(self.path) as conn:
+        params = (dataset_version, fingerprint, season, home, away)
+        row = self._connection().execute(_CACHE_SELECT_SQL, params).fetchone()
+        return self._decode(*row) if row else None
+
+    def get_many(
+        self,
+        dataset_version: str,
+        keys: Iterable[CacheKey],
+        fingerprint: str,
+    ) -> Dict[CacheKey, Dict[str, float]]:
+        """Cached vectors for the (season, home, away) keys present under `fingerprint`."""
+
+        unique = list(dict.fromkeys(keys))
+        found: Dict[CacheKey, Dict[str, float]] = {}
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")  # one read snapshot across chunks
+            for offset in range(0, len(unique), CACHE_KEY_CHUNK):
+                chunk = unique[offset : offset + CACHE_KEY_CHUNK]
+                placeholders = ", ".join(["(?, ?, ?)"] * len(chunk))
+                params = [*(part for key in chunk for part in key), dataset_version, fingerprint]
+                for season, home, away, schema_id, payload in conn.execute(
+                    _CACHE_SELECT_MANY_SQL.format(placeholders=placeholders), params
+                ):
+                    found[(season, home, away)] = self._decode(schema_id, payload)
+        return found
+
+    def set(
+        self,
+        dataset_version: str,
+        season: str,
+        home: str,
+        away: str,
+        fingerprint: str,
+        match_id: int,
+        features: Dict[str, float],
+    ) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                _CACHE_UPSERT_SQL,
+                (dataset_version, fingerprint, season, home, away, match_id, *self._encode(conn, features)),
+            )
+
+    def set_many(
+        self,
+        dataset_version: str,
+        fingerprint: str,
+        rows: Iterable[Tuple[str, str, str, int, Dict[str, float]]],
+    ) -> int:
+        """Upsert `(season, home, away, match_id, features)` rows in one transaction."""
+
+        conn = self._connection()
+        with conn:
+            params = [
+                (dataset_version, fingerprint, season, home, away, match_id, *self._encode(conn, features))
+                for season, home, away, match_id, features in rows
+            ]
+            conn.executemany(_CACHE_UPSERT_SQL, params)
+        return len(params)
+
+    def keys(self, dataset_version: str, fingerprint: str) -> set[CacheKey]:
+        """(season, home, away) keys cached under `fingerprint`."""
+
+        rows = self._connection().execute(
+            "SELECT season, home, away FROM feature_cache WHERE dataset_version = ? AND fingerprint = ?",
+            (dataset_version, fingerprint),
+        ).fetchall()
+        return {tuple(row) for row in rows}
+
+    def restamp(
+        self,
+        dataset_version: str,
+        old_fingerprint: str,
+        new_fingerprint: str,
+        updates: Optional[Dict[CacheKey, Tuple[int, Dict[str, float]]]] = None,
+    ) -> int:
+        """Carry vectors cached under `old_fingerprint` over to `new_fingerprint`.
+
+        `updates` maps (season, home, away) keys to replacement `(match_id,
+        features)`; only rows already in the cache are touched. Returns the number
+        of rows re-stamped.
+        """
+
+        conn = self._connection()
+        with conn:
+            if updates:
+                conn.executemany(
+                    """
+                    UPDATE feature_cache SET match_id = ?, schema_id = ?, payload = ?
+                    WHERE dataset_version = ? AND fingerprint = ? AND season = ? AND home = ? AND away = ?
+                    """,
+                    [
+                        (match_id, *self._encode(conn, features), dataset_version, old_fingerprint, season, home, away)
+                        for (season, home, away), (match_id, features) in updates.items()
+                    ],
+                )
             cursor = conn.execute(
+                "UPDATE OR REPLACE feature_cache SET fingerprint = ? WHERE dataset_version = ? AND fingerprint = ?",
+                (new_fingerprint, dataset_version, old_fingerprint),
+            )
+        return cursor.rowcount
+
+    def fingerprints(self) -> Dict[Tuple[str, str], int]:
+        """Row counts per (dataset_version, fingerprint)."""
+
+        rows = self._connection().execute(
+            "SELECT dataset_version, fingerprint, COUNT(*) FROM feature_cache GROUP BY dataset_version, fingerprint"
+        ).fetchall()
+        return {(version, fingerprint): count for version, fingerprint, count in rows}
+
+    def size_bytes(self) -> int:
+        """Bytes on disk, including the WAL."""
+
+        return sum(
+            path.stat().st_size
+            for path in (self.path, self.path.with_name(self.path.name + "-wal"))
+            if path.exists()
+        )
+
+    def gc(self, keep: Dict[str, str]) -> CacheGcReport:
+        """Delete rows whose version is not in `keep` or whose fingerprint is not `keep[version]`, then VACUUM."""
+
+        conn = self._connection()
+        rows_before = conn.execute("SELECT COUNT(*) FROM feature_cache").fetchone()[0]
+        bytes_before = self.size_bytes()
+        with conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS gc_keep (dataset_version TEXT, fingerprint TEXT)")
+            conn.execute("DELETE FROM gc_keep")
+            conn.executemany("INSERT INTO gc_keep VALUES (?, ?)", keep.items())
+            conn.execute(
+                """
+                DELETE FROM feature_cache WHERE NOT EXISTS (
+                    SELECT 1 FROM gc_keep
+                    WHERE gc_keep.dataset_version = feature_cache.dataset_version
+                    AND gc_keep.fingerprint = feature_cache.fingerprint
+                )
                 """
-                SELECT payload, dataset_mtime
-                FROM feature_cache
-                WHERE dataset_version = ? AND season = ? AND home = ? AND away = ?
-                """,
-                (dataset_version, season, home, away),
             )
-            row = cursor.fetchone()
-        if not row:
+            conn.execute("DELETE FROM feature_schema WHERE schema_id NOT IN (SELECT schema_id FROM feature_cache)")
+        with self._schema_lock:
+            self._schemas.clear()
+            self._schema_ids.clear()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        rows_after = conn.execute("SELECT COUNT(*) FROM feature_cache").fetchone()[0]
+        return CacheGcReport(rows_before, rows_after, bytes_before, self.size_bytes())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    disk_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    size: int = 0
+
+
+class TieredFeatureCache:
+    """Bounded, TTL-limited LRU of feature vectors in front of an optional `FeatureCache`.
+
+    Entries are keyed by dataset version and fingerprint as well as the fixture,
+    so the memory tier invalidates exactly like the disk tier. Reads fall through
+    to SQLite and promote what they find; writes go to both tiers. Vectors are
+    copied on the way in and out, so callers may mutate what they get back.
+    """
+
+    def __init__(
+        self,
+        disk: Optional[FeatureCache],
+        max_entries: int = MEMORY_CACHE_SIZE,
+        ttl: Optional[float] = MEMORY_CACHE_TTL,
+        clock=time.monotonic,
+    ):
+        self.disk = disk
+        self.max_entries = max_entries
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._clock = clock
+        # (version, fingerprint, season, home, away) -> (expiry, features), least recently used first.
+        self._entries: "OrderedDict[Tuple[str, str, str, str, str], Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(**{**self._stats.__dict__, "size": len(self._entries)})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, entry_key: Tuple[str, str, str, str, str], now: float) -> Optional[Dict[str, float]]:
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            self._stats.misses += 1
             return None
-        payload, cached_mtime = row
-        if abs(cached_mtime - dataset_mtime) > 1e-6:
+        if entry[0] < now:
+            del self._entries[entry_key]
+            self._stats.expirations += 1
+            self._stats.misses += 1
             return None
-        return json.loads(payload)
+        self._entries.move_to_end(entry_key)
+        self._stats.hits += 1
+        return dict(entry[1])
+
+    def _store(self, entry_key: Tuple[str, str, str, str, str], features: Dict[str, float], now: float) -> None:
+        if self.max_entries <= 0:
+            return
+        expires = now + self.ttl if self.ttl else float("inf")
+        self._entries[entry_key] = (expires, dict(features))
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    def get(
+        self,
+        dataset_version: str,
+        season: str,
+        home: str,
+        away: str,
+        fingerprint: str,
+    ) -> Optional[Dict[str, float]]:
+        entry_key = (dataset_version, fingerprint, season, home, away)
+        now = self._clock()
+        with self._lock:
+            features = self._lookup(entry_key, now)
+        if features is not None or self.disk is None:
+            return features
+        features = self.disk.get(dataset_version, season, home, away, fingerprint)
+        if features is not None:
+            with self._lock:
+                self._stats.disk_hits += 1
+                self._store(entry_key, features, now)
+        return features
+
+    def get_many(
+        self,
+        dataset_version: str,
+        keys: Iterable[CacheKey],
+        fingerprint: str,
+    ) -> Dict[CacheKey, Dict[str, float]]:
+        found: Dict[CacheKey, Dict[str, float]] = {}
+        missing: List[CacheKey] = []
+        now = self._clock()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                features = self._lookup((dataset_version, fingerprint, *key), now)
+                if features is None:
+                    missing.append(key)
+                else:
+                    found[key] = features
+        if missing and self.disk is not None:
+            loaded = self.disk.get_many(dataset_version, missing, fingerprint)
+            with self._lock:
+                self._stats.disk_hits += len(loaded)
+                for key, features in loaded.items():
+                    self._store((dataset_version, fingerprint, *key), features, now)
+            found.update(loaded)
+        return found
 
     def set(
         self,
@@ -216,28 +728,72 @@ class FeatureCache:
         season: str,
         home: str,
         away: str,
-        dataset_mtime: float,
+        fingerprint: str,
         match_id: int,
         features: Dict[str, float],
     ) -> None:
-        with sqlite3.connect(self.path) as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO feature_cache
-                (dataset_version, season, home, away, match_id, dataset_mtime, payload)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    dataset_version,
-                    season,
-                    home,
-                    away,
-                    match_id,
-                    dataset_mtime,
-                    json.dumps(features),
-                ),
-            )
-            conn.commit()
+        if self.disk is not None:
+            self.disk.set(dataset_version, season, home, away, fingerprint, match_id, features)
+        with self._lock:
+            self._store((dataset_version, fingerprint, season, home, away), features, self._clock())
+
+    def set_many(
+        self,
+        dataset_version: str,
+        fingerprint: str,
+        rows: Iterable[Tuple[str, str, str, int, Dict[str, float]]],
+    ) -> int:
+        rows = list(rows)
+        if self.disk is not None:
+            self.disk.set_many(dataset_version, fingerprint, rows)
+        now = self._clock()
+        with self._lock:
+            for season, home, away, _, features in rows:
+                self._store((dataset_version, fingerprint, season, home, away), features, now)
+        return len(rows)
+
+    def keys(self, dataset_version: str, fingerprint: str) -> set[CacheKey]:
+        if self.disk is not None:
+            return self.disk.keys(dataset_version, fingerprint)
+        with self._lock:
+            return {key[2:] for key in self._entries if key[:2] == (dataset_version, fingerprint)}
+
+    def restamp(
+        self,
+        dataset_version: str,
+        old_fingerprint: str,
+        new_fingerprint: str,
+        updates: Optional[Dict[CacheKey, Tuple[int, Dict[str, float]]]] = None,
+    ) -> int:
+        """`FeatureCache.restamp` for both tiers; memory entries keep their LRU position."""
+
+        updates = updates or {}
+        moved = 0
+        with self._lock:
+            rekeyed: "OrderedDict[Tuple[str, str, str, str, str], Tuple[float, Dict[str, float]]]" = OrderedDict()
+            for entry_key, (expires, features) in self._entries.items():
+                if entry_key[:2] == (dataset_version, old_fingerprint):
+                    fixture = entry_key[2:]
+                    if fixture in updates:
+                        features = dict(updates[fixture][1])
+                    entry_key = (dataset_version, new_fingerprint, *fixture)
+                    moved += 1
+                rekeyed[entry_key] = (expires, features)
+            self._entries = rekeyed
+        if self.disk is not None:
+            return self.disk.restamp(dataset_version, old_fingerprint, new_fingerprint, updates)
+        return moved
+
+
+def _env_number(name: str, default: float, cast=float):
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        LOGGER.warning("Ignoring %s=%r (not a number); using %s", name, raw, default)
+        return default
 
 
 class FeatureStore:
@@ -251,6 +807,12 @@ class FeatureStore:
         cache_path: Optional[Path] = CACHE_PATH,
         experiments_root: Path = DEFAULT_EXPERIMENT_ROOT,
         rolling_window: int = DEFAULT_ROLLING_WINDOW,
+        snapshot_root: Optional[Path] = SNAPSHOT_ROOT,
+        compact: bool = True,
+        shared_memory: bool = False,
+        memory_cache_size: Optional[int] = None,
+        memory_cache_ttl: Optional[float] = None,
+        ledger_root: Path = LEDGER_ROOT,
     ):
         notebook_run = discover_latest_notebook_run(experiments_root, model_names=MODEL_NAMES)
         env_version = os.getenv("FEATURE_DATASET_VERSION")
@@ -284,40 +846,371 @@ class FeatureStore:
             )
         self.dataset_mtime = self.dataset_path.stat().st_mtime
         self.rolling_window = rolling_window
-        self._df: Optional[pd.DataFrame] = None
+        self._view: Optional[_FrameView] = None
         self._latest_season: Optional[str] = None
         self._baseline_columns: Optional[set[str]] = None
         self._derived_columns: Optional[set[str]] = None
         self._unknown_features_logged: set[str] = set()
         self._required_features: Optional[List[str]] = None
-        self.cache = FeatureCache(cache_path) if cache_path else None
+        self._dataset_digest: Optional[str] = None
+        self._dataset_size: Optional[int] = None
+        self._cache_fingerprint: Optional[str] = None
+        self._imputed_shots = False
+        self.ledger_root = Path(ledger_root)
+        # league -> (ledger file mtime, ledger), reloaded when the pipeline rewrites the file.
+        self._ledgers: Dict[str, Tuple[Optional[int], TeamLedger]] = {}
+        self.snapshot_root = snapshot_root
+        self.compact = compact
+        # With shared_memory, the frame is published once per host and sibling processes attach to it.
+        self.shared_memory = shared_memory
+        self._shared_frame: Optional[SharedFrame] = None
+        # Guards the lazily built state so concurrent first calls build it once.
+        self._lock = threading.RLock()
+        disk_cache = FeatureCache(cache_path) if cache_path else None
+        # Explicit arguments win over the environment so the CLI and the service can size their own tier.
+        if memory_cache_size is None:
+            memory_cache_size = _env_number("FEATURE_MEMORY_CACHE_SIZE", MEMORY_CACHE_SIZE, int)
+        if memory_cache_ttl is None:
+            memory_cache_ttl = _env_number("FEATURE_MEMORY_CACHE_TTL", MEMORY_CACHE_TTL)
+        self.cache: Optional[Union[FeatureCache, TieredFeatureCache]] = disk_cache
+        if memory_cache_size > 0:
+            self.cache = TieredFeatureCache(disk_cache, memory_cache_size, memory_cache_ttl)
+
+    @property
+    def dataset_digest(self) -> str:
+        """sha256 of the dataset file, computed once per store."""
+
+        if self._dataset_digest is None:
+            self._dataset_size = self.dataset_path.stat().st_size
+            self._dataset_digest = file_digest(self.dataset_path, limit=self._dataset_size)
+        return self._dataset_digest
+
+    @property
+    def frame_key(self) -> str:
+        """Identifies the augmented frame: dataset content, feature code, rolling window, features and options."""
+
+        return snapshot_key(
+            self.dataset_digest,
+            self.rolling_window,
+            self.required_features,
+            {"compact": self.compact, "code": augment_digest()},
+        )
+
+    @property
+    def cache_fingerprint(self) -> str:
+        """Identifies cached vectors: dataset content, feature code, rolling window and the ordered feature schema.
+
+        Unlike the mtime it survives a `touch` or a fresh checkout of the same file.
+        """
+
+        if self._cache_fingerprint is None:
+            payload = json.dumps(
+                {
+                    "dataset": self.dataset_digest,
+                    "code": augment_digest(),
+                    "rolling_window": int(self.rolling_window),
+                    "features": self.required_features,
+                }
+            )
+            self._cache_fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+        return self._cache_fingerprint
+
+    @property
+    def snapshot(self) -> Optional[FrameSnapshot]:
+        if not self.snapshot_root:
+            return None
+        return FrameSnapshot(Path(self.snapshot_root) / self.dataset_path.stem, self.frame_key)
 
     @property
     def df(self) -> pd.DataFrame:
-        if self._df is None:
-            parse_dates = ["match_datetime_utc", "match_date"]
-            header = pd.read_csv(self.dataset_path, nrows=0)
-            date_cols = [col for col in parse_dates if col in header.columns]
-            df = pd.read_csv(self.dataset_path, parse_dates=date_cols)
-            if "match_datetime_utc" in df.columns:
-                df = df.sort_values("match_datetime_utc")
-            df["season"] = df["season"].astype(str)
-            df["home_team"] = df["home_team_name"]
-            df["away_team"] = df["away_team_name"]
-            df = df.reset_index(drop=True)
-            self._baseline_columns = set(df.columns)
-            _augment_dataframe(df, self.rolling_window)
-            self._derived_columns = set(df.columns) - set(self._baseline_columns)
-            self._df = df
-            if "season" in df.columns:
-                self._latest_season = (
-                    df["season"]
-                    .astype(int, errors="ignore")
-                    .astype(str)
-                    .max()
-                )
-            ensure_latest_team_caches(df)
-        return self._df
+        return self._frame_view().df
+
+    def _frame_view(self) -> _FrameView:
+        view = self._view
+        if view is None:
+            with self._lock:
+                if self._view is None:
+                    self._set_frame(self._load_frame())
+                view = self._view
+        return view
+
+    def _load_frame(self) -> pd.DataFrame:
+        _ = self.dataset_digest  # stamp the bytes the frame is built from, for refresh()
+        return self._load_shared() if self.shared_memory else self._load_or_build()
+
+    def _load_or_build(self) -> pd.DataFrame:
+        df = self._load_snapshot()
+        if df is None:
+            df = self._build_frame()
+            self._save_snapshot(df)
+        return df
+
+    def _set_frame(self, df: pd.DataFrame, start: int = 0) -> None:
+        """Publish `df` with its indexes as a new `_FrameView`.
+
+        The view is fully built before the single assignment that publishes it,
+        so readers on the lock-free path see either the old frame or the new
+        one, never a frame paired with half-built or stale lookup state.
+        """
+
+        view = self._build_view(df, start=start)
+        latest_season = self._latest_season
+        if "season" in df.columns:
+            latest_season = (
+                df["season"]
+                .astype(int, errors="ignore")
+                .astype(str)
+                .max()
+            )
+        with self._lock:
+            self._latest_season = latest_season
+            self._view = view
+        ensure_latest_team_caches(df)
+
+    def _read_dataset(self, source: Union[Path, io.BytesIO]) -> pd.DataFrame:
+        parse_dates = ["match_datetime_utc", "match_date"]
+        with self.dataset_path.open("rb") as fh:
+            columns = next(csv.reader([fh.readline().decode("utf-8-sig").rstrip("\r\n")]))
+        if self.compact:
+            columns = project_dataset_columns(columns, self.required_features)
+        date_cols = [col for col in parse_dates if col in columns]
+        df = None
+        if source == self.dataset_path:
+            df = read_typed_dataset(
+                self.dataset_path,
+                columns=columns if self.compact else None,
+                source_digest=self.dataset_digest,
+            )
+        if df is None:
+            df = pd.read_csv(
+                source,
+                usecols=columns if self.compact else None,
+                parse_dates=date_cols,
+            )
+        if "match_datetime_utc" in df.columns:
+            df = df.sort_values("match_datetime_utc")
+        df["season"] = df["season"].astype(str)
+        df["home_team"] = df["home_team_name"]
+        df["away_team"] = df["away_team_name"]
+        return df.reset_index(drop=True)
+
+    def _build_frame(self) -> pd.DataFrame:
+        df = self._read_dataset(self.dataset_path)
+        self._baseline_columns = set(df.columns)
+        self._imputed_shots = any(
+            pd.to_numeric(df[column], errors="coerce").isna().any()
+            for column in ("home_shots_for", "away_shots_for")
+            if column in df.columns
+        )
+        _augment_dataframe(df, self.rolling_window)
+        self._derived_columns = set(df.columns) - set(self._baseline_columns)
+        if self.compact:
+            df = _compact_frame(df)
+        return df
+
+    def memory_usage(self) -> int:
+        """Bytes held by the feature frame, counting string and category payloads."""
+
+        return int(self.df.memory_usage(deep=True).sum())
+
+    def _build_view(self, df: pd.DataFrame, start: int = 0) -> _FrameView:
+        """Hash fixtures by (season, home, away) and match_id; first row wins on duplicates.
+
+        With `start`, rows from that position on are added to copies of the
+        current view's indexes; a published view is never modified.
+        """
+
+        previous = self._view if start else None
+        fixture_index = dict(previous.fixture_index) if previous else {}
+        match_index = dict(previous.match_index) if previous else {}
+        team_names = set(previous.team_names) if previous else set()
+        seasons = [_normalize_name(value) for value in df["season"].to_numpy()[start:]]
+        homes = [_normalize_name(value) for value in df["home_team_name"].to_numpy()[start:]]
+        aways = [_normalize_name(value) for value in df["away_team_name"].to_numpy()[start:]]
+        for position, key in enumerate(zip(seasons, homes, aways), start=start):
+            fixture_index.setdefault(key, position)
+        if "match_id" in df.columns:
+            for position, match_id in enumerate(df["match_id"].to_numpy()[start:], start=start):
+                match_index.setdefault(int(match_id), position)
+        team_names.update(homes, aways)
+        return _FrameView(df, fixture_index, match_index, team_names, build_alias_table(team_names))
+
+    def resolve_team(self, name: str) -> str:
+        """Return the normalized dataset name for a team, following aliases like "Man City"."""
+
+        return self._frame_view().resolve_team(name)
+
+    def _load_snapshot(self) -> Optional[pd.DataFrame]:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        loaded = snapshot.load(mmap=True)
+        if loaded is None:
+            return None
+        df, extra = loaded
+        self._apply_frame_extra(extra)
+        LOGGER.debug("Loaded feature snapshot %s", snapshot.path)
+        return df
+
+    def _save_snapshot(self, df: pd.DataFrame) -> None:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return
+        try:
+            snapshot.save(df, self._frame_extra())
+            snapshot.prune_siblings({"dataset_digest": self.dataset_digest, "code_digest": augment_digest()})
+        except OSError as exc:
+            LOGGER.warning("Could not write feature snapshot %s: %s", snapshot.path, exc)
+
+    def _frame_extra(self) -> dict:
+        return {
+            "dataset_path": str(self.dataset_path),
+            "dataset_digest": self.dataset_digest,
+            "code_digest": augment_digest(),
+            "rolling_window": self.rolling_window,
+            "compact": self.compact,
+            "baseline_columns": sorted(self._baseline_columns or ()),
+            "derived_columns": sorted(self._derived_columns or ()),
+            "imputed_shots": self._imputed_shots,
+        }
+
+    def _apply_frame_extra(self, extra: dict) -> None:
+        self._baseline_columns = set(extra.get("baseline_columns", []))
+        self._derived_columns = set(extra.get("derived_columns", []))
+        self._imputed_shots = bool(extra.get("imputed_shots", True))
+
+    def _load_shared(self, df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Return the frame from the host's shared-memory segment, publishing it if none exists.
+
+        Publishing happens under an inter-process lock, so workers starting together
+        build the frame once: the first one publishes and the rest attach to it.
+        `df` is published as-is; otherwise the frame comes from the snapshot or a build.
+        """
+
+        shared = SharedFrame(shared_frame_name(self.frame_key))
+        loaded = shared.load()
+        if loaded is None:
+            with shared.publish_lock():
+                loaded = shared.load()
+                if loaded is None:
+                    if df is None:
+                        df = self._load_or_build()
+                    loaded = shared.publish(df, self._frame_extra())
+        df, extra = loaded
+        self._apply_frame_extra(extra)
+        if self._shared_frame is not None and self._shared_frame.name != shared.name:
+            self._shared_frame.unlink()  # no-op unless this process published the superseded frame
+        self._shared_frame = shared
+        return df
+
+    def refresh(self) -> RefreshSummary:
+        """Bring the frame in line with the dataset file after it changed on disk.
+
+        When the file only grew (the bytes the frame was built from are still its
+        prefix) and the new rows are later fixtures with unseen match ids, only
+        those rows are parsed and augmented (`_augment_appended`). Cached vectors
+        are then re-stamped instead of dropped, and the few older fixtures whose
+        features moved are rewritten in place. Any other edit triggers a full reload.
+        """
+
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> RefreshSummary:
+        if self._view is None or self._dataset_size is None:
+            return self._reload()
+        stat = self.dataset_path.stat()
+        old_fingerprint = self.cache_fingerprint
+        built_size = self._dataset_size
+        prefix_digest, digest = file_digests(self.dataset_path, min(built_size, stat.st_size), stat.st_size)
+        if prefix_digest != self._dataset_digest:
+            return self._reload()
+        if stat.st_size == built_size:
+            # Same content, so the cache fingerprint and every cached vector still hold.
+            self.dataset_mtime = stat.st_mtime
+            return RefreshSummary("unchanged")
+        old = self._view.df
+        tail = self._read_appended(built_size, stat.st_size)
+        if tail is None or not self._can_append(old, tail):
+            return self._reload()
+
+        start = len(old)
+        head, tail = _align_appended(old, tail, self._derived_columns or set())
+        df = pd.concat([head, tail])
+        changed = _augment_appended(df, start, self.rolling_window, self._baseline_columns or set())
+        target = head.dtypes
+        for column in [column for column, dtype in df.dtypes.items() if dtype != target[column]]:
+            df[column] = df[column].astype(target[column])
+
+        self.dataset_mtime = stat.st_mtime
+        self._dataset_size = stat.st_size
+        self._dataset_digest = digest
+        self._cache_fingerprint = None
+        self._save_snapshot(df)
+        if self.shared_memory:
+            df = self._load_shared(df)
+        self._set_frame(df, start=start)
+        updated = np.flatnonzero(changed[:start])
+        self._restamp_cache(old_fingerprint, updated)
+        return RefreshSummary("appended", appended_rows=len(tail), updated_rows=len(updated))
+
+    def _reload(self) -> RefreshSummary:
+        # The old frame keeps serving lock-free readers until `_set_frame` swaps in the new one.
+        self._dataset_digest = None
+        self._dataset_size = None
+        self._cache_fingerprint = None
+        self.dataset_mtime = self.dataset_path.stat().st_mtime
+        df = self._load_frame()
+        self._set_frame(df)
+        return RefreshSummary("rebuilt", updated_rows=len(df))
+
+    def _read_appended(self, built_size: int, size: int) -> Optional[pd.DataFrame]:
+        """Parse the rows written after the first `built_size` bytes, or None if they do not start a new line."""
+
+        with self.dataset_path.open("rb") as fh:
+            header = fh.readline()
+            fh.seek(built_size - 1)
+            appended = fh.read(size - built_size + 1)
+        if not appended.startswith(b"\n"):
+            return None
+        return self._read_dataset(io.BytesIO(header + appended[1:]))
+
+    def _can_append(self, old: pd.DataFrame, tail: pd.DataFrame) -> bool:
+        """Whether `tail` can be augmented on top of `old` without touching earlier team histories."""
+
+        baseline = self._baseline_columns or set()
+        required = {"match_id", "match_datetime_utc", "season", "home_team_name", "away_team_name"}
+        if tail.empty or set(tail.columns) != baseline or not required.issubset(baseline):
+            return False
+        if tail[sorted(required)].isna().to_numpy().any():
+            return False
+        match_ids = tail["match_id"]
+        if match_ids.duplicated().any() or any(int(value) in self._view.match_index for value in match_ids):
+            return False
+        if tail["match_datetime_utc"].min() < old["match_datetime_utc"].max():
+            return False
+        shot_columns = ("home_shots_for", "away_shots_for")
+        if set(shot_columns).issubset(baseline):
+            # Imputed shot counts follow the dataset median, which moves with every append.
+            if self._imputed_shots:
+                return False
+            if any(pd.to_numeric(tail[column], errors="coerce").isna().any() for column in shot_columns):
+                return False
+        return True
+
+    def _restamp_cache(self, old_fingerprint: str, updated: np.ndarray) -> None:
+        if not self.cache:
+            return
+        cached = self.cache.keys(self.dataset_version, old_fingerprint)
+        updates: Dict[Tuple[str, str, str], Tuple[int, Dict[str, float]]] = {}
+        df = self._view.df
+        names = zip(*(df[column].to_numpy()[updated] for column in ("season", "home_team_name", "away_team_name")))
+        for position, values in zip(updated, names):
+            key = tuple(_normalize_name(value) for value in values)
+            if key in cached:
+                row = df.iloc[position]
+                updates[key] = (int(row["match_id"]), self._row_features(row))
+        self.cache.restamp(self.dataset_version, old_fingerprint, self.cache_fingerprint, updates)
 
     @property
     def latest_season(self) -> str:
@@ -328,13 +1221,20 @@ class FeatureStore:
     @property
     def required_features(self) -> List[str]:
         if self._required_features is None:
-            unique: Dict[str, None] = {}
-            for feature in _flatten(self._model_features.values()):
-                if feature not in unique:
-                    unique[feature] = None
-            self._required_features = list(unique.keys())
+            with self._lock:
+                unique: Dict[str, None] = {}
+                for feature in _flatten(self._model_features.values()):
+                    if feature not in unique:
+                        unique[feature] = None
+                self._required_features = list(unique.keys())
         return self._required_features
 
+    @property
+    def model_features(self) -> Dict[str, List[str]]:
+        """Feature columns per model, in the order `get_feature_matrix` emits them."""
+
+        return {name: list(features) for name, features in self._model_features.items()}
+
     @property
     def feature_lineage(self) -> Dict[str, FeatureOrigin]:
         lineage: Dict[str, FeatureOrigin] = {}
@@ -350,29 +1250,216 @@ class FeatureStore:
         return lineage
 
     def get_fixture_by_id(self, match_id: int) -> FixtureFeatures:
-        row = self.df.loc[self.df["match_id"] == match_id]
-        if row.empty:
+        view = self._frame_view()
+        position = view.match_index.get(int(match_id))
+        if position is None:
             raise ValueError(f"match_id {match_id} not found in dataset")
-        return self._build_features_from_row(row.iloc[0])
+        return self._build_features_from_row(view.df.iloc[position])
 
     def get_fixture(self, season: Optional[str], home: str, away: str) -> FixtureFeatures:
         season = season or self.latest_season
+        view = self._frame_view()
+        key = (_normalize_name(season), view.resolve_team(home), view.resolve_team(away))
+        position = view.fixture_index.get(key)
+        if position is None:
+            raise ValueError(f"Fixture {home} vs {away} ({season}) not found")
+        return self._build_features_from_row(view.df.iloc[position])
+
+    def get_fixtures(self, fixtures: Iterable[FixtureRef]) -> List[FixtureFeatures]:
+        """`get_fixture` for a batch: one cache read and one cache write transaction in total."""
+
+        view = self._frame_view()
+        rows = [view.df.iloc[position] for position in self._positions(fixtures, view)]
+        keys = [_cache_key(row) for row in rows]
+        cached = self.cache.get_many(self.dataset_version, keys, self.cache_fingerprint) if self.cache else {}
+        results: List[FixtureFeatures] = []
+        missing: List[Tuple[str, str, str, int, Dict[str, float]]] = []
+        for row, key in zip(rows, keys):
+            match_id = int(row["match_id"])
+            features = cached.get(key)
+            if features is None:
+                features = self._row_features(row)
+                missing.append((*key, match_id, features))
+            results.append(
+                FixtureFeatures(
+                    match_id=match_id,
+                    home_team=str(row["home_team_name"]),
+                    away_team=str(row["away_team_name"]),
+                    season=str(row["season"]),
+                    features=features,
+                )
+            )
+        if self.cache and missing:
+            self.cache.set_many(self.dataset_version, self.cache_fingerprint, missing)
+        return results
+
+    def prewarm(self, season: Optional[str] = None, league: Optional[str] = None) -> int:
+        """Cache the vector of every fixture in `season` (and `league`) in one bulk write.
+
+        Only fixtures in the dataset are covered, and the builds keep completed
+        matches only, so scheduled fixtures are not cached. Values come from a
+        single column projection rather than per-row lookups and match
+        `get_fixture` exactly. Returns the number of fixtures written.
+        """
+
+        if self.cache is None:
+            raise RuntimeError("prewarm needs a feature cache; this store was created without one")
+        view = self._frame_view()
+        df = view.df
+        season = _normalize_name(season or self.latest_season)
+        mask = np.asarray([_normalize_name(value) == season for value in df["season"].to_numpy()])
+        if league:
+            if "league" not in df.columns:
+                raise ValueError(f"Dataset {self.dataset_version} has no league column")
+            mask &= np.asarray([_normalize_name(value) == _normalize_name(league) for value in df["league"].to_numpy()])
+        # Keep the row each key resolves to (the first one), like the fixture index does.
+        keyed = [
+            (position, (season, _normalize_name(home), _normalize_name(away)))
+            for position, home, away in zip(
+                np.flatnonzero(mask),
+                df["home_team_name"].to_numpy()[mask],
+                df["away_team_name"].to_numpy()[mask],
+            )
+        ]
+        keyed = [(position, key) for position, key in keyed if view.fixture_index.get(key) == position]
+        if not keyed:
+            return 0
+        positions = np.asarray([position for position, _ in keyed], dtype=np.intp)
+        features = self.required_features
+        values = df.iloc[positions].reindex(columns=features).to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(values)
+        for feature, has_missing in zip(features, missing.any(axis=0)):
+            if has_missing and self.feature_lineage.get(feature, FeatureOrigin.UNKNOWN) is FeatureOrigin.UNKNOWN:
+                self._warn_unknown_feature(feature)
+        # The projection can be a read-only view of a memory-mapped snapshot, so fill out of place.
+        values = np.where(missing, 0.0, values)
+        match_ids = df["match_id"].to_numpy(dtype=np.int64)[positions].tolist()
+        rows = [
+            (*key, match_id, dict(zip(features, vector)))
+            for (_, key), match_id, vector in zip(keyed, match_ids, values.tolist())
+        ]
+        return self.cache.set_many(self.dataset_version, self.cache_fingerprint, rows)
+
+    def team_ledger(self, league: str) -> TeamLedger:
+        """The persisted team ledger of `league` (empty when none was saved)."""
+
+        path = TeamLedger.path(league, self.ledger_root)
+        mtime = path.stat().st_mtime_ns if path.exists() else None
+        with self._lock:
+            cached = self._ledgers.get(league)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, TeamLedger.load(league, self.ledger_root))
+                self._ledgers[league] = cached
+        return cached[1]
+
+    def team_history(
+        self,
+        team: str,
+        *,
+        league: Optional[str] = None,
+        before: Optional[object] = None,
+        last: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """A team's completed matches from the team ledger, oldest first.
+
+        `team` is resolved like fixture names ("Man City" works). `league`
+        defaults to the league the team plays in within the dataset; `before`
+        and `last` are passed to `TeamLedger.team`.
+        """
+
         df = self.df
-        mask = (
-            (df["season"].astype(str) == str(season))
-            & (df["home_team_name"].str.lower() == home.lower())
-            & (df["away_team_name"].str.lower() == away.lower())
+        name = self.resolve_team(team)
+        if league is None:
+            if "league" not in df.columns:
+                raise ValueError(f"Dataset {self.dataset_version} has no league column; pass league=")
+            plays = np.asarray([_normalize_name(value) == name for value in df["home_team_name"].to_numpy()])
+            if not plays.any():
+                raise KeyError(f"Unknown team {team!r}")
+            league = str(df["league"].to_numpy()[np.flatnonzero(plays)[-1]])
+        return self.team_ledger(league).team(name, before=before, last=last)
+
+    def get_feature_matrix(
+        self,
+        fixtures: Optional[Iterable[FixtureRef]],
+        model_name: str,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return `(matrix, match_ids)` for a batch of fixtures.
+
+        `fixtures` holds match ids or `(season, home, away)` tuples; None selects
+        every row. The matrix is a C-contiguous float32 array whose columns follow
+        the model's feature order, with missing values set to 0 like the
+        per-fixture path. With `fixtures=None` both arrays are the store's
+        cached ones and are read-only; copy them before scaling or imputing
+        in place. Batches are fresh, writable arrays.
+        """
+
+        view = self._frame_view()
+        matrix, match_ids = self._model_matrix(model_name, view)
+        if fixtures is None:
+            return matrix, match_ids
+        positions = self._positions(fixtures, view)
+        return np.ascontiguousarray(matrix[positions]), match_ids[positions]
+
+    def _model_matrix(self, model_name: str, view: _FrameView) -> Tuple[np.ndarray, np.ndarray]:
+        """The model's matrix and the match ids of its rows, built once per view."""
+
+        cached = view.model_matrices.get(model_name)
+        if cached is not None:
+            return cached
+        if model_name not in self._model_features:
+            raise ValueError(f"Unknown model '{model_name}'; expected one of {sorted(self._model_features)}")
+        with self._lock:
+            cached = view.model_matrices.get(model_name)
+            if cached is None:
+                features = list(self._model_features[model_name])
+                df = view.df
+                for feature in features:
+                    if feature not in df.columns:
+                        self._warn_unknown_feature(feature)
+                matrix = df.reindex(columns=features).to_numpy(dtype=np.float32, na_value=np.nan)
+                # to_numpy may hand back a read-only view of a float32 frame, so fill out of place.
+                matrix = np.ascontiguousarray(np.where(np.isnan(matrix), np.float32(0.0), matrix))
+                match_ids = df["match_id"].to_numpy(dtype=np.int64)
+                # Handed out as is for fixtures=None, so an in-place edit by one caller cannot leak into the next.
+                matrix.flags.writeable = False
+                match_ids.flags.writeable = False
+                cached = (matrix, match_ids)
+                view.model_matrices[model_name] = cached
+        return cached
+
+    def _positions(self, fixtures: Iterable[FixtureRef], view: _FrameView) -> np.ndarray:
+        positions: List[int] = []
+        for fixture in fixtures:
+            if isinstance(fixture, tuple):
+                season, home, away = fixture
+                season = season or self.latest_season
+                key = (_normalize_name(season), view.resolve_team(home), view.resolve_team(away))
+                position = view.fixture_index.get(key)
+                if position is None:
+                    raise ValueError(f"Fixture {home} vs {away} ({season}) not found")
+            else:
+                position = view.match_index.get(int(fixture))
+                if position is None:
+                    raise ValueError(f"match_id {fixture} not found in dataset")
+            positions.append(position)
+        return np.asarray(positions, dtype=np.intp)
+
+    def _warn_unknown_feature(self, feature: str) -> None:
+        with self._lock:
+            if feature in self._unknown_features_logged:
+                return
+            self._unknown_features_logged.add(feature)
+        LOGGER.warning(
+            "Feature '%s' missing from dataset %s; defaulting to 0.",
+            feature,
+            self.dataset_version,
         )
-        row = df.loc[mask]
-        if row.empty:
-            raise ValueError(f"Fixture {home} vs {away} ({season}) not found")
-        return self._build_features_from_row(row.iloc[0])
 
     def _build_features_from_row(self, row: pd.Series) -> FixtureFeatures:
         season = str(row["season"])
         home = str(row["home_team_name"])
         away = str(row["away_team_name"])
-        cache_key = (_normalize_name(season), _normalize_name(home), _normalize_name(away))
+        cache_key = _cache_key(row)
         match_id = int(row["match_id"])
         if self.cache:
             cached = self.cache.get(
@@ -380,7 +1467,7 @@ class FeatureStore:
                 cache_key[0],
                 cache_key[1],
                 cache_key[2],
-                self.dataset_mtime,
+                self.cache_fingerprint,
             )
             if cached:
                 feature_dict = {k: float(v) for k, v in cached.items()}
@@ -391,28 +1478,14 @@ class FeatureStore:
                     season=season,
                     features=feature_dict,
                 )
-        features: Dict[str, float] = {}
-        for feature in self.required_features:
-            value = row.get(feature)
-            if pd.isna(value):
-                origin = self.feature_lineage.get(feature, FeatureOrigin.UNKNOWN)
-                if origin is FeatureOrigin.UNKNOWN and feature not in self._unknown_features_logged:
-                    LOGGER.warning(
-                        "Feature '%s' missing from dataset %s; defaulting to 0.",
-                        feature,
-                        self.dataset_version,
-                    )
-                    self._unknown_features_logged.add(feature)
-                features[feature] = 0.0
-            else:
-                features[feature] = float(value)
+        features = self._row_features(row)
         if self.cache:
             self.cache.set(
                 self.dataset_version,
                 cache_key[0],
                 cache_key[1],
                 cache_key[2],
-                self.dataset_mtime,
+                self.cache_fingerprint,
                 match_id,
                 features,
             )
@@ -424,6 +1497,27 @@ class FeatureStore:
             features=features,
         )
 
+    def _row_features(self, row: pd.Series) -> Dict[str, float]:
+        features: Dict[str, float] = {}
+        for feature in self.required_features:
+            value = row.get(feature)
+            if pd.isna(value):
+                origin = self.feature_lineage.get(feature, FeatureOrigin.UNKNOWN)
+                if origin is FeatureOrigin.UNKNOWN:
+                    self._warn_unknown_feature(feature)
+                features[feature] = 0.0
+            else:
+                features[feature] = float(value)
+        return features
+
+
+def _cache_key(row: pd.Series) -> Tuple[str, str, str]:
+    return (
+        _normalize_name(str(row["season"])),
+        _normalize_name(str(row["home_team_name"])),
+        _normalize_name(str(row["away_team_name"])),
+    )
+
 
 def _flatten(items: Iterable[Iterable[str]]) -> Iterable[str]:
     for seq in items:
@@ -438,6 +1532,54 @@ def _guess_version_from_name(filename: str) -> Optional[str]:
     return None
 
 
+def project_dataset_columns(header: Sequence[str], features: Iterable[str]) -> List[str]:
+    """Dataset columns needed to serve `features`, in header order.
+
+    Keeps the key columns, requested features stored in the dataset, and for
+    every augmentation step that produces a requested feature its inputs plus
+    any of its outputs the dataset already carries (those short-circuit the
+    step, so dropping them would change the derived values).
+    """
+
+    requested = set(features)
+    wanted = set(KEY_COLUMNS) | requested
+    for outputs, inputs in AUGMENTATION_STEPS:
+        if requested.intersection(outputs):
+            wanted.update(inputs)
+            wanted.update(outputs)
+    return [column for column in header if column in wanted]
+
+
+def _compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Store numeric features as float32 and team/league names as categoricals.
+
+    Runs after augmentation so derived features are computed from the same
+    float64 inputs as the full frame. `match_id` keeps its integer dtype, and so
+    do the smoothed-average sources, which `FeatureStore.refresh` reads again when
+    the priors move. Home and away names share one category set.
+    """
+
+    team_columns = [col for col in ("home_team_name", "away_team_name") if col in df.columns]
+    teams = pd.Index(
+        pd.unique(pd.concat([df[col] for col in team_columns]).dropna()) if team_columns else []
+    )
+    columns: Dict[str, pd.Series] = {}
+    for name in df.columns:
+        series = df[name]
+        if name in CATEGORICAL_COLUMNS:
+            categories = teams if name != "league" else None
+            series = series.astype(pd.CategoricalDtype(categories))
+        elif (
+            name != "match_id"
+            and name not in FORM_SOURCE_COLUMNS
+            and isinstance(series.dtype, np.dtype)
+            and series.dtype.kind in "iuf"
+        ):
+            series = series.astype(np.float32)
+        columns[name] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
 def _augment_dataframe(df: pd.DataFrame, rolling_window: int) -> None:
     if "prob_edge" not in df.columns and {
         "forecast_home_win",
@@ -464,28 +1606,48 @@ def _prepare_smoothed_form(df: pd.DataFrame, rolling_window: int) -> None:
         df["away_recent_games_frac"] = (away_games / window).astype(np.float32)
 
     if "home_goals_for_avg5" not in df.columns and "home_goals_for_last_5" in df.columns:
-        df["home_goals_for_avg5"] = _smoothed_avg(df["home_goals_for_last_5"], df["home_recent_games_frac"], window)
-        df["home_goals_against_avg5"] = _smoothed_avg(df["home_goals_against_last_5"], df["home_recent_games_frac"], window)
-        df["home_xg_for_avg5"] = _smoothed_avg(df["home_xg_for_last_5"], df["home_recent_games_frac"], window)
-        df["home_xg_against_avg5"] = _smoothed_avg(df["home_xg_against_last_5"], df["home_recent_games_frac"], window)
-        df["home_points_avg5"] = _smoothed_avg(df["home_points_last_5"], df["home_recent_games_frac"], window)
-
-        df["away_goals_for_avg5"] = _smoothed_avg(df["away_goals_for_last_5"], df["away_recent_games_frac"], window)
-        df["away_goals_against_avg5"] = _smoothed_avg(df["away_goals_against_last_5"], df["away_recent_games_frac"], window)
-        df["away_xg_for_avg5"] = _smoothed_avg(df["away_xg_for_last_5"], df["away_recent_games_frac"], window)
-        df["away_xg_against_avg5"] = _smoothed_avg(df["away_xg_against_last_5"], df["away_recent_games_frac"], window)
-        df["away_points_avg5"] = _smoothed_avg(df["away_points_last_5"], df["away_recent_games_frac"], window)
+        for side in _SIDES:
+            for stat in _FORM_STATS:
+                df[f"{side}_{stat}_avg5"] = _smoothed_avg(
+                    df[f"{side}_{stat}_last_5"], df[f"{side}_recent_games_frac"], window
+                )
 
     if "att_gap_avg5" not in df.columns and {"home_goals_for_avg5", "away_goals_for_avg5"}.issubset(df.columns):
-        df["att_gap_avg5"] = df["home_goals_for_avg5"] - df["away_goals_for_avg5"]
-        df["def_gap_avg5"] = df["away_goals_against_avg5"] - df["home_goals_against_avg5"]
-        df["points_gap_avg5"] = df["home_points_avg5"] - df["away_points_avg5"]
-        df["xg_att_gap_avg5"] = df["home_xg_for_avg5"] - df["away_xg_for_avg5"]
-        df["xg_def_gap_avg5"] = df["away_xg_against_avg5"] - df["home_xg_against_avg5"]
-        eps = 1e-3
-        df["log_xg_ratio_avg5"] = np.log(
+        for name, values in _form_gap_columns(df).items():
+            df[name] = values
+
+
+def _form_gap_columns(df: pd.DataFrame) -> Dict[str, pd.Series]:
+    eps = 1e-3
+    return {
+        "att_gap_avg5": df["home_goals_for_avg5"] - df["away_goals_for_avg5"],
+        "def_gap_avg5": df["away_goals_against_avg5"] - df["home_goals_against_avg5"],
+        "points_gap_avg5": df["home_points_avg5"] - df["away_points_avg5"],
+        "xg_att_gap_avg5": df["home_xg_for_avg5"] - df["away_xg_for_avg5"],
+        "xg_def_gap_avg5": df["away_xg_against_avg5"] - df["home_xg_against_avg5"],
+        "log_xg_ratio_avg5": np.log(
             (df["home_xg_for_avg5"] + eps) / (df["away_xg_for_avg5"] + eps)
-        ).replace([np.inf, -np.inf], 0.0)
+        ).replace([np.inf, -np.inf], 0.0),
+    }
+
+
+SHOT_ZSCORE_COLUMNS = ("shot_volume_gap_avg3", "shot_suppress_gap_avg3", "shots_tempo_avg3")
+SHOT_FLOAT_COLUMNS = (
+    "home_shots_for_avg5",
+    "away_shots_for_avg5",
+    "home_shots_allowed_avg5",
+    "away_shots_allowed_avg5",
+    "home_shots_for_avg3",
+    "away_shots_for_avg3",
+    "home_shots_allowed_avg3",
+    "away_shots_allowed_avg3",
+    "shot_vol_gap_avg5",
+    "shot_suppress_gap_avg5",
+    "shot_volume_gap_avg3",
+    "shot_suppress_gap_avg3",
+    "shots_tempo_avg5",
+    "shots_tempo_avg3",
+)
 
 
 def _prepare_shot_features(df: pd.DataFrame, rolling_window: int) -> None:
@@ -499,63 +1661,267 @@ def _prepare_shot_features(df: pd.DataFrame, rolling_window: int) -> None:
     df["home_shots_allowed"] = df["away_shots_for"]
     df["away_shots_allowed"] = df["home_shots_for"]
 
-    df["home_shots_for_avg5"] = _prior_rolling_mean(df, "home_team_name", "home_shots_for", rolling_window)
-    df["away_shots_for_avg5"] = _prior_rolling_mean(df, "away_team_name", "away_shots_for", rolling_window)
-    df["home_shots_allowed_avg5"] = _prior_rolling_mean(df, "home_team_name", "home_shots_allowed", rolling_window)
-    df["away_shots_allowed_avg5"] = _prior_rolling_mean(df, "away_team_name", "away_shots_allowed", rolling_window)
+    for name, values in _shot_rolling_columns(df, rolling_window).items():
+        df[name] = values
+    for name, values in _shot_gap_columns(df).items():
+        df[name] = values
+    for column in SHOT_ZSCORE_COLUMNS:
+        df[f"{column}_season_z"] = _season_zscore(df, column)
 
+    for column in SHOT_FLOAT_COLUMNS:
+        df[column] = df[column].astype(np.float32).fillna(0.0)
+
+
+def _shot_rolling_columns(
+    df: pd.DataFrame,
+    rolling_window: int,
+    medians: Optional[Dict[str, float]] = None,
+) -> Dict[str, pd.Series]:
     short_window = min(3, rolling_window)
-    df["home_shots_for_avg3"] = _prior_rolling_mean(df, "home_team_name", "home_shots_for", short_window)
-    df["away_shots_for_avg3"] = _prior_rolling_mean(df, "away_team_name", "away_shots_for", short_window)
-    df["home_shots_allowed_avg3"] = _prior_rolling_mean(df, "home_team_name", "home_shots_allowed", short_window)
-    df["away_shots_allowed_avg3"] = _prior_rolling_mean(df, "away_team_name", "away_shots_allowed", short_window)
+    windows = (rolling_window, short_window)
+    means: Dict[Tuple[str, int], pd.Series] = {}
+    for side in _SIDES:
+        value_cols = (f"{side}_shots_for", f"{side}_shots_allowed")
+        fallback = [medians[col] for col in value_cols] if medians else None
+        means.update(_prior_rolling_means(df, f"{side}_team_name", value_cols, windows, fallback))
+    columns: Dict[str, pd.Series] = {}
+    for suffix, window in (("avg5", rolling_window), ("avg3", short_window)):
+        for kind in ("for", "allowed"):
+            for side in _SIDES:
+                columns[f"{side}_shots_{kind}_{suffix}"] = means[(f"{side}_shots_{kind}", window)]
+    return columns
+
 
-    df["shot_vol_gap_avg5"] = df["home_shots_for_avg5"] - df["away_shots_for_avg5"]
-    df["shot_suppress_gap_avg5"] = df["away_shots_allowed_avg5"] - df["home_shots_allowed_avg5"]
+def _shot_gap_columns(df: pd.DataFrame) -> Dict[str, pd.Series]:
     eps = 1e-3
-    df["log_shot_ratio_avg5"] = np.log(
-        (df["home_shots_for_avg5"] + eps) / (df["away_shots_for_avg5"] + eps)
-    ).replace([np.inf, -np.inf], 0.0)
-    df["shots_tempo_avg5"] = (df["home_shots_for_avg5"] + df["away_shots_for_avg5"]) / 2.0
+    return {
+        "shot_vol_gap_avg5": df["home_shots_for_avg5"] - df["away_shots_for_avg5"],
+        "shot_suppress_gap_avg5": df["away_shots_allowed_avg5"] - df["home_shots_allowed_avg5"],
+        "log_shot_ratio_avg5": np.log(
+            (df["home_shots_for_avg5"] + eps) / (df["away_shots_for_avg5"] + eps)
+        ).replace([np.inf, -np.inf], 0.0),
+        "shots_tempo_avg5": (df["home_shots_for_avg5"] + df["away_shots_for_avg5"]) / 2.0,
+        "shot_volume_gap_avg3": df["home_shots_for_avg3"] - df["away_shots_for_avg3"],
+        "shot_suppress_gap_avg3": df["away_shots_allowed_avg3"] - df["home_shots_allowed_avg3"],
+        "shots_tempo_avg3": (df["home_shots_for_avg3"] + df["away_shots_for_avg3"]) / 2.0,
+    }
 
-    df["shot_volume_gap_avg3"] = df["home_shots_for_avg3"] - df["away_shots_for_avg3"]
-    df["shot_suppress_gap_avg3"] = df["away_shots_allowed_avg3"] - df["home_shots_allowed_avg3"]
-    df["shots_tempo_avg3"] = (df["home_shots_for_avg3"] + df["away_shots_for_avg3"]) / 2.0
 
-    df["shot_volume_gap_avg3_season_z"] = _season_zscore(df, "shot_volume_gap_avg3")
-    df["shot_suppress_gap_avg3_season_z"] = _season_zscore(df, "shot_suppress_gap_avg3")
-    df["shots_tempo_avg3_season_z"] = _season_zscore(df, "shots_tempo_avg3")
+def _augment_appended(df: pd.DataFrame, start: int, rolling_window: int, baseline: set[str]) -> np.ndarray:
+    """Fill derived columns for the rows appended at position `start`, in place.
 
-    for column in [
-        "home_shots_for_avg5",
-        "away_shots_for_avg5",
-        "home_shots_allowed_avg5",
-        "away_shots_allowed_avg5",
-        "home_shots_for_avg3",
-        "away_shots_for_avg3",
-        "home_shots_allowed_avg3",
-        "away_shots_allowed_avg3",
-        "shot_vol_gap_avg5",
-        "shot_suppress_gap_avg5",
-        "shot_volume_gap_avg3",
-        "shot_suppress_gap_avg3",
-        "shots_tempo_avg5",
-        "shots_tempo_avg3",
-    ]:
-        df[column] = df[column].astype(np.float32).fillna(0.0)
+    Mirrors `_augment_dataframe` for a frame whose first `start` rows are already
+    augmented. Team-windowed features for the new rows only look at each team's
+    trailing rows. Older rows are rewritten only where a dataset-wide statistic
+    they depend on moved: the smoothed-average priors, the shot-count medians used
+    for a team's first match, or the z-score moments of a touched season. Returns
+    the mask of rows whose derived values changed (new rows included).
+    """
 
+    window = rolling_window
+    n_rows = len(df)
+    new_rows = np.arange(start, n_rows)
+    is_new = np.zeros(n_rows, dtype=bool)
+    is_new[start:] = True
+    changed = is_new.copy()
+    tail = df.iloc[start:]
 
-def _prior_rolling_mean(df: pd.DataFrame, team_col: str, value_col: str, window: int) -> pd.Series:
-    series = (
-        df.groupby(team_col, sort=False)[value_col]
-        .transform(lambda s: s.rolling(window, min_periods=1).mean().shift(1))
-    )
-    fallback = (
-        df.groupby(team_col, sort=False)[value_col]
-        .transform(lambda s: s.shift(1))
-        .fillna(df[value_col].median(skipna=True))
+    if "prob_edge" not in baseline and {"forecast_home_win", "forecast_away_win"}.issubset(baseline):
+        prob_edge = (tail["forecast_home_win"] - tail["forecast_away_win"]).astype(np.float32).fillna(0.0)
+        _assign_rows(df, "prob_edge", new_rows, prob_edge)
+
+    if "home_recent_games_frac" not in baseline and {"season", "home_team_name"}.issubset(baseline):
+        for side in _SIDES:
+            games = np.minimum(_appended_cumcount(df, start, ["season", f"{side}_team_name"]), window)
+            _assign_rows(df, f"{side}_recent_games_frac", new_rows, (games.astype(float) / window).astype(np.float32))
+
+    form_changed = is_new.copy()
+    if "home_goals_for_avg5" not in baseline and "home_goals_for_last_5" in baseline:
+        for side in _SIDES:
+            frac = df[f"{side}_recent_games_frac"]
+            for stat in _FORM_STATS:
+                source = df[f"{side}_{stat}_last_5"]
+                prior = _smoothed_prior(source, frac, window)
+                # Rows at full weight only see the prior when their own average is missing.
+                reach = np.flatnonzero((frac.to_numpy() < 1.0) | source.isna().to_numpy() | is_new)
+                values = _smoothed_avg(source.iloc[reach], frac.iloc[reach], window, prior=prior)
+                form_changed |= _assign_rows(df, f"{side}_{stat}_avg5", reach, values)
+
+    if "att_gap_avg5" not in baseline and {"home_goals_for_avg5", "away_goals_for_avg5"}.issubset(df.columns):
+        rows = np.flatnonzero(form_changed)
+        sources = [f"{side}_{stat}_avg5" for side in _SIDES for stat in _FORM_STATS]
+        for name, values in _form_gap_columns(df[sources].iloc[rows]).items():
+            form_changed |= _assign_rows(df, name, rows, values)
+    changed |= form_changed
+
+    if {"home_shots_for", "away_shots_for"}.issubset(baseline):
+        _assign_rows(df, "home_shots_allowed", new_rows, tail["away_shots_for"])
+        _assign_rows(df, "away_shots_allowed", new_rows, tail["home_shots_for"])
+        shots_changed = is_new.copy()
+        medians = {
+            f"{side}_shots_{kind}": df[f"{side}_shots_{kind}"].median(skipna=True)
+            for side in _SIDES
+            for kind in ("for", "allowed")
+        }
+        context = np.concatenate(
+            [_team_tail_positions(df, start, f"{side}_team_name", rolling_window) for side in _SIDES]
+        )
+        context = np.union1d(context, new_rows)
+        rolling = _shot_rolling_columns(df.iloc[context], rolling_window, medians)
+        for name, values in rolling.items():
+            _assign_rows(df, name, new_rows, values.to_numpy()[-len(new_rows):])
+        # A team's first match falls back to the column median, which may have moved.
+        first_rows = {}
+        for side in _SIDES:
+            team = df[f"{side}_team_name"].iloc[:start]
+            first_rows[side] = np.flatnonzero((~team.duplicated() | team.isna()).to_numpy())
+        for name in rolling:
+            source = name.rsplit("_", 1)[0]
+            first = first_rows[name.split("_", 1)[0]]
+            fallback = np.float32(0.0 if pd.isna(medians[source]) else medians[source])
+            shots_changed |= _assign_rows(df, name, first, np.full(len(first), fallback))
+
+        rows = np.flatnonzero(shots_changed)
+        for name, values in _shot_gap_columns(df[list(rolling)].iloc[rows]).items():
+            shots_changed |= _assign_rows(df, name, rows, values)
+        seasons = df["season"].to_numpy()
+        in_seasons = np.flatnonzero(np.isin(seasons, pd.unique(seasons[rows])))
+        subset = df[["season", *SHOT_ZSCORE_COLUMNS]].iloc[in_seasons]
+        for column in SHOT_ZSCORE_COLUMNS:
+            shots_changed |= _assign_rows(df, f"{column}_season_z", in_seasons, _season_zscore(subset, column))
+        changed |= shots_changed
+    return changed
+
+
+def _align_appended(old: pd.DataFrame, tail: pd.DataFrame, derived: set[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Give freshly parsed rows the frame's columns and dtypes so the two concatenate cheaply.
+
+    Augmentation inputs stay as parsed (float64) so the new rows' derived values
+    come from the same precision as a full build; `FeatureStore.refresh` narrows
+    them afterwards. Categoricals gain any new team or league names.
+    """
+
+    start = len(old)
+    head = old.copy(deep=False)
+    inputs = {column for _, step_inputs in AUGMENTATION_STEPS for column in step_inputs}
+    teams = pd.unique(
+        np.concatenate([tail[col].to_numpy() for col in ("home_team_name", "away_team_name") if col in tail])
     )
-    return series.fillna(fallback).fillna(0.0).astype(np.float32)
+    columns: Dict[str, object] = {}
+    for column in old.columns:
+        dtype = old[column].dtype
+        values = tail[column] if column in tail else pd.Series(np.nan, index=tail.index)
+        if isinstance(dtype, pd.CategoricalDtype):
+            names = teams if column != "league" else pd.unique(values.to_numpy())
+            unseen = [name for name in names if name not in dtype.categories]
+            if unseen:
+                head[column] = old[column].cat.add_categories(unseen)
+            columns[column] = pd.Categorical(values, dtype=head[column].dtype)
+        elif dtype.kind == "f" and (column in derived or column not in inputs) and values.dtype != dtype:
+            columns[column] = values.to_numpy(dtype=dtype)
+        else:
+            columns[column] = values.to_numpy()
+    tail = pd.DataFrame(columns, index=pd.RangeIndex(start, start + len(tail)))
+    return head, tail
+
+
+def _assign_rows(df: pd.DataFrame, column: str, positions: np.ndarray, values) -> np.ndarray:
+    """Write `values` at `positions` of `column`; return the mask of rows whose value changed."""
+
+    current = df[column].to_numpy()
+    values = np.asarray(values, dtype=current.dtype)
+    old = current[positions]
+    moved = ~((old == values) | (np.isnan(old) & np.isnan(values)))
+    mask = np.zeros(len(df), dtype=bool)
+    mask[positions[moved]] = True
+    if moved.any():
+        updated = current.copy()
+        updated[positions] = values
+        df[column] = updated
+    return mask
+
+
+def _appended_cumcount(df: pd.DataFrame, start: int, keys: List[str]) -> np.ndarray:
+    """`groupby(keys).cumcount()` for rows from `start` on, counting only earlier rows of the same groups."""
+
+    tail = [df[key].to_numpy()[start:] for key in keys]
+    related = np.ones(start, dtype=bool)
+    for key, values in zip(keys, tail):
+        related &= np.isin(df[key].to_numpy()[:start], pd.unique(values))
+    seen = Counter(zip(*(df[key].to_numpy()[:start][related] for key in keys)))
+    counts = np.empty(len(df) - start, dtype=np.int64)
+    for position, group in enumerate(zip(*tail)):
+        counts[position] = seen[group]
+        seen[group] += 1
+    return counts
+
+
+def _team_tail_positions(df: pd.DataFrame, start: int, team_col: str, rows_per_team: int) -> np.ndarray:
+    """Positions of the last `rows_per_team` rows before `start` for every team appearing after it."""
+
+    history = df[team_col].iloc[:start]
+    related = np.flatnonzero(history.isin(df[team_col].iloc[start:].unique()).to_numpy())
+    teams = pd.Series(related).groupby(history.iloc[related].to_numpy(), sort=False)
+    return np.sort(teams.tail(rows_per_team).to_numpy())
+
+
+def _prior_rolling_means(
+    df: pd.DataFrame,
+    team_col: str,
+    value_cols: Sequence[str],
+    windows: Sequence[int],
+    medians: Optional[Sequence[float]] = None,
+) -> Dict[Tuple[str, int], pd.Series]:
+    """Mean of each team's previous `window` values for every (column, window) pair.
+
+    Mirrors `groupby(team).transform(lambda s: s.rolling(w, min_periods=1).mean().shift(1))`
+    with the previous value (or the column median for a team's first match) as
+    fallback, but computes every column and window from one stable sort of the
+    team codes and one cumulative sum. Window sums are prefix-sum differences, so
+    they match pandas' compensated rolling sums exactly for integer-valued inputs
+    such as shot counts. `medians` overrides the first-match fallback when `df`
+    is only a slice of the frame.
+    """
+
+    n_rows = len(df)
+    codes = pd.factorize(df[team_col], sort=False)[0]
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    row = np.arange(n_rows)
+    starts = np.ones(n_rows, dtype=bool)
+    starts[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    offset = row - np.maximum.accumulate(np.where(starts, row, 0))
+    grouped = sorted_codes >= 0
+
+    values = df[list(value_cols)].to_numpy(dtype=np.float64)[order]
+    valid = ~np.isnan(values)
+    sums = np.zeros((n_rows + 1, values.shape[1]))
+    counts = np.zeros((n_rows + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+
+    previous = np.full_like(values, np.nan)
+    has_previous = (offset > 0) & grouped
+    previous[has_previous] = values[row[has_previous] - 1]
+    if medians is None:
+        medians = [df[col].median(skipna=True) for col in value_cols]
+    medians = np.array(medians, dtype=np.float64)
+    fallback = np.where(np.isnan(previous), medians, previous)
+
+    results: Dict[Tuple[str, int], pd.Series] = {}
+    for window in dict.fromkeys(windows):
+        lower = row - np.minimum(offset, window)
+        window_counts = counts[row] - counts[lower]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (sums[row] - sums[lower]) / window_counts
+        means[(window_counts == 0) | ~grouped[:, None]] = np.nan
+        filled = np.where(np.isnan(means), fallback, means)
+        filled = np.where(np.isnan(filled), 0.0, filled).astype(np.float32)
+        unsorted = np.empty_like(filled)
+        unsorted[order] = filled
+        for idx, col in enumerate(value_cols):
+            results[(col, window)] = pd.Series(unsorted[:, idx], index=df.index)
+    return results
 
 
 def _season_zscore(df: pd.DataFrame, column: str) -> pd.Series:
@@ -566,14 +1932,37 @@ def _season_zscore(df: pd.DataFrame, column: str) -> pd.Series:
     return z.replace([np.inf, -np.inf], 0.0).fillna(0.0).astype(np.float32)
 
 
-def _smoothed_avg(sum_series: pd.Series, games_frac: pd.Series, window: int) -> pd.Series:
+def _smoothed_prior(sum_series: pd.Series, games_frac: pd.Series, window: int) -> float:
+    per_match = _per_match(sum_series.to_numpy(), games_frac.to_numpy(), window)
+    return _mean_or_zero(per_match)
+
+
+def _smoothed_avg(
+    sum_series: pd.Series,
+    games_frac: pd.Series,
+    window: int,
+    prior: Optional[float] = None,
+) -> pd.Series:
+    frac = games_frac.to_numpy()
+    per_match = _per_match(sum_series.to_numpy(), frac, window)
+    if prior is None:
+        prior = _mean_or_zero(per_match)
+    per_match = np.where(np.isnan(per_match), prior, per_match)
+    alpha = np.clip(frac, 0.0, 1.0)
+    # A Python float keeps `(1 - alpha) * prior` in alpha's float32, as the pandas version did.
+    smoothed = alpha * per_match + (1.0 - alpha) * float(prior)
+    return pd.Series(smoothed.astype(np.float32), index=sum_series.index)
+
+
+def _per_match(sums: np.ndarray, games_frac: np.ndarray, window: int) -> np.ndarray:
     games = games_frac * window
-    per_match = sum_series / games.replace(0.0, np.nan)
-    prior = per_match.dropna().mean()
-    prior = 0.0 if np.isnan(prior) else prior
-    per_match = per_match.fillna(prior)
-    alpha = games_frac.clip(0.0, 1.0)
-    return (alpha * per_match + (1.0 - alpha) * prior).astype(np.float32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums / np.where(games == 0.0, np.nan, games)
+
+
+def _mean_or_zero(values: np.ndarray) -> float:
+    values = values[~np.isnan(values)]
+    return np.float64(values.sum() / len(values)) if len(values) else np.float64(0.0)
 
 
 def export_fixture_features(match_id: int, output: Path, store: Optional[FeatureStore] = None) -> None:
@@ -582,9 +1971,40 @@ def export_fixture_features(match_id: int, output: Path, store: Optional[Feature
     output.write_text(json.dumps(fixture.features, indent=2), encoding="utf-8")
 
 
-if __name__ == "__main__":  # pragma: no cover
-    import argparse
+def collect_cache_garbage(
+    cache_path: Path = CACHE_PATH,
+    versions: Optional[Iterable[str]] = None,
+    rolling_window: int = DEFAULT_ROLLING_WINDOW,
+) -> CacheGcReport:
+    """Drop cached vectors no current store can hit, then VACUUM the cache file.
 
+    For each dataset version (default: every version present in the cache) the
+    fingerprint of its current CSV with `rolling_window` and today's model
+    features is kept; rows of other fingerprints, and of versions whose CSV is
+    gone or not listed, are deleted.
+    """
+
+    cache = FeatureCache(cache_path)
+    if versions is None:
+        versions = {version for version, _ in cache.fingerprints()}
+    keep: Dict[str, str] = {}
+    for version in versions:
+        if not _dataset_path_from_version(version).exists():
+            continue
+        store = FeatureStore(
+            dataset_version=version,
+            cache_path=None,
+            snapshot_root=None,
+            rolling_window=rolling_window,
+            memory_cache_size=0,
+        )
+        keep[store.dataset_version] = store.cache_fingerprint
+    report = cache.gc(keep)
+    cache.close()
+    return report
+
+
+def _export_main(argv: List[str]) -> None:
     parser = argparse.ArgumentParser(description="Fixture feature extractor")
     parser.add_argument("match_id", type=int)
     parser.add_argument("--output", type=Path, default=Path("fixture_features.json"))
@@ -599,8 +2019,14 @@ if __name__ == "__main__":  # pragma: no cover
         type=Path,
         help="Explicit dataset CSV path",
     )
-    args = parser.parse_args()
-    store_kwargs = {}
+    parser.add_argument(
+        "--memory-cache-size",
+        dest="memory_cache_size",
+        type=int,
+        help="Entries in the in-process LRU tier (default: FEATURE_MEMORY_CACHE_SIZE or 1024; 0 disables it)",
+    )
+    args = parser.parse_args(argv)
+    store_kwargs = {"memory_cache_size": args.memory_cache_size}
     if args.dataset_version:
         store_kwargs["dataset_version"] = args.dataset_version
     if args.dataset_path:
@@ -608,3 +2034,70 @@ if __name__ == "__main__":  # pragma: no cover
     store = FeatureStore(**store_kwargs)
     export_fixture_features(args.match_id, args.output, store=store)
     print(f"Wrote features to {args.output}")
+
+
+def _prewarm_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m pipelines.feature_store prewarm",
+        description="Fill the SQLite feature cache for every dataset fixture (completed matches) of a season",
+    )
+    parser.add_argument("--season", help="Season label, e.g., 2025 (default: latest in the dataset)")
+    parser.add_argument("--league", help="Only fixtures of this league, e.g., EPL")
+    parser.add_argument("--dataset-version", dest="dataset_version", help="Dataset version label, e.g., 7")
+    parser.add_argument("--dataset", dest="dataset_path", type=Path, help="Explicit dataset CSV path")
+    parser.add_argument("--cache", dest="cache_path", type=Path, default=CACHE_PATH, help="SQLite cache file")
+    args = parser.parse_args(argv)
+    store_kwargs = {}
+    if args.dataset_version:
+        store_kwargs["dataset_version"] = args.dataset_version
+    if args.dataset_path:
+        store_kwargs["dataset_path"] = args.dataset_path
+    # A one-shot process gains nothing from the memory tier.
+    store = FeatureStore(cache_path=args.cache_path, memory_cache_size=0, **store_kwargs)
+    start = time.perf_counter()
+    _ = store.df
+    loaded = time.perf_counter()
+    written = store.prewarm(args.season, args.league)
+    elapsed = time.perf_counter() - loaded
+    scope = f"season {args.season or store.latest_season}" + (f" ({args.league})" if args.league else "")
+    print(
+        f"Prewarmed {written} fixtures for {scope} from dataset v{store.dataset_version} "
+        f"in {elapsed:.3f}s ({written / max(elapsed, 1e-9):.0f} rows/s; frame load {loaded - start:.3f}s)"
+    )
+
+
+def _gc_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m pipelines.feature_store gc",
+        description="Delete cached vectors of superseded dataset fingerprints and VACUUM the cache",
+    )
+    parser.add_argument("--cache", dest="cache_path", type=Path, default=CACHE_PATH, help="SQLite cache file")
+    parser.add_argument(
+        "--dataset-version",
+        dest="versions",
+        action="append",
+        help="Dataset version to keep (repeatable; default: every cached version whose CSV exists)",
+    )
+    parser.add_argument("--rolling-window", type=int, default=DEFAULT_ROLLING_WINDOW)
+    args = parser.parse_args(argv)
+    report = collect_cache_garbage(args.cache_path, args.versions, args.rolling_window)
+    print(
+        f"Deleted {report.rows_deleted} of {report.rows_before} cached rows "
+        f"({report.rows_after} kept); {args.cache_path} {report.bytes_before / 1024:.1f}KB -> "
+        f"{report.bytes_after / 1024:.1f}KB"
+    )
+
+
+COMMANDS = {"prewarm": _prewarm_main, "gc": _gc_main}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+    else:
+        _export_main(argv)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
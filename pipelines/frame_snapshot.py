@@ -0,0 +1,277 @@
+"""Typed columnar snapshots of the augmented feature frame.
+
+Parsing the dataset CSV and re-running the feature augmentation dominates the
+cold start of every CLI call and worker. This module persists the finished
+frame as a handful of `.npy` arrays (numeric columns stacked per dtype) plus a
+JSON manifest so later processes can memory-map the arrays instead of
+rebuilding them. Snapshots live in a directory named after a key derived from
+the dataset content, the rolling window, the active feature list and the loader
+options; any change to those inputs produces a new key.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+INDEX_ARRAY = "index"
+
+
+def file_digest(path: Path, limit: Optional[int] = None) -> str:
+    """Return the sha256 hex digest of a file's contents, or of its first `limit` bytes."""
+
+    digest = hashlib.sha256()
+    remaining = limit
+    with path.open("rb") as fh:
+        while remaining is None or remaining > 0:
+            chunk = fh.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def file_digests(path: Path, prefix: int, limit: int) -> Tuple[str, str]:
+    """Return the digests of the first `prefix` and first `limit` bytes, reading the file once."""
+
+    digest = hashlib.sha256()
+    prefix_digest: Optional[str] = None
+    position = 0
+    with path.open("rb") as fh:
+        while position < limit:
+            if position == prefix:
+                prefix_digest = digest.hexdigest()
+            step = min(1 << 20, limit - position)
+            if position < prefix:
+                step = min(step, prefix - position)
+            chunk = fh.read(step)
+            if not chunk:
+                break
+            digest.update(chunk)
+            position += len(chunk)
+    full = digest.hexdigest()
+    return prefix_digest if prefix_digest is not None else full, full
+
+
+def snapshot_key(
+    dataset_digest: str,
+    rolling_window: int,
+    features: Iterable[str],
+    options: Optional[Dict[str, object]] = None,
+) -> str:
+    payload = json.dumps(
+        {
+            "format": SNAPSHOT_FORMAT_VERSION,
+            "dataset": dataset_digest,
+            "rolling_window": int(rolling_window),
+            "features": list(features),
+            "options": dict(options or {}),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+
+
+def _column_kind(series: pd.Series) -> str:
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return "category"
+    if isinstance(dtype, np.dtype) and dtype.kind == "M":
+        return "datetime"
+    if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+        return "numeric"
+    return "string"
+
+
+def encode_frame(df: pd.DataFrame) -> Tuple[Dict[str, np.ndarray], List[dict]]:
+    """Split a frame into named numpy arrays plus the layout needed to rebuild it.
+
+    Numeric columns are stacked into one `(n_columns, n_rows)` block per dtype so
+    that each column is a contiguous row; `decode_frame` hands slices of those
+    blocks to pandas without copying. Other columns get their own arrays.
+    """
+
+    arrays: Dict[str, np.ndarray] = {}
+    layout: List[dict] = []
+    blocks: Dict[str, List[np.ndarray]] = {}
+    for name in df.columns:
+        series = df[name]
+        kind = _column_kind(series)
+        if kind == "numeric":
+            block_name = f"block_{series.dtype.str.lstrip('<>|=')}"
+            members = blocks.setdefault(block_name, [])
+            previous = layout[-1] if layout else None
+            if previous and previous["kind"] == "block" and previous["array"] == block_name:
+                previous["columns"].append(str(name))
+                previous["stop"] += 1
+            else:
+                layout.append(
+                    {
+                        "kind": "block",
+                        "array": block_name,
+                        "start": len(members),
+                        "stop": len(members) + 1,
+                        "columns": [str(name)],
+                    }
+                )
+            members.append(series.to_numpy())
+            continue
+        prefix = f"col{len(layout):04d}"
+        entry = {"kind": kind, "column": str(name), "arrays": {}}
+        if kind == "category":
+            entry["arrays"]["codes"] = f"{prefix}_codes"
+            entry["arrays"]["categories"] = f"{prefix}_categories"
+            arrays[f"{prefix}_codes"] = series.cat.codes.to_numpy()
+            arrays[f"{prefix}_categories"] = np.asarray(series.cat.categories.astype(str), dtype=str)
+        elif kind == "datetime":
+            entry["arrays"]["values"] = f"{prefix}_values"
+            arrays[f"{prefix}_values"] = series.to_numpy()
+        else:
+            mask = series.isna().to_numpy()
+            entry["dtype"] = str(series.dtype)
+            entry["arrays"]["values"] = f"{prefix}_values"
+            arrays[f"{prefix}_values"] = np.asarray(series.where(~mask, "").astype(str).to_numpy(), dtype=str)
+            if mask.any():
+                entry["arrays"]["mask"] = f"{prefix}_mask"
+                arrays[f"{prefix}_mask"] = mask
+        layout.append(entry)
+    for block_name, members in blocks.items():
+        arrays[block_name] = np.stack(members) if members else np.empty((0, len(df)))
+    if not isinstance(df.index, pd.RangeIndex):
+        arrays[INDEX_ARRAY] = df.index.to_numpy()
+    return arrays, layout
+
+
+def decode_frame(arrays: Dict[str, np.ndarray], layout: List[dict]) -> pd.DataFrame:
+    """Inverse of `encode_frame`; numeric columns stay views of the input arrays."""
+
+    parts: List[pd.DataFrame] = []
+    for entry in layout:
+        kind = entry["kind"]
+        if kind == "block":
+            block = arrays[entry["array"]][entry["start"] : entry["stop"]]
+            parts.append(pd.DataFrame(block.T, columns=entry["columns"], copy=False))
+            continue
+        names = entry["arrays"]
+        if kind == "category":
+            categories = pd.Index(np.asarray(arrays[names["categories"]]).astype(object))
+            series = pd.Series(pd.Categorical.from_codes(np.asarray(arrays[names["codes"]]), categories=categories))
+        elif kind == "datetime":
+            series = pd.Series(arrays[names["values"]], copy=False)
+        else:
+            values = np.asarray(arrays[names["values"]]).astype(object)
+            if "mask" in names:
+                values[np.asarray(arrays[names["mask"]])] = None
+            series = pd.Series(values, dtype=entry.get("dtype", "object"))
+        parts.append(series.to_frame(entry["column"]))
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat(parts, axis=1)
+    if INDEX_ARRAY in arrays:
+        df.index = pd.Index(arrays[INDEX_ARRAY])
+    return df
+
+
+class FrameSnapshot:
+    """Directory of `.npy` arrays plus a JSON manifest describing the frame layout."""
+
+    def __init__(self, root: Path, key: str):
+        self.root = root
+        self.key = key
+        self.path = root / key
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / MANIFEST_FILENAME
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def load(self, *, mmap: bool = True) -> Optional[Tuple[pd.DataFrame, dict]]:
+        """Return `(frame, extra_metadata)` or None when the snapshot is missing or unreadable."""
+
+        if not self.exists():
+            return None
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("format") != SNAPSHOT_FORMAT_VERSION:
+                return None
+            mmap_mode = "r" if mmap else None
+            arrays = {
+                name: np.load(self.path / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+                for name in manifest["arrays"]
+            }
+            df = decode_frame(arrays, manifest["layout"])
+        except (OSError, ValueError, KeyError) as exc:
+            LOGGER.warning("Ignoring unreadable feature snapshot %s: %s", self.path, exc)
+            return None
+        return df, manifest.get("extra", {})
+
+    def save(self, df: pd.DataFrame, extra: Optional[dict] = None) -> Path:
+        """Write the frame atomically; concurrent writers race harmlessly on the rename."""
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{self.key}-", dir=self.root))
+        try:
+            arrays, layout = encode_frame(df)
+            for name, array in arrays.items():
+                np.save(staging / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+            manifest = {
+                "format": SNAPSHOT_FORMAT_VERSION,
+                "key": self.key,
+                "rows": int(len(df)),
+                "arrays": sorted(arrays),
+                "layout": layout,
+                "extra": extra or {},
+            }
+            (staging / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            if self.path.exists():
+                shutil.rmtree(self.path, ignore_errors=True)
+            os.replace(staging, self.path)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return self.path
+
+    def prune_siblings(self, shared: Optional[Dict[str, object]] = None) -> List[Path]:
+        """Delete snapshots for other keys so the directory does not grow per dataset edit.
+
+        Siblings whose manifest `extra` carries every item of `shared` are kept: they
+        are other live configurations of the same data (another rolling window, a
+        compact and a full frame), not leftovers. Without `shared` every other key goes.
+        """
+
+        removed: List[Path] = []
+        if not self.root.exists():
+            return removed
+        for child in self.root.iterdir():
+            if not child.is_dir() or child.name == self.key or child.name.startswith("."):
+                continue
+            if shared and _manifest_matches(child / MANIFEST_FILENAME, shared):
+                continue
+            shutil.rmtree(child, ignore_errors=True)
+            removed.append(child)
+        return removed
+
+
+def _manifest_matches(path: Path, shared: Dict[str, object]) -> bool:
+    try:
+        extra = json.loads(path.read_text(encoding="utf-8")).get("extra", {})
+    except (OSError, ValueError, AttributeError):
+        return False
+    return all(extra.get(name) == value for name, value in shared.items())
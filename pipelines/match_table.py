@@ -0,0 +1,219 @@
+"""Flat typed match tables normalized from raw Understat results files.
+
+Understat's `league_results.csv` / `team_results.csv` store the teams, score,
+xG and forecast of each match as stringified Python dicts
+(`"{'h': '1', 'a': '0'}"`). Every consumer used to re-parse those cells with
+`ast.literal_eval`, row by row and field by field. `load_match_table` parses a
+file once into a frame with one typed column per value and pickles it under
+`understat_data/match_tables/v<N>/<source>/<sha256 of the file>.pkl`, so later
+reads of unchanged bytes skip parsing altogether. Only the newest
+`MATCH_TABLE_KEEP` tables per source file are kept.
+
+The cells are parsed as JSON after swapping the quotes (and `None` for
+`null`, as in the score of an unplayed match); `literal_eval` is only the
+fallback for the odd cell JSON rejects (an apostrophe in a team name).
+Columns of the raw file other than the nested ones (`League`, `Season`,
+`side`, `result`, ...) are carried over unchanged as strings.
+"""
+
+from __future__ import annotations
+
+import ast
+import csv
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import pandas as pd
+
+from pipelines.frame_snapshot import file_digest
+
+LOGGER = logging.getLogger(__name__)
+
+MATCH_TABLE_VERSION = 1
+MATCH_TABLE_ROOT = Path("understat_data") / "match_tables"
+# Tables kept per source file: the current content and the one before it.
+MATCH_TABLE_KEEP = 2
+
+RAW_COLUMNS = ("id", "isResult", "h", "a", "goals", "xG", "datetime", "forecast")
+MATCH_DTYPES: Dict[str, str] = {
+    "match_id": "Int64",
+    "is_result": "bool",
+    "datetime": "string",
+    "kickoff": "datetime64[ns]",
+    "home_team_id": "Int64",
+    "home_team_name": "string",
+    "home_team_short": "string",
+    "away_team_id": "Int64",
+    "away_team_name": "string",
+    "away_team_short": "string",
+    "home_goals": "Int64",
+    "away_goals": "Int64",
+    "home_xg": "float64",
+    "away_xg": "float64",
+    "forecast_home_win": "float64",
+    "forecast_draw": "float64",
+    "forecast_away_win": "float64",
+}
+MATCH_COLUMNS = list(MATCH_DTYPES)
+
+
+def parse_nested(value: object) -> Dict[str, object]:
+    """A stringified Understat dict as a dict; `{}` for blanks and unparseable cells."""
+
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, str):
+        return {}
+    text = value.strip()
+    if not text:
+        return {}
+    try:
+        parsed = json.loads(text.replace("'", '"').replace(": None", ": null"))
+    except json.JSONDecodeError:
+        try:
+            parsed = ast.literal_eval(text)
+        except (SyntaxError, ValueError):
+            return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _int(value: object) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(float(str(value).strip()))
+    except ValueError:
+        return None
+
+
+def _float(value: object) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _kickoff(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+
+def _text(value: object) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def normalize_results(rows: Iterable[Mapping[str, str]], extra_columns: Iterable[str] = ()) -> pd.DataFrame:
+    """The typed match table of raw results rows (as read by `csv.DictReader`)."""
+
+    extra_columns = list(extra_columns)
+    records: List[Dict[str, object]] = []
+    for row in rows:
+        home = parse_nested(row.get("h"))
+        away = parse_nested(row.get("a"))
+        goals = parse_nested(row.get("goals"))
+        xg = parse_nested(row.get("xG"))
+        forecast = parse_nested(row.get("forecast"))
+        raw_datetime = row.get("datetime") or ""
+        record: Dict[str, object] = {
+            "match_id": _int(row.get("id")),
+            "is_result": str(row.get("isResult", "")).strip().lower() in {"true", "1", "yes", "y", "t"},
+            "datetime": raw_datetime,
+            "kickoff": _kickoff(raw_datetime),
+            "home_team_id": _int(home.get("id")),
+            "home_team_name": _text(home.get("title")),
+            "home_team_short": _text(home.get("short_title")),
+            "away_team_id": _int(away.get("id")),
+            "away_team_name": _text(away.get("title")),
+            "away_team_short": _text(away.get("short_title")),
+            "home_goals": _int(goals.get("h")),
+            "away_goals": _int(goals.get("a")),
+            "home_xg": _float(xg.get("h")),
+            "away_xg": _float(xg.get("a")),
+            "forecast_home_win": _float(forecast.get("w")),
+            "forecast_draw": _float(forecast.get("d")),
+            "forecast_away_win": _float(forecast.get("l")),
+        }
+        for column in extra_columns:
+            value = row.get(column)
+            record[column] = value if value not in ("", None) else None
+        records.append(record)
+    frame = pd.DataFrame.from_records(records, columns=MATCH_COLUMNS + extra_columns)
+    return frame.astype({**MATCH_DTYPES, **{column: "string" for column in extra_columns}})
+
+
+def read_match_table(path: Path) -> pd.DataFrame:
+    """Parse a raw results CSV without touching the cache."""
+
+    with Path(path).open(newline="") as fp:
+        reader = csv.DictReader(fp)
+        extra_columns = [column for column in reader.fieldnames or [] if column not in RAW_COLUMNS]
+        return normalize_results(reader, extra_columns)
+
+
+def match_table_cache_path(path: Path, cache_root: Path = MATCH_TABLE_ROOT) -> Path:
+    path = Path(path)
+    source = hashlib.sha256(str(path.resolve()).encode("utf-8")).hexdigest()[:12]
+    return Path(cache_root) / f"v{MATCH_TABLE_VERSION}" / f"{path.stem}-{source}" / f"{file_digest(path)}.pkl"
+
+
+def _prune_match_tables(directory: Path, keep: int = MATCH_TABLE_KEEP) -> None:
+    # Several scripts read the same file concurrently, so entries can vanish between glob and stat.
+    entries = []
+    for entry in directory.glob("*.pkl"):
+        try:
+            entries.append((entry.stat().st_mtime_ns, entry))
+        except FileNotFoundError:
+            continue
+    entries.sort(key=lambda item: item[0], reverse=True)
+    for _, stale in entries[keep:]:
+        stale.unlink(missing_ok=True)
+
+
+def load_match_table(path: Path, cache_root: Optional[Path] = MATCH_TABLE_ROOT) -> pd.DataFrame:
+    """The match table of a raw results CSV, parsed at most once per distinct file content.
+
+    Writing a new table drops all but the newest `MATCH_TABLE_KEEP` of the same
+    source file, so the cache does not grow with every matchday. Pass `cache_root=None` to parse without reading or writing the cache.
+    """
+
+    path = Path(path)
+    if cache_root is None:
+        return read_match_table(path)
+    cached = match_table_cache_path(path, cache_root)
+    try:
+        with cached.open("rb") as fh:
+            table = pickle.load(fh)
+    except FileNotFoundError:
+        pass
+    except Exception as exc:  # truncated or written by an incompatible pandas
+        LOGGER.warning("Ignoring unreadable match table %s: %s", cached, exc)
+    else:
+        try:
+            os.utime(cached)  # keep the table in use out of pruning
+        except FileNotFoundError:
+            pass
+        return table
+    table = read_match_table(path)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", dir=cached.parent, suffix=".tmp", delete=False) as fh:
+        pickle.dump(table, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(fh.name, cached)
+    _prune_match_tables(cached.parent)
+    return table
+
+
+def match_records(table: pd.DataFrame) -> List[Dict[str, object]]:
+    """Rows of a match table as dicts of plain Python values, with None for missing ones."""
+
+    return table.astype(object).where(table.notna(), None).to_dict("records")
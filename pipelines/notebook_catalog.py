@@ -3,13 +3,21 @@
 Training notebooks emit `metrics.json` with the feature columns used by each
 view; this module walks the `artifacts/experiments` tree and exposes helpers
 to map those files back into the Python feature store.
+
+Walking the tree means listing every run and parsing `metrics.json` files, and
+the tree grows with every training run. `CatalogIndex` keeps the parsed result
+in `catalog_index.json` under the experiment root and updates it incrementally:
+runs are re-read only when their directory or metrics files change, and the
+root listing only when the root directory's mtime moves.
 """
 
 from __future__ import annotations
 
 import json
 import logging
+import os
 import re
+import tempfile
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence
@@ -19,6 +27,8 @@ LOGGER = logging.getLogger(__name__)
 RUN_PREFIX = "run_"
 METRICS_FILENAME = "metrics.json"
 DEFAULT_EXPERIMENT_ROOT = Path("artifacts/experiments")
+INDEX_FILENAME = "catalog_index.json"
+INDEX_FORMAT_VERSION = 1
 
 
 def _read_json(path: Path) -> dict:
@@ -103,9 +113,185 @@ def _load_model_spec(model_dir: Path) -> Optional[NotebookModelSpec]:
     )
 
 
-def load_notebook_run(run_dir: Path, model_names: Optional[Iterable[str]] = None) -> NotebookRun:
+def _mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _index_run(run_dir: Path) -> dict:
+    """Parse every model directory of a run into an index entry."""
+
+    models: Dict[str, dict] = {}
+    pending: List[str] = []
+    for child in run_dir.iterdir():
+        if not child.is_dir():
+            continue
+        spec = _load_model_spec(child)
+        if spec is None:
+            pending.append(child.name)
+            continue
+        models[child.name] = {
+            "feature_cols": list(spec.feature_cols),
+            "dataset_label": spec.dataset_label,
+            "metrics_mtime_ns": _mtime_ns(spec.metrics_path),
+        }
+    return {"mtime_ns": _mtime_ns(run_dir), "models": models, "pending": pending}
+
+
+class CatalogIndex:
+    """Persistent `run_id -> models` map for one experiment root.
+
+    An entry records the run directory's mtime, each model's parsed metrics and
+    the mtime of its `metrics.json`, plus model directories that had no metrics
+    yet. Checking an entry therefore costs a few `stat` calls and no parsing;
+    it is re-read when any of those change. The root listing is re-synced only
+    when the root's own mtime moves (a run was added or removed).
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.path = root / INDEX_FILENAME
+        self.root_mtime_ns: Optional[int] = None
+        self.runs: Dict[str, dict] = {}
+        self._dirty = False
+
+    @classmethod
+    def open(cls, root: Path = DEFAULT_EXPERIMENT_ROOT) -> "CatalogIndex":
+        """Load the index for `root`, rebuilding or syncing it when it is missing or stale."""
+
+        index = cls(root)
+        if not index._load():
+            index.rebuild()
+        elif index.root_mtime_ns != _mtime_ns(root):
+            index.sync()
+        index.save()
+        return index
+
+    def _load(self) -> bool:
+        try:
+            payload = _read_json(self.path)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(payload, dict) or payload.get("format") != INDEX_FORMAT_VERSION:
+            return False
+        runs = payload.get("runs")
+        if not isinstance(runs, dict):
+            return False
+        self.root_mtime_ns = payload.get("root_mtime_ns")
+        self.runs = runs
+        return True
+
+    def rebuild(self) -> None:
+        """Full rescan of the experiment root."""
+
+        self.runs = {}
+        self.sync()
+
+    def sync(self) -> None:
+        """Index runs added since the last sync and drop runs that were removed."""
+
+        self.root_mtime_ns = _mtime_ns(self.root)
+        present = {run_dir.name: run_dir for run_dir in _sorted_run_dirs(self.root)}
+        for run_id in set(self.runs) - set(present):
+            del self.runs[run_id]
+        for run_id, run_dir in present.items():
+            if run_id not in self.runs:
+                self.runs[run_id] = _index_run(run_dir)
+        self._dirty = True
+
+    def run_ids(self) -> List[str]:
+        """Indexed run ids, newest first (the same order `_sorted_run_dirs` uses)."""
+
+        return sorted(self.runs, reverse=True)
+
+    def entry(self, run_id: str) -> Optional[dict]:
+        """Return the entry for `run_id`, re-reading the run if its files changed since indexing."""
+
+        run_dir = self.root / run_id
+        entry = self.runs.get(run_id)
+        if entry is not None and not self._is_current(run_dir, entry):
+            entry = None
+        if entry is None:
+            if not _is_run_dir(run_dir):
+                self.runs.pop(run_id, None)
+                return None
+            entry = self.runs[run_id] = _index_run(run_dir)
+            self._dirty = True
+        return entry
+
+    @staticmethod
+    def _is_current(run_dir: Path, entry: dict) -> bool:
+        if _mtime_ns(run_dir) != entry.get("mtime_ns"):
+            return False
+        for name, model in entry.get("models", {}).items():
+            if _mtime_ns(run_dir / name / METRICS_FILENAME) != model.get("metrics_mtime_ns"):
+                return False
+        return all(not (run_dir / name / METRICS_FILENAME).exists() for name in entry.get("pending", []))
+
+    def load_run(self, run_id: str, model_names: Optional[Iterable[str]] = None) -> NotebookRun:
+        entry = self.entry(run_id)
+        run_dir = self.root / run_id
+        if entry is None:
+            raise FileNotFoundError(f"Notebook run directory not found: {run_dir}")
+        indexed = entry["models"]
+        names = list(model_names) if model_names else list(indexed)
+        models: Dict[str, NotebookModelSpec] = {}
+        for name in names:
+            model = indexed.get(name)
+            if model is None:
+                continue
+            models[name] = NotebookModelSpec(
+                name=name,
+                feature_cols=list(model["feature_cols"]),
+                dataset_label=model["dataset_label"],
+                metrics_path=run_dir / name / METRICS_FILENAME,
+            )
+        return NotebookRun(run_id=run_id, path=run_dir, models=models)
+
+    def save(self) -> None:
+        """Write the index atomically if it changed; read-only trees just skip persisting."""
+
+        if not self._dirty:
+            return
+        payload = {"format": INDEX_FORMAT_VERSION, "root_mtime_ns": self.root_mtime_ns, "runs": self.runs}
+        staging: Optional[str] = None
+        try:
+            fd, staging = tempfile.mkstemp(prefix=f".{INDEX_FILENAME}-", dir=self.root)
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(payload, handle, indent=1)
+            os.replace(staging, self.path)
+        except OSError as exc:
+            LOGGER.warning("Could not write catalog index %s: %s", self.path, exc)
+            if staging is not None and os.path.exists(staging):
+                os.unlink(staging)
+            return
+        # Replacing the file bumps the root's mtime. Adopt the new value only if the
+        # listing still matches what was indexed, so a run added meanwhile is not missed.
+        current = _mtime_ns(self.root)
+        if current != self.root_mtime_ns and {path.name for path in _sorted_run_dirs(self.root)} == set(self.runs):
+            self.root_mtime_ns = payload["root_mtime_ns"] = current
+            # Rewrite in place: another rename would move the root mtime again.
+            with self.path.open("r+", encoding="utf-8") as handle:
+                json.dump(payload, handle, indent=1)
+                handle.truncate()
+        self._dirty = False
+
+
+def load_notebook_run(
+    run_dir: Path,
+    model_names: Optional[Iterable[str]] = None,
+    *,
+    use_index: bool = True,
+) -> NotebookRun:
     if not run_dir.exists():
         raise FileNotFoundError(f"Notebook run directory not found: {run_dir}")
+    if use_index and (run_dir.parent / INDEX_FILENAME).exists():
+        index = CatalogIndex.open(run_dir.parent)
+        run = index.load_run(run_dir.name, model_names=model_names)
+        index.save()
+        return run
     models: Dict[str, NotebookModelSpec] = {}
     names = list(model_names) if model_names else [child.name for child in run_dir.iterdir() if child.is_dir()]
     for name in names:
@@ -121,15 +307,26 @@ def load_notebook_run(run_dir: Path, model_names: Optional[Iterable[str]] = None
 def discover_latest_notebook_run(
     root: Path = DEFAULT_EXPERIMENT_ROOT,
     model_names: Optional[Iterable[str]] = None,
+    *,
+    use_index: bool = True,
 ) -> Optional[NotebookRun]:
     if not root.exists():
         LOGGER.warning("Experiment root %s does not exist", root)
         return None
-    for run_dir in _sorted_run_dirs(root):
-        run = load_notebook_run(run_dir, model_names=model_names)
-        if run.models:
-            LOGGER.debug("Discovered notebook run %s with models: %s", run.run_id, ", ".join(run.models))
-            return run
+    model_names = list(model_names) if model_names else None
+    if use_index:
+        index = CatalogIndex.open(root)
+        try:
+            runs = (index.load_run(run_id, model_names=model_names) for run_id in index.run_ids())
+            found = next((run for run in runs if run.models), None)
+        finally:
+            index.save()
+    else:
+        runs = (load_notebook_run(run_dir, model_names, use_index=False) for run_dir in _sorted_run_dirs(root))
+        found = next((run for run in runs if run.models), None)
+    if found is not None:
+        LOGGER.debug("Discovered notebook run %s with models: %s", found.run_id, ", ".join(found.models))
+        return found
     LOGGER.warning("No notebook runs with metrics found under %s", root)
     return None
 
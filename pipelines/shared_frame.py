@@ -0,0 +1,183 @@
+"""Publish the augmented feature frame once per host in POSIX shared memory.
+
+Every inference worker used to hold its own copy of the frame and pay its own
+cold build. `SharedFrame` writes the arrays produced by
+`frame_snapshot.encode_frame` into one named `multiprocessing.shared_memory`
+segment; sibling processes attach to it and decode the numeric blocks as
+zero-copy views. A lock file serialises publishing so only one process
+builds the frame while the others wait and then attach.
+
+Segment layout: an 8-byte little-endian length, a JSON manifest (frame layout,
+array dtypes/shapes/offsets and the caller's metadata), then the arrays at
+64-byte aligned offsets. The length is written last, so a non-zero value means
+the segment is complete.
+
+The publishing process owns the segment: it is unlinked when that process
+exits (or calls `unlink()`), after which the next worker publishes a fresh
+one. Processes that already attached keep their mappings.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import hashlib
+import json
+import logging
+import struct
+import tempfile
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pipelines.frame_snapshot import decode_frame, encode_frame
+
+try:  # POSIX only; without it publishing is not serialised across processes.
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+LOGGER = logging.getLogger(__name__)
+
+SHARED_FORMAT_VERSION = 1
+HEADER = struct.Struct("<Q")
+ALIGNMENT = 64
+NAME_PREFIX = "bgo_fs_"
+
+
+def shared_frame_name(key: str) -> str:
+    """Segment name for a frame key; short enough for macOS' 31-character limit."""
+
+    return NAME_PREFIX + hashlib.sha256(key.encode("utf-8")).hexdigest()[:20]
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _Segment(SharedMemory):
+    def __del__(self) -> None:
+        # Decoded frames keep views into the buffer for the life of the process,
+        # so closing at interpreter shutdown can only fail; the OS unmaps it anyway.
+        with contextlib.suppress(BufferError):
+            super().__del__()
+
+
+def _attach(name: str) -> Optional[SharedMemory]:
+    try:
+        try:
+            return _Segment(name=name, track=False)
+        except TypeError:  # Python < 3.13 registers attachers with the resource tracker
+            segment = _Segment(name=name)
+            resource_tracker.unregister(segment._name, "shared_memory")
+            return segment
+    except FileNotFoundError:
+        return None
+
+
+class SharedFrame:
+    """One named shared-memory segment holding an encoded frame."""
+
+    def __init__(self, name: str, lock_dir: Optional[Path] = None):
+        self.name = name
+        self.lock_path = Path(lock_dir or tempfile.gettempdir()) / f"{name}.lock"
+        self.segment: Optional[SharedMemory] = None
+        self.owner = False
+
+    def load(self) -> Optional[Tuple[pd.DataFrame, dict]]:
+        """Attach and return `(frame, extra)`, or None when no complete segment exists."""
+
+        segment = self.segment or _attach(self.name)
+        if segment is None:
+            return None
+        buffer = segment.buf
+        (length,) = HEADER.unpack_from(buffer)
+        if length == 0 or HEADER.size + length > len(buffer):
+            if segment is not self.segment:
+                segment.close()
+            return None
+        manifest = json.loads(bytes(buffer[HEADER.size : HEADER.size + length]))
+        if manifest.get("format") != SHARED_FORMAT_VERSION:
+            if segment is not self.segment:
+                segment.close()
+            return None
+        arrays: Dict[str, np.ndarray] = {}
+        for array_name, spec in manifest["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=spec["offset"])
+            array.flags.writeable = False
+            arrays[array_name] = array
+        self.segment = segment
+        return decode_frame(arrays, manifest["layout"]), manifest.get("extra", {})
+
+    def publish(self, df: pd.DataFrame, extra: Optional[dict] = None) -> Tuple[pd.DataFrame, dict]:
+        """Write `df` into a new segment and return it decoded from shared memory.
+
+        If another process published first, its segment is used instead.
+        """
+
+        arrays, layout = encode_frame(df)
+        # Array offsets are stored in the manifest, so grow the data start until the manifest fits before it.
+        start = 0
+        while True:
+            specs: Dict[str, dict] = {}
+            offset = start
+            for array_name, array in arrays.items():
+                specs[array_name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+                offset = _align(offset + array.nbytes)
+            manifest = json.dumps(
+                {"format": SHARED_FORMAT_VERSION, "layout": layout, "arrays": specs, "extra": extra or {}}
+            ).encode("utf-8")
+            if HEADER.size + len(manifest) <= start:
+                break
+            start = _align(HEADER.size + len(manifest))
+        try:
+            segment = _Segment(name=self.name, create=True, size=max(offset, 1))
+        except FileExistsError:
+            loaded = self.load()
+            if loaded is None:
+                raise
+            return loaded
+        for array_name, array in arrays.items():
+            spec = specs[array_name]
+            target = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf, offset=spec["offset"])
+            target[...] = array
+        segment.buf[HEADER.size : HEADER.size + len(manifest)] = manifest
+        HEADER.pack_into(segment.buf, 0, len(manifest))
+        self.segment = segment
+        self.owner = True
+        atexit.register(self.unlink)
+        loaded = self.load()
+        assert loaded is not None
+        return loaded
+
+    @contextlib.contextmanager
+    def publish_lock(self) -> Iterator[None]:
+        """Hold an exclusive inter-process lock while checking for and publishing the frame."""
+
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a+b") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def unlink(self) -> None:
+        """Remove the published segment's name so new workers stop attaching.
+
+        Only the publishing process unlinks; mappings that are already attached stay valid.
+        """
+
+        if not self.owner or self.segment is None:
+            return
+        self.owner = False
+        with contextlib.suppress(FileNotFoundError):
+            self.segment.unlink()
@@ -9,12 +9,36 @@ from __future__ import annotations
 import json
 import re
 from pathlib import Path
-from typing import Iterable, List, Sequence
+from typing import Dict, Iterable, List, Sequence
 
 import pandas as pd
 
 TEAM_CACHE_DIR = Path("understat_data") / "team_cache"
 
+# Common short forms mapped to the Understat titles used in the datasets.
+TEAM_ALIASES: Dict[str, str] = {
+    "man city": "Manchester City",
+    "man utd": "Manchester United",
+    "man united": "Manchester United",
+    "spurs": "Tottenham",
+    "tottenham hotspur": "Tottenham",
+    "wolves": "Wolverhampton Wanderers",
+    "forest": "Nottingham Forest",
+    "nott'm forest": "Nottingham Forest",
+    "newcastle": "Newcastle United",
+    "west ham united": "West Ham",
+    "brighton & hove albion": "Brighton",
+    "brighton and hove albion": "Brighton",
+    "sheffield utd": "Sheffield United",
+    "leeds united": "Leeds",
+    "leicester city": "Leicester",
+    "ipswich town": "Ipswich",
+    "luton town": "Luton",
+    "afc bournemouth": "Bournemouth",
+    "palace": "Crystal Palace",
+    "villa": "Aston Villa",
+}
+
 
 def slugify(name: str) -> str:
     return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
@@ -30,6 +54,23 @@ def short_name(name: str) -> str:
     return "".join(part[0].upper() for part in parts[:3])
 
 
+def build_alias_table(names: Iterable[str]) -> Dict[str, str]:
+    """Map lower-cased aliases (static short forms, slugs) to lower-cased team names."""
+
+    canonical = {str(name).strip().lower() for name in names}
+    table: Dict[str, str] = {}
+    for alias, target in TEAM_ALIASES.items():
+        target_key = target.lower()
+        if target_key in canonical:
+            table[alias] = target_key
+    for name in canonical:
+        slug = slugify(name)
+        for alias in (slug, slug.replace("_", " ")):
+            if alias not in canonical:
+                table.setdefault(alias, name)
+    return table
+
+
 def _team_cache_path(league: str, season: str) -> Path:
     safe_league = slugify(league).upper()
     return TEAM_CACHE_DIR / f"{safe_league}_{season}.json"
@@ -77,7 +118,7 @@ def ensure_latest_team_caches(df: pd.DataFrame) -> Sequence[Path]:
         return produced
     latest_by_league = (
         df.assign(season=df["season"].astype(str))
-        .groupby("league")["season"]
+        .groupby("league", observed=True)["season"]
         .max()
     )
     for league, season in latest_by_league.items():
@@ -0,0 +1,515 @@
+"""A persisted team ledger: one row per team per completed match.
+
+Several scripts used to rebuild the same "team x match" table their own way:
+`league_v2.compute_team_view` and `dataset_vnext_scoping.expand_team_view`
+from the wide match frame, `transformTeamData.py` for the Team_Results CSVs,
+and `getTeamEloV2.py`, which glued those CSVs back into one row per match.
+`team_rows` is now the only wide-to-long reshape, and `TeamLedger` keeps its
+result per league under `understat_data/team_ledger/v<N>/<league>.pkl`:
+
+    league, season, match_id, match_datetime_utc, team_id, team_name,
+    opponent_id, opponent_name, is_home, goals_for, goals_against, xg_for,
+    xg_against, win_prob, shots_for, shots_against, points, rest_days,
+    elo_pre, elo_post, elo_expectation
+
+Rows are sorted by (team_id, match_datetime_utc). `append` adds newly
+completed matches idempotently and keeps that order, `attach_shots` and
+`attach_elo` fill the columns the later pipeline steps produce, and
+`matches` / `team_results` / `team` are the read side used by the Elo
+script, the Team_Results export and `FeatureStore.team_history`.
+`shot_counts` / `elo_timeseries` give the v5/v7 dataset builds their shot
+and Elo lookups in the shape of the CSV readers they replace.
+
+Usage:
+    python -m pipelines.team_ledger --leagues EPL Serie_A
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import AbstractSet, Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pipelines.match_table import load_match_table
+
+LOGGER = logging.getLogger(__name__)
+
+LEDGER_VERSION = 2
+BASE_DIR = Path("understat_data")
+LEDGER_ROOT = BASE_DIR / "team_ledger"
+TEAM_RESULTS_SUBPATH = Path("Team_Results") / "team_results.csv"
+ELO_TIMESERIES_SUBPATH = Path("Team_Results") / "team_elos_timeseries.csv"
+
+# Long column -> (column of the home side, column of the away side) in a wide match frame.
+SIDE_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "team_id": ("home_team_id", "away_team_id"),
+    "team_name": ("home_team_name", "away_team_name"),
+    "points": ("home_points", "away_points"),
+    "goals_for": ("home_goals", "away_goals"),
+    "goals_against": ("away_goals", "home_goals"),
+    "xg_for": ("home_xg", "away_xg"),
+    "xg_against": ("away_xg", "home_xg"),
+    "win_prob": ("forecast_home_win", "forecast_away_win"),
+}
+LEDGER_SIDES: Dict[str, Tuple[str, str]] = {
+    **SIDE_COLUMNS,
+    "opponent_id": ("away_team_id", "home_team_id"),
+    "opponent_name": ("away_team_name", "home_team_name"),
+}
+
+LEDGER_DTYPES: Dict[str, str] = {
+    "league": "string",
+    "season": "Int64",
+    "match_id": "Int64",
+    "match_datetime_utc": "datetime64[ns]",
+    "team_id": "Int64",
+    "team_name": "string",
+    "opponent_id": "Int64",
+    "opponent_name": "string",
+    "is_home": "int8",
+    "goals_for": "Int64",
+    "goals_against": "Int64",
+    "xg_for": "float64",
+    "xg_against": "float64",
+    "win_prob": "float64",
+    "shots_for": "Int64",
+    "shots_against": "Int64",
+    "points": "Int64",
+    "rest_days": "float64",
+    "elo_pre": "float64",
+    "elo_post": "float64",
+    "elo_expectation": "float64",
+}
+LEDGER_COLUMNS = list(LEDGER_DTYPES)
+TEAM_RESULTS_COLUMNS = [
+    "match_id",
+    "date",
+    "league",
+    "season",
+    "team",
+    "opponent",
+    "venue",
+    "goals_for",
+    "goals_against",
+    "xg_for",
+    "xg_against",
+    "shots_for",
+    "shots_against",
+    "result",
+    "points",
+]
+
+
+def _match_points(matches: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Home and away league points, from `match_outcome_code` when present, else from the score."""
+
+    if "match_outcome_code" in matches.columns:
+        code = matches["match_outcome_code"].to_numpy()
+        home_won, away_won = code == "H", code == "A"
+    else:
+        home_goals = matches["home_goals"].to_numpy(dtype=float, na_value=np.nan)
+        away_goals = matches["away_goals"].to_numpy(dtype=float, na_value=np.nan)
+        home_won, away_won = home_goals > away_goals, home_goals < away_goals
+    home_points = np.where(home_won, 3, np.where(away_won, 0, 1))
+    away_points = np.where(away_won, 3, np.where(home_won, 0, 1))
+    return home_points, away_points
+
+
+def team_rows(
+    matches: pd.DataFrame,
+    time_col: str = "match_datetime_utc",
+    sides: Mapping[str, Tuple[str, str]] = SIDE_COLUMNS,
+    keys: Sequence[str] = ("match_id", "season"),
+) -> pd.DataFrame:
+    """Every match of a wide frame twice, once per side, sorted by (team_id, `time_col`).
+
+    Columns are `keys` (with `time_col` second), the long names of `sides`,
+    `is_home`, then per-team `goal_diff`, `xg_diff`, `match_number` (0-based)
+    and `rest_days` since the previous match. `points` is derived when the
+    frame has no `home_points` / `away_points` columns.
+    """
+
+    if "home_points" not in matches.columns:
+        home_points, away_points = _match_points(matches)
+        matches = matches.assign(home_points=home_points, away_points=away_points)
+    key_cols = [keys[0], time_col, *keys[1:]]
+    frames = []
+    for side, is_home in ((0, 1), (1, 0)):
+        frame = matches[key_cols].copy()
+        for name, columns in sides.items():
+            frame[name] = matches[columns[side]]
+        frame["is_home"] = is_home
+        frames.append(frame)
+    long_df = pd.concat(frames, ignore_index=True).sort_values(["team_id", time_col])
+    long_df["goal_diff"] = long_df["goals_for"] - long_df["goals_against"]
+    long_df["xg_diff"] = long_df["xg_for"] - long_df["xg_against"]
+    long_df["match_number"] = long_df.groupby("team_id").cumcount()
+    long_df["rest_days"] = long_df.groupby("team_id")[time_col].diff().dt.total_seconds().div(86400)
+    return long_df.reset_index(drop=True)
+
+
+def played_matches(table: pd.DataFrame, league: str, season: Optional[int] = None) -> pd.DataFrame:
+    """The completed matches of a `match_table` frame as the wide frame `ledger_rows` reads.
+
+    `season` defaults to the table's `Season` column (the combined
+    `league_results.csv` carries one).
+    """
+
+    played = table[table["is_result"] & table["match_id"].notna()]
+    seasons = season if season is not None else pd.to_numeric(played["Season"], errors="coerce").astype("Int64")
+    return pd.DataFrame(
+        {
+            "match_id": played["match_id"],
+            "league": league,
+            "season": seasons,
+            "match_datetime_utc": played["kickoff"],
+            "home_team_id": played["home_team_id"],
+            "home_team_name": played["home_team_name"],
+            "away_team_id": played["away_team_id"],
+            "away_team_name": played["away_team_name"],
+            "home_goals": played["home_goals"],
+            "away_goals": played["away_goals"],
+            "home_xg": played["home_xg"],
+            "away_xg": played["away_xg"],
+            "forecast_home_win": played["forecast_home_win"],
+            "forecast_away_win": played["forecast_away_win"],
+        }
+    ).reset_index(drop=True)
+
+
+def ledger_rows(matches: pd.DataFrame) -> pd.DataFrame:
+    """Typed ledger rows of a `played_matches` frame; shots and Elo are left missing."""
+
+    rows = team_rows(matches, sides=LEDGER_SIDES, keys=("match_id", "league", "season"))
+    for column in ("shots_for", "shots_against", "elo_pre", "elo_post", "elo_expectation"):
+        rows[column] = np.nan
+    return rows[LEDGER_COLUMNS].astype(LEDGER_DTYPES)
+
+
+def _empty_ledger() -> pd.DataFrame:
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in LEDGER_DTYPES.items()})
+
+
+def _optional(value: Any) -> Any:
+    """A ledger cell as the CSV readers return it: None for missing values."""
+
+    return None if pd.isna(value) else value
+
+
+def _rest_days(frame: pd.DataFrame) -> pd.Series:
+    return frame.groupby("team_id")["match_datetime_utc"].diff().dt.total_seconds().div(86400)
+
+
+class TeamLedger:
+    """One league's ledger, sorted by (team_id, match_datetime_utc)."""
+
+    def __init__(self, league: str, frame: Optional[pd.DataFrame] = None):
+        self.league = league
+        self.frame = _empty_ledger() if frame is None else frame
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @staticmethod
+    def path(league: str, root: Path = LEDGER_ROOT) -> Path:
+        return Path(root) / f"v{LEDGER_VERSION}" / f"{league}.pkl"
+
+    @classmethod
+    def load(cls, league: str, root: Path = LEDGER_ROOT) -> "TeamLedger":
+        """The persisted ledger of `league`; empty when none was saved yet."""
+
+        path = cls.path(league, root)
+        try:
+            with path.open("rb") as fh:
+                return cls(league, pickle.load(fh))
+        except FileNotFoundError:
+            return cls(league)
+        except Exception as exc:  # truncated or written by an incompatible pandas
+            LOGGER.warning("Ignoring unreadable team ledger %s: %s", path, exc)
+            return cls(league)
+
+    def save(self, root: Path = LEDGER_ROOT) -> Path:
+        path = self.path(self.league, root)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=path.parent, suffix=".tmp", delete=False) as fh:
+            pickle.dump(self.frame, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fh.name, path)
+        return path
+
+    def append(self, matches: pd.DataFrame) -> int:
+        """Add the (team, match) rows of `matches` not in the ledger yet; returns how many were added."""
+
+        rows = ledger_rows(matches)
+        if len(self.frame):
+            known = pd.MultiIndex.from_frame(self.frame[["team_id", "match_id"]])
+            rows = rows[~pd.MultiIndex.from_frame(rows[["team_id", "match_id"]]).isin(known)]
+        if rows.empty:
+            return 0
+        frame = pd.concat([self.frame, rows], ignore_index=True) if len(self.frame) else rows
+        frame = frame.sort_values(["team_id", "match_datetime_utc"], kind="stable").reset_index(drop=True)
+        frame["rest_days"] = _rest_days(frame)
+        self.frame = frame
+        return len(rows)
+
+    def attach_shots(self, shots: pd.DataFrame) -> int:
+        """Fill `shots_for` / `shots_against` from a frame with `match_id`, `team` and both counts.
+
+        Returns the number of ledger rows that received counts; rows without a
+        match in `shots` keep what they had.
+        """
+
+        shots = shots.dropna(subset=["match_id", "team"])
+        keys = pd.MultiIndex.from_arrays(
+            [pd.to_numeric(shots["match_id"]).astype("Int64"), shots["team"].astype("string").str.strip()]
+        )
+        lookup = shots[["shots_for", "shots_against"]].set_axis(keys)
+        lookup = lookup[~lookup.index.duplicated(keep="last")]
+        found = lookup.reindex(
+            pd.MultiIndex.from_arrays([self.frame["match_id"], self.frame["team_name"].str.strip()])
+        )
+        hit = found["shots_for"].notna().to_numpy()
+        for column in ("shots_for", "shots_against"):
+            values = pd.to_numeric(found[column]).astype("Int64").to_numpy()
+            self.frame.loc[hit, column] = values[hit]
+        return int(hit.sum())
+
+    def attach_elo(self, timeseries: pd.DataFrame) -> int:
+        """Fill `elo_pre` / `elo_post` / `elo_expectation` from a `team_elos_timeseries.csv` frame.
+
+        Pre-match ratings reverse the exported update, as `dataset_build.load_elo_timeseries` does:
+        `pre = post -/+ k_eff * (actual - (p_home + p_draw / 2))`. The expectation is
+        the team's expected score, `p_home + p_draw / 2` for the home side.
+        """
+
+        series = timeseries.dropna(subset=["match_id"]).drop_duplicates("match_id", keep="last")
+        home_goals, away_goals = series["home_goals"].astype(float), series["away_goals"].astype(float)
+        actual = np.where(home_goals > away_goals, 1.0, np.where(home_goals < away_goals, 0.0, 0.5))
+        expectation = series["p_home"] + 0.5 * series["p_draw"]
+        delta = series["k_eff"] * (actual - expectation)
+        per_side = pd.DataFrame(
+            {
+                "match_id": np.concatenate([series["match_id"], series["match_id"]]),
+                "is_home": np.repeat(np.array([1, 0], dtype="int8"), len(series)),
+                "elo_pre": np.concatenate([series["home_elo_post"] - delta, series["away_elo_post"] + delta]),
+                "elo_post": np.concatenate([series["home_elo_post"], series["away_elo_post"]]),
+                "elo_expectation": np.concatenate([expectation, 1.0 - expectation]),
+            }
+        )
+        per_side["match_id"] = pd.to_numeric(per_side["match_id"]).astype("Int64")
+        found = per_side.set_index(["match_id", "is_home"]).reindex(
+            pd.MultiIndex.from_frame(self.frame[["match_id", "is_home"]])
+        )
+        hit = found["elo_post"].notna().to_numpy()
+        for column in ("elo_pre", "elo_post", "elo_expectation"):
+            self.frame.loc[hit, column] = found[column].to_numpy()[hit]
+        return int(hit.sum())
+
+    def _rows(self, match_ids: Optional[AbstractSet[str]]) -> pd.DataFrame:
+        if match_ids is None:
+            return self.frame
+        return self.frame[self.frame["match_id"].astype(str).isin(match_ids)]
+
+    def shot_counts(self, match_ids: Optional[AbstractSet[str]] = None) -> Dict[Tuple[str, str, str], Dict[str, Optional[int]]]:
+        """`dataset_build.load_team_shot_counts` entries: (league, match_id, team) -> shots for/against."""
+
+        rows = self._rows(match_ids)
+        return {
+            (self.league, str(match_id), team): {"shots_for": _optional(shots_for), "shots_against": _optional(shots_against)}
+            for match_id, team, shots_for, shots_against in zip(
+                rows["match_id"].tolist(), rows["team_name"].tolist(), rows["shots_for"].tolist(), rows["shots_against"].tolist()
+            )
+        }
+
+    def elo_timeseries(self, match_ids: Optional[AbstractSet[str]] = None) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """`dataset_build.load_elo_timeseries` entries of the rated matches: (league, match_id) -> pre-match ratings."""
+
+        rows = self._rows(match_ids)
+        home = rows[(rows["is_home"] == 1) & rows["elo_post"].notna()]
+        away_pre = rows.loc[rows["is_home"] == 0, ["match_id", "elo_pre"]].set_index("match_id")["elo_pre"]
+        return {
+            (self.league, str(match_id)): {
+                "home_team": home_team,
+                "away_team": away_team,
+                "home_elo_pre": _optional(home_pre),
+                "away_elo_pre": _optional(away_elo),
+                "elo_expectation_home": _optional(expectation),
+            }
+            for match_id, home_team, away_team, home_pre, away_elo, expectation in zip(
+                home["match_id"].tolist(),
+                home["team_name"].tolist(),
+                home["opponent_name"].tolist(),
+                home["elo_pre"].tolist(),
+                away_pre.reindex(home["match_id"]).tolist(),
+                home["elo_expectation"].tolist(),
+            )
+        }
+
+    def team(self, team: object, before: Optional[object] = None, last: Optional[int] = None) -> pd.DataFrame:
+        """One team's rows, oldest first. `team` is a team id or a (case-insensitive) name.
+
+        `before` keeps matches kicking off strictly before that time; `last`
+        keeps only the most recent ones.
+        """
+
+        if isinstance(team, str):
+            mask = self.frame["team_name"].str.lower() == team.strip().lower()
+        else:
+            mask = self.frame["team_id"] == int(team)
+        if before is not None:
+            mask &= self.frame["match_datetime_utc"] < pd.Timestamp(before)
+        rows = self.frame[mask.fillna(False)]
+        if last is not None:
+            rows = rows.tail(last)
+        return rows.reset_index(drop=True)
+
+    def matches(self) -> pd.DataFrame:
+        """One row per match (home perspective plus the away side's shots and Elo), in kickoff order."""
+
+        home = self.frame[self.frame["is_home"] == 1]
+        away = self.frame.loc[self.frame["is_home"] == 0, ["match_id", "shots_for", "elo_pre", "elo_post"]]
+        wide = home.merge(away, on="match_id", how="left", suffixes=("", "_away"))
+        wide = wide.rename(
+            columns={
+                "team_id": "home_team_id",
+                "team_name": "home_team",
+                "opponent_id": "away_team_id",
+                "opponent_name": "away_team",
+                "goals_for": "home_goals",
+                "goals_against": "away_goals",
+                "xg_for": "home_xg",
+                "xg_against": "away_xg",
+                "shots_for": "home_shots",
+                "shots_for_away": "away_shots",
+                "elo_pre": "home_elo_pre",
+                "elo_post": "home_elo_post",
+                "elo_pre_away": "away_elo_pre",
+                "elo_post_away": "away_elo_post",
+            }
+        )
+        columns = [
+            "match_id",
+            "league",
+            "season",
+            "match_datetime_utc",
+            "home_team_id",
+            "home_team",
+            "away_team_id",
+            "away_team",
+            "home_goals",
+            "away_goals",
+            "home_xg",
+            "away_xg",
+            "home_shots",
+            "away_shots",
+            "home_elo_pre",
+            "away_elo_pre",
+            "home_elo_post",
+            "away_elo_post",
+        ]
+        return wide[columns].sort_values(["season", "match_datetime_utc", "match_id"], kind="stable").reset_index(drop=True)
+
+    def team_results(self) -> pd.DataFrame:
+        """The Team_Results CSV layout: teams by name, each team's matches by season and kickoff."""
+
+        frame = self.frame
+        goals_for, goals_against = frame["goals_for"], frame["goals_against"]
+        result = np.where(goals_for > goals_against, "w", np.where(goals_for < goals_against, "l", "d"))
+        out = pd.DataFrame(
+            {
+                "match_id": frame["match_id"],
+                "date": frame["match_datetime_utc"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+                "league": frame["league"],
+                "season": frame["season"],
+                "team": frame["team_name"],
+                "opponent": frame["opponent_name"],
+                "venue": np.where(frame["is_home"] == 1, "Home", "Away"),
+                "goals_for": goals_for,
+                "goals_against": goals_against,
+                "xg_for": frame["xg_for"],
+                "xg_against": frame["xg_against"],
+                "shots_for": frame["shots_for"],
+                "shots_against": frame["shots_against"],
+                "result": pd.Series(result, index=frame.index).where(goals_for.notna() & goals_against.notna()),
+                "points": frame["points"],
+            }
+        )
+        order = pd.DataFrame(
+            {"team": frame["team_name"].str.lower(), "season": frame["season"], "kickoff": frame["match_datetime_utc"]}
+        )
+        return out.loc[order.sort_values(["team", "season", "kickoff"], kind="stable").index].reset_index(drop=True)
+
+
+def _season_results_files(league_root: Path) -> List[Path]:
+    return sorted(
+        path for path in league_root.glob("*/league_results.csv") if path.parent.name.isdigit()
+    )
+
+
+def read_played_matches(base_dir: Path, league: str, match_table_root: Optional[Path] = None) -> pd.DataFrame:
+    """Completed matches of every `<base_dir>/<league>/<season>/league_results.csv`."""
+
+    frames = [
+        played_matches(load_match_table(path, match_table_root), league, int(path.parent.name))
+        for path in _season_results_files(Path(base_dir) / league)
+    ]
+    if not frames:
+        raise FileNotFoundError(f"No <season>/league_results.csv under {Path(base_dir) / league}")
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_optional_csv(path: Path) -> Optional[pd.DataFrame]:
+    if not path.exists():
+        return None
+    return pd.read_csv(path, float_precision="round_trip")
+
+
+def update_team_ledger(
+    league: str,
+    base_dir: Path = BASE_DIR,
+    root: Path = LEDGER_ROOT,
+    match_table_root: Optional[Path] = None,
+) -> Tuple[TeamLedger, int]:
+    """Append the league's newly completed matches to its persisted ledger, refresh shots and Elo, and save it.
+
+    Returns the ledger and the number of rows added.
+    """
+
+    base_dir = Path(base_dir)
+    if match_table_root is None:
+        match_table_root = base_dir / "match_tables"
+    ledger = TeamLedger.load(league, root)
+    added = ledger.append(read_played_matches(base_dir, league, match_table_root))
+    shots = _read_optional_csv(base_dir / league / TEAM_RESULTS_SUBPATH)
+    if shots is not None:
+        ledger.attach_shots(shots)
+    elo = _read_optional_csv(base_dir / league / ELO_TIMESERIES_SUBPATH)
+    if elo is not None:
+        ledger.attach_elo(elo)
+    ledger.save(root)
+    return ledger, added
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build or update the per-league team ledgers")
+    parser.add_argument("--leagues", nargs="+", default=["Bundesliga", "EPL", "La_liga", "Ligue_1", "Serie_A"])
+    parser.add_argument("--base-dir", type=Path, default=BASE_DIR)
+    parser.add_argument("--root", type=Path, default=LEDGER_ROOT)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    for league in args.leagues:
+        ledger, added = update_team_ledger(league, args.base_dir, args.root)
+        print(f"{league}: {len(ledger)} team rows (+{added}) -> {TeamLedger.path(league, args.root)}")
+
+
+if __name__ == "__main__":
+    main()
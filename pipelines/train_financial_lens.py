@@ -12,6 +12,8 @@ import pandas as pd
 from sklearn.metrics import accuracy_score, log_loss
 from xgboost import XGBClassifier
 
+from pipelines.typed_dataset import load_dataset
+
 FEATURES = [
     "squad_value_ratio",
     "squad_value_diff",
@@ -128,7 +130,7 @@ def main() -> None:
     if not args.dataset.exists():
         raise FileNotFoundError(f"Financial dataset not found at {args.dataset}")
 
-    df = pd.read_csv(args.dataset)
+    df = load_dataset(args.dataset)
     _ensure_columns(df)
 
     model, metrics = _train_model(df, args.val_season, args.test_season)
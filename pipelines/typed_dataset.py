@@ -0,0 +1,155 @@
+"""Typed Parquet mirrors of the dataset CSVs.
+
+The builders keep writing `Dataset*.csv` for the web app and the notebooks,
+and next to each CSV they now write `<stem>.parquet` holding the same frame
+with its dtypes (int, float, string, timestamp) stored in the schema. The
+Parquet metadata also records the feature groups each column belongs to and
+the sha256 of the CSV it mirrors. Readers only trust a mirror whose digest
+matches the CSV next to it; a hand-edited or re-downloaded CSV falls back to
+`pd.read_csv`. Writing and reading mirrors needs `pyarrow`; without it every
+call quietly uses the CSV.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import pandas as pd
+
+from pipelines.frame_snapshot import file_digest
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+LOGGER = logging.getLogger(__name__)
+
+TYPED_FORMAT_VERSION = 1
+TYPED_SUFFIX = ".parquet"
+METADATA_KEY = b"bgo.dataset"
+DATE_COLUMNS = ("match_datetime_utc", "match_date")
+OTHER_GROUP = "other"
+
+
+def typed_dataset_path(csv_path: Path) -> Path:
+    return Path(csv_path).with_suffix(TYPED_SUFFIX)
+
+
+def column_groups(columns: Iterable[str], groups: Mapping[str, Sequence[str]]) -> Dict[str, List[str]]:
+    """Assign each column to the first group listing it; the rest go to `other`."""
+
+    owner: Dict[str, str] = {}
+    for name, members in groups.items():
+        for column in members:
+            owner.setdefault(column, name)
+    result: Dict[str, List[str]] = {}
+    for column in columns:
+        result.setdefault(owner.get(column, OTHER_GROUP), []).append(column)
+    return result
+
+
+def write_typed_dataset(
+    csv_path: Path,
+    feature_groups: Optional[Mapping[str, Sequence[str]]] = None,
+    metadata: Optional[Mapping[str, object]] = None,
+) -> Optional[Path]:
+    """Write the Parquet mirror of `csv_path`; returns None when pyarrow is unavailable.
+
+    The frame is parsed from the CSV itself so both formats load to the same
+    values and dtypes.
+    """
+
+    if pq is None:
+        LOGGER.info("pyarrow not installed; skipping the typed mirror of %s", csv_path)
+        return None
+    csv_path = Path(csv_path)
+    frame = pd.read_csv(csv_path, parse_dates=[column for column in DATE_COLUMNS if column in _csv_header(csv_path)])
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    payload = {
+        "format_version": TYPED_FORMAT_VERSION,
+        "source": csv_path.name,
+        "source_sha256": file_digest(csv_path),
+        "rows": len(frame),
+        "feature_groups": column_groups(frame.columns, feature_groups or {}),
+        **dict(metadata or {}),
+    }
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(payload).encode("utf-8")
+    table = table.replace_schema_metadata(schema_metadata)
+
+    path = typed_dataset_path(csv_path)
+    with tempfile.NamedTemporaryFile("wb", dir=path.parent, suffix=".tmp", delete=False) as fh:
+        pq.write_table(table, fh)
+    os.replace(fh.name, path)
+    return path
+
+
+def read_typed_metadata(csv_path: Path) -> Optional[dict]:
+    """The embedded metadata of the mirror of `csv_path`, or None when there is no usable mirror."""
+
+    if pq is None:
+        return None
+    path = typed_dataset_path(csv_path)
+    if not path.exists():
+        return None
+    try:
+        raw = (pq.read_schema(path).metadata or {}).get(METADATA_KEY)
+    except (OSError, pa.ArrowException) as exc:
+        LOGGER.warning("Ignoring unreadable typed dataset %s: %s", path, exc)
+        return None
+    if raw is None:
+        return None
+    payload = json.loads(raw)
+    if payload.get("format_version") != TYPED_FORMAT_VERSION:
+        return None
+    return payload
+
+
+def read_typed_dataset(
+    csv_path: Path,
+    columns: Optional[Sequence[str]] = None,
+    source_digest: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """The mirror of `csv_path` as a frame, or None if it is missing or was built from other bytes.
+
+    `columns` are returned in file order, like `pd.read_csv(usecols=...)`.
+    Pass `source_digest` when the CSV's sha256 is already known.
+    """
+
+    metadata = read_typed_metadata(csv_path)
+    if metadata is None:
+        return None
+    digest = source_digest or file_digest(Path(csv_path))
+    if metadata.get("source_sha256") != digest:
+        LOGGER.info("Typed dataset for %s is stale; reading the CSV", csv_path)
+        return None
+    path = typed_dataset_path(csv_path)
+    if columns is not None:
+        wanted = set(columns)
+        columns = [name for name in pq.read_schema(path).names if name in wanted]
+    return pq.read_table(path, columns=columns).to_pandas()
+
+
+def load_dataset(csv_path: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Load a dataset from its typed mirror when it is current, else from the CSV.
+
+    Either way the `DATE_COLUMNS` present come back as timestamps.
+    """
+
+    frame = read_typed_dataset(csv_path, columns=columns)
+    if frame is not None:
+        return frame
+    header = _csv_header(Path(csv_path))
+    wanted = header if columns is None else [column for column in header if column in set(columns)]
+    return pd.read_csv(csv_path, usecols=columns, parse_dates=[column for column in DATE_COLUMNS if column in wanted])
+
+
+def _csv_header(csv_path: Path) -> List[str]:
+    return list(pd.read_csv(csv_path, nrows=0).columns)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the stage-cached dataset builds.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_dataset_build.py volatility --scales 1 10
+    PYTHONPATH=. python scripts/bench_dataset_build.py rolling --scales 1 10
+    PYTHONPATH=. python scripts/bench_dataset_build.py build --version 7
+    PYTHONPATH=. python scripts/bench_dataset_build.py formats --versions 3 5 7
+    PYTHONPATH=. python scripts/bench_dataset_build.py leagues --jobs 1 4
+    PYTHONPATH=. python scripts/bench_dataset_build.py stream --seasons 5 10 20
+    PYTHONPATH=. python scripts/bench_dataset_build.py elo --seasons 50
+
+Each subcommand prints one line per variant with the median wall time (plus
+the file size for `formats` and the traced peak memory for `stream`) so results
+can be pasted into PR descriptions or release notes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from pipelines.dataset_build import (
+    BASE_DIR,
+    OUTPUT_TEMPLATE,
+    TARGET_LEAGUE,
+    BuildConfig,
+    StageCache,
+    available_leagues,
+    build_dataset,
+    build_leagues,
+    collect_league_results,
+    league_frame,
+    load_team_shot_counts,
+    volatility_columns,
+)
+from analysis import build_league_results_v2 as league_v2
+import getTeamEloV2 as elo_v2
+from pipelines._synthetic import write_synthetic_league
+from pipelines.dataset_stream import stream_dataset
+from pipelines.team_ledger import update_team_ledger
+from pipelines.typed_dataset import DATE_COLUMNS, read_typed_dataset, typed_dataset_path, write_typed_dataset
+
+
+def _time_call(fn: Callable[[], object], repeat: int) -> List[float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label: str, timings: List[float], unit: str = "ms", scale: float = 1e3) -> None:
+    median = statistics.median(timings) * scale
+    best = min(timings) * scale
+    print(f"{label:<32} median={median:9.3f}{unit}  best={best:9.3f}{unit}  n={len(timings)}")
+
+
+def _scaled_rows(rows: List[dict], shot_map: dict, scale: int):
+    """`scale` copies of the dataset rows, each with its own team names and shot entries."""
+
+    scaled_rows: List[dict] = []
+    scaled_shots = dict(shot_map)
+    for copy_idx in range(1, scale):
+        suffix = f" L{copy_idx}"
+        for row in rows:
+            scaled = dict(row, home_team_name=row["home_team_name"] + suffix, away_team_name=row["away_team_name"] + suffix)
+            scaled_rows.append(scaled)
+        for (league, match_id, team), shots in shot_map.items():
+            scaled_shots[(league, match_id, team + suffix)] = shots
+    return rows + scaled_rows, scaled_shots
+
+
+def _scaled_long_table(long_df: pd.DataFrame, scale: int) -> pd.DataFrame:
+    """`scale` copies of a team-long table, each copy with its own team ids."""
+
+    offset = int(long_df["team_id"].max()) + 1
+    copies = [long_df.assign(team_id=long_df["team_id"] + copy_idx * offset) for copy_idx in range(scale)]
+    return pd.concat(copies, ignore_index=True)
+
+
+def _peak_memory(fn: Callable[[], object]) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        fn()
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_volatility(args: argparse.Namespace) -> None:
+    path = BASE_DIR / OUTPUT_TEMPLATE.format(version=args.dataset_version)
+    with open(path, newline="") as fp:
+        rows = list(csv.DictReader(fp))
+    shot_map = load_team_shot_counts(str(BASE_DIR))
+    for scale in args.scales:
+        scaled_rows, scaled_shots = _scaled_rows(rows, shot_map, scale)
+        timings = _time_call(lambda: volatility_columns((scaled_rows, []), scaled_shots), args.repeat)
+        _report(f"volatility x{scale} ({len(scaled_rows)} rows)", timings)
+
+
+def bench_rolling(args: argparse.Namespace) -> None:
+    records = collect_league_results(str(BASE_DIR / TARGET_LEAGUE), TARGET_LEAGUE)
+    long_df = league_v2.compute_team_view(league_frame(records))
+    for scale in args.scales:
+        scaled = _scaled_long_table(long_df, scale)
+        timings = _time_call(lambda: league_v2.add_rolling_features(scaled.copy()), args.repeat)
+        _report(f"rolling x{scale} ({len(scaled)} team rows)", timings)
+
+
+def bench_build(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "dataset.csv"
+        cache = StageCache(Path(tmp) / "stage_cache")
+        _report(f"v{args.version} uncached", _time_call(lambda: build_dataset(args.version, output, cache=None), args.repeat))
+        build_dataset(args.version, output, cache=cache)
+        _report(f"v{args.version} warm cache", _time_call(lambda: build_dataset(args.version, output, cache=cache), args.repeat))
+
+
+def bench_formats(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for version in args.versions:
+            csv_path = Path(tmp) / OUTPUT_TEMPLATE.format(version=version)
+            shutil.copyfile(BASE_DIR / csv_path.name, csv_path)
+            if write_typed_dataset(csv_path) is None:
+                raise SystemExit("pyarrow is required for the typed format")
+            typed_path = typed_dataset_path(csv_path)
+            header = list(pd.read_csv(csv_path, nrows=0).columns)
+            parse_dates = [column for column in DATE_COLUMNS if column in header]
+            for label, path, load in (
+                ("csv", csv_path, lambda: pd.read_csv(csv_path, parse_dates=parse_dates)),
+                ("parquet", typed_path, lambda: read_typed_dataset(csv_path)),
+            ):
+                timings = _time_call(load, args.repeat)
+                _report(f"v{version} {label} ({path.stat().st_size / 1024:.0f}KB)", timings)
+
+
+def bench_leagues(args: argparse.Namespace) -> None:
+    leagues = args.leagues or available_leagues(BASE_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = [([TARGET_LEAGUE], 1)] + [(leagues, jobs) for jobs in args.jobs]
+        for subset, jobs in variants:
+            builds = []
+
+            def _build() -> None:
+                builds.append(build_leagues(args.version, subset, Path(tmp) / "out", cache=None, jobs=jobs, typed=False))
+
+            timings = _time_call(_build, args.repeat)
+            rows = builds[-1].rows
+            _report(f"v{args.version} {len(subset)} league(s) jobs={builds[-1].jobs}", timings, unit="s", scale=1.0)
+            print(f"{'':<32} {rows / statistics.median(timings):9.0f} rows/s  ({rows} rows, {os.cpu_count()} cores)")
+
+
+def bench_stream(args: argparse.Namespace) -> None:
+    for seasons in args.seasons:
+        with tempfile.TemporaryDirectory() as tmp:
+            base_dir = Path(tmp) / "understat_data"
+            write_synthetic_league(base_dir, "Synthetic", seasons, args.teams)
+            config = BuildConfig(base_dir=base_dir, league="Synthetic")
+            for label, build in (
+                ("batch", lambda: build_dataset(args.version, Path(tmp) / "batch.csv", config, cache=None, typed=False)),
+                ("stream", lambda: stream_dataset(args.version, Path(tmp) / "stream.csv", config)),
+            ):
+                seconds, peak = _peak_memory(build)
+                print(f"v{args.version} {label:<6} {seasons:3d} seasons  {seconds:7.2f}s  peak={peak / 2**20:8.1f}MB")
+
+
+def bench_elo(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = [(league, BASE_DIR) for league in args.leagues or available_leagues(BASE_DIR)]
+        for seasons in args.seasons:
+            base_dir = Path(tmp) / f"synthetic_{seasons}"
+            write_synthetic_league(base_dir, "Synthetic", seasons, args.teams)
+            variants.append(("Synthetic", base_dir))
+        for league, base_dir in variants:
+            ledger, _ = update_team_ledger(league, base_dir, Path(tmp) / base_dir.name / "team_ledger")
+            matches = elo_v2.load_matches_from_ledger(ledger)
+            label = league if base_dir == BASE_DIR else f"{league} {base_dir.name.split('_')[1]} seasons"
+            _report(f"elo {label} ({len(matches)} matches)", _time_call(lambda: elo_v2.run_elo(matches), args.repeat))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--repeat", type=int, default=5)
+    parser = argparse.ArgumentParser(description="Dataset build benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    volatility = sub.add_parser("volatility", parents=[common], help="volatility_columns on scaled copies of the dataset")
+    volatility.add_argument("--dataset-version", default="7")
+    volatility.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    rolling = sub.add_parser("rolling", parents=[common], help="league_v2.add_rolling_features on scaled copies of the team-long table")
+    rolling.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    build = sub.add_parser("build", parents=[common], help="Full build with no cache vs a warm stage cache")
+    build.add_argument("--version", default="7")
+    formats = sub.add_parser("formats", parents=[common], help="Load time and size: CSV vs typed Parquet mirror")
+    formats.add_argument("--versions", nargs="+", default=["3", "5", "7"])
+    leagues = sub.add_parser("leagues", parents=[common], help="Uncached wall time: one league vs every league at N workers")
+    leagues.add_argument("--version", default="7")
+    leagues.add_argument("--leagues", nargs="+", help="Leagues to build (default: every league found)")
+    leagues.add_argument("--jobs", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    stream = sub.add_parser("stream", help="Traced peak memory: batch vs streaming build of a synthetic league")
+    stream.add_argument("--version", default="7")
+    stream.add_argument("--seasons", type=int, nargs="+", default=[5, 10, 20])
+    stream.add_argument("--teams", type=int, default=20)
+    elo = sub.add_parser("elo", parents=[common], help="getTeamEloV2.run_elo on every league and synthetic histories")
+    elo.add_argument("--leagues", nargs="+", help="Leagues to rate (default: every league found)")
+    elo.add_argument("--seasons", type=int, nargs="+", default=[50])
+    elo.add_argument("--teams", type=int, default=20)
+    return parser.parse_args(argv)
+
+
+COMMANDS = {
+    "volatility": bench_volatility,
+    "rolling": bench_rolling,
+    "build": bench_build,
+    "formats": bench_formats,
+    "leagues": bench_leagues,
+    "stream": bench_stream,
+    "elo": bench_elo,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the Python feature store.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_feature_store.py cold-start --repeat 5
+    PYTHONPATH=. python scripts/bench_feature_store.py lookup --lookups 200
+    PYTHONPATH=. python scripts/bench_feature_store.py augment --scales 1 5 20
+    PYTHONPATH=. python scripts/bench_feature_store.py memory --versions 3 5 7
+    PYTHONPATH=. python scripts/bench_feature_store.py refresh --appended 1 10 100
+    PYTHONPATH=. python scripts/bench_feature_store.py workers --workers 4
+    PYTHONPATH=. python scripts/bench_feature_store.py cache --season 2025
+
+Each subcommand prints one line per variant with the median wall time (or the
+frame footprint for `memory`) so results can be pasted into PR descriptions or
+release notes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from pipelines.feature_store import (
+    FeatureCache,
+    FeatureStore,
+    TieredFeatureCache,
+    _augment_dataframe,
+    _cache_key,
+    _dataset_path_from_version,
+)
+
+
+def _time_call(fn: Callable[[], object], repeat: int) -> List[float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label: str, timings: List[float], unit: str = "ms", scale: float = 1e3) -> None:
+    median = statistics.median(timings) * scale
+    best = min(timings) * scale
+    print(f"{label:<32} median={median:9.3f}{unit}  best={best:9.3f}{unit}  n={len(timings)}")
+
+
+def bench_cold_start(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_root = Path(tmp)
+
+        def rebuild() -> None:
+            FeatureStore(dataset_version=args.dataset_version, cache_path=None, snapshot_root=None).df
+
+        def from_snapshot() -> None:
+            FeatureStore(dataset_version=args.dataset_version, cache_path=None, snapshot_root=snapshot_root).df
+
+        from_snapshot()  # populate the snapshot once
+        _report("csv parse + augment", _time_call(rebuild, args.repeat))
+        _report("memory-mapped snapshot", _time_call(from_snapshot, args.repeat))
+
+
+def bench_lookup(args: argparse.Namespace) -> None:
+    store = FeatureStore(dataset_version=args.dataset_version, cache_path=None)
+    df = store.df
+    fixtures = list(
+        zip(
+            df["season"].astype(str),
+            df["home_team_name"].astype(str),
+            df["away_team_name"].astype(str),
+        )
+    )[: args.lookups]
+    match_ids = [int(value) for value in df["match_id"].to_numpy()[: args.lookups]]
+
+    def mask_scan() -> None:
+        for season, home, away in fixtures:
+            mask = (
+                (df["season"].astype(str) == season)
+                & (df["home_team_name"].str.lower() == home.lower())
+                & (df["away_team_name"].str.lower() == away.lower())
+            )
+            np.flatnonzero(mask.to_numpy())[0]
+
+    def id_scan() -> None:
+        for match_id in match_ids:
+            np.flatnonzero((df["match_id"] == match_id).to_numpy())[0]
+
+    view = store._frame_view()
+
+    def indexed() -> None:
+        for season, home, away in fixtures:
+            view.fixture_index[(season.lower(), view.resolve_team(home), view.resolve_team(away))]
+
+    def id_indexed() -> None:
+        for match_id in match_ids:
+            view.match_index[match_id]
+
+    per_lookup = 1e6 / len(fixtures)
+    _report("fixture mask scan", _time_call(mask_scan, args.repeat), unit="us", scale=per_lookup)
+    _report("fixture hash index", _time_call(indexed, args.repeat), unit="us", scale=per_lookup)
+    _report("match_id scan", _time_call(id_scan, args.repeat), unit="us", scale=per_lookup)
+    _report("match_id hash index", _time_call(id_indexed, args.repeat), unit="us", scale=per_lookup)
+
+
+def _scaled_baseline(store: FeatureStore, scale: int) -> "pd.DataFrame":
+    """Stack copies of the dataset as extra leagues so group counts grow with `scale`."""
+
+    base = pd.read_csv(store.dataset_path, parse_dates=["match_datetime_utc", "match_date"])
+    base = base.sort_values("match_datetime_utc")
+    frames = []
+    for copy_idx in range(scale):
+        frame = base.copy()
+        for column in ("home_team_name", "away_team_name"):
+            frame[column] = frame[column] + f" L{copy_idx}"
+        frame["match_id"] = frame["match_id"] + copy_idx * 1_000_000
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True)
+    df["season"] = df["season"].astype(str)
+    df["home_team"] = df["home_team_name"]
+    df["away_team"] = df["away_team_name"]
+    return df
+
+
+def bench_augment(args: argparse.Namespace) -> None:
+    store = FeatureStore(dataset_version=args.dataset_version, cache_path=None, snapshot_root=None)
+    for scale in args.scales:
+        baseline = _scaled_baseline(store, scale)
+        timings = _time_call(lambda: _augment_dataframe(baseline.copy(), store.rolling_window), args.repeat)
+        _report(f"augment x{scale} ({len(baseline)} rows)", timings)
+
+
+def bench_memory(args: argparse.Namespace) -> None:
+    totals = {False: 0, True: 0}
+    for version in args.versions:
+        for compact in (False, True):
+            store = FeatureStore(dataset_version=version, cache_path=None, snapshot_root=None, compact=compact)
+            size = store.memory_usage()
+            totals[compact] += size
+            label = f"v{version} {'compact' if compact else 'full'}"
+            print(f"{label:<32} {size / 1e6:9.2f}MB  columns={len(store.df.columns)}  rows={len(store.df)}")
+    print(f"{'all versions full':<32} {totals[False] / 1e6:9.2f}MB")
+    print(f"{'all versions compact':<32} {totals[True] / 1e6:9.2f}MB")
+
+
+def bench_refresh(args: argparse.Namespace) -> None:
+    lines = _dataset_path_from_version(args.dataset_version).read_bytes().splitlines(keepends=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = Path(tmp) / "dataset.csv"
+        for appended in args.appended:
+            refresh_timings: List[float] = []
+            rebuild_timings: List[float] = []
+            for _ in range(args.repeat):
+                dataset.write_bytes(b"".join(lines[:-appended]))
+                store = FeatureStore(
+                    dataset_version=args.dataset_version,
+                    dataset_path=dataset,
+                    cache_path=Path(tmp) / "cache.sqlite",
+                    snapshot_root=Path(tmp) / "snapshots",
+                )
+                store.df
+                with dataset.open("ab") as fh:
+                    fh.write(b"".join(lines[-appended:]))
+                start = time.perf_counter()
+                summary = store.refresh()
+                refresh_timings.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                FeatureStore(
+                    dataset_version=args.dataset_version, dataset_path=dataset, cache_path=None, snapshot_root=None
+                ).df
+                rebuild_timings.append(time.perf_counter() - start)
+            _report(f"refresh +{appended} rows ({summary.mode})", refresh_timings)
+            _report(f"full rebuild +{appended} rows", rebuild_timings)
+
+
+_WORKER_SCRIPT = """
+import json, sys, time
+from pathlib import Path
+from pipelines.feature_store import FeatureStore
+
+start = time.perf_counter()
+store = FeatureStore(dataset_version=sys.argv[1], cache_path=None, snapshot_root=None, shared_memory=sys.argv[2] == "1")
+built = []
+build = store._build_frame
+store._build_frame = lambda: built.append(1) or build()
+store.get_feature_matrix(None, next(iter(store.model_features)))
+private_kb = 0
+rollup = Path("/proc/self/smaps_rollup")
+if rollup.exists():
+    for line in rollup.read_text().splitlines():
+        if line.startswith(("Private_Clean:", "Private_Dirty:")):
+            private_kb += int(line.split()[1])
+print(json.dumps({"seconds": time.perf_counter() - start, "built": len(built), "private_kb": private_kb}), flush=True)
+sys.stdin.read()  # stay alive, like a serving worker, until every sibling is ready
+"""
+
+
+def bench_workers(args: argparse.Namespace) -> None:
+    for shared in (False, True):
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-W", "ignore", "-c", _WORKER_SCRIPT, args.dataset_version, "1" if shared else "0"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for _ in range(args.workers)
+        ]
+        results = [json.loads(proc.stdout.readline()) for proc in procs]
+        for proc in procs:
+            proc.communicate()
+        label = f"{args.workers} workers {'shared' if shared else 'private'}"
+        seconds = statistics.median(result["seconds"] for result in results) * 1e3
+        builds = sum(result["built"] for result in results)
+        private = sum(result["private_kb"] for result in results) / 1e3
+        print(f"{label:<32} ready median={seconds:9.3f}ms  builds={builds}  private={private:8.1f}MB")
+
+
+_LEGACY_CACHE_SQL = """
+    CREATE TABLE feature_cache (
+        dataset_version TEXT NOT NULL,
+        season TEXT NOT NULL,
+        home TEXT NOT NULL,
+        away TEXT NOT NULL,
+        match_id INTEGER NOT NULL,
+        dataset_mtime REAL NOT NULL,
+        payload TEXT NOT NULL,
+        PRIMARY KEY (dataset_version, season, home, away)
+    )
+"""
+
+
+def _legacy_set(path: Path, version: str, mtime: float, row: tuple) -> None:
+    # The original FeatureCache.set: a fresh connection, a rollback-journal commit and a JSON payload per fixture.
+    season, home, away, match_id, features = row
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO feature_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (version, season, home, away, match_id, mtime, json.dumps(features)),
+        )
+        conn.commit()
+
+
+def _legacy_get(path: Path, version: str, mtime: float, key: tuple) -> Optional[dict]:
+    with sqlite3.connect(path) as conn:
+        row = conn.execute(
+            "SELECT payload, dataset_mtime FROM feature_cache "
+            "WHERE dataset_version = ? AND season = ? AND home = ? AND away = ?",
+            (version, *key),
+        ).fetchone()
+    return json.loads(row[0]) if row and abs(row[1] - mtime) <= 1e-6 else None
+
+
+def bench_cache(args: argparse.Namespace) -> None:
+    store = FeatureStore(dataset_version=args.dataset_version, cache_path=None)
+    df = store.df
+    season = args.season or store.latest_season
+    rows = [df.iloc[position] for position in (df["season"].astype(str) == season).to_numpy().nonzero()[0]]
+    entries = [(*_cache_key(row), int(row["match_id"]), store._row_features(row)) for row in rows]
+    keys = [entry[:3] for entry in entries]
+    version, mtime, fingerprint = store.dataset_version, store.dataset_mtime, store.cache_fingerprint
+    print(f"season {season}: {len(entries)} fixtures x {len(store.required_features)} features")
+
+    def _rate(label: str, timings: List[float]) -> None:
+        best = min(timings)
+        print(f"{label:<32} best={best * 1e3:9.3f}ms  {len(entries) / best:10.0f} rows/s  n={len(timings)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "legacy.sqlite"
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute(_LEGACY_CACHE_SQL)
+
+        def legacy_set() -> None:
+            for entry in entries:
+                _legacy_set(legacy_path, version, mtime, entry)
+
+        def legacy_get() -> None:
+            for key in keys:
+                _legacy_get(legacy_path, version, mtime, key)
+
+        _rate("connect-per-call set", _time_call(legacy_set, args.repeat))
+        _rate("connect-per-call get", _time_call(legacy_get, args.repeat))
+
+        cache = FeatureCache(Path(tmp) / "pooled.sqlite")
+
+        def pooled_set() -> None:
+            for season_key, home, away, match_id, features in entries:
+                cache.set(version, season_key, home, away, fingerprint, match_id, features)
+
+        def pooled_get() -> None:
+            for key in keys:
+                cache.get(version, *key, fingerprint)
+
+        _rate("pooled set", _time_call(pooled_set, args.repeat))
+        _rate("pooled get", _time_call(pooled_get, args.repeat))
+        _rate("set_many", _time_call(lambda: cache.set_many(version, fingerprint, entries), args.repeat))
+        _rate("get_many", _time_call(lambda: cache.get_many(version, keys, fingerprint), args.repeat))
+        assert len(cache.get_many(version, keys, fingerprint)) == len(set(keys))
+
+        tiered = TieredFeatureCache(cache, max_entries=len(entries))
+        tiered.get_many(version, keys, fingerprint)
+
+        def tiered_get() -> None:
+            for key in keys:
+                tiered.get(version, *key, fingerprint)
+
+        _rate("memory tier get", _time_call(tiered_get, args.repeat))
+        _rate("memory tier get_many", _time_call(lambda: tiered.get_many(version, keys, fingerprint), args.repeat))
+        print(f"{'memory tier stats':<32} {tiered.stats()}")
+
+        json_payloads = [json.dumps(entry[4]) for entry in entries]
+        blob_rows = cache._connection().execute("SELECT schema_id, payload FROM feature_cache").fetchall()
+        _rate("decode json payloads", _time_call(lambda: [json.loads(text) for text in json_payloads], args.repeat))
+        _rate("decode float32 payloads", _time_call(lambda: [cache._decode(*row) for row in blob_rows], args.repeat))
+        cache._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        cache.close()
+        for label, path in (("json cache file", legacy_path), ("float32 cache file", Path(tmp) / "pooled.sqlite")):
+            print(f"{label:<32} {path.stat().st_size / 1024:9.1f}KB")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dataset-version", default="7")
+    common.add_argument("--repeat", type=int, default=5)
+    parser = argparse.ArgumentParser(description="Feature store benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("cold-start", parents=[common], help="Frame load time with and without the snapshot")
+    lookup = sub.add_parser("lookup", parents=[common], help="Per-lookup latency: mask scan vs hash index")
+    lookup.add_argument("--lookups", type=int, default=200)
+    augment = sub.add_parser("augment", parents=[common], help="_augment_dataframe time on scaled copies of the dataset")
+    augment.add_argument("--scales", type=int, nargs="+", default=[1, 5, 20])
+    memory = sub.add_parser("memory", parents=[common], help="Frame footprint: full float64 load vs compact projection")
+    memory.add_argument("--versions", nargs="+", default=["7"])
+    refresh = sub.add_parser("refresh", parents=[common], help="FeatureStore.refresh after an append vs a full rebuild")
+    refresh.add_argument("--appended", type=int, nargs="+", default=[1, 10, 100])
+    workers = sub.add_parser("workers", parents=[common], help="N concurrent worker processes, private vs shared frame")
+    workers.add_argument("--workers", type=int, default=4)
+    cache = sub.add_parser("cache", parents=[common], help="FeatureCache throughput for one season of fixtures")
+    cache.add_argument("--season", help="Season to cache (default: latest)")
+    return parser.parse_args(argv)
+
+
+COMMANDS = {
+    "cold-start": bench_cold_start,
+    "lookup": bench_lookup,
+    "augment": bench_augment,
+    "memory": bench_memory,
+    "refresh": bench_refresh,
+    "workers": bench_workers,
+    "cache": bench_cache,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Local load test for the feature service.
+
+Usage:
+    PYTHONPATH=. python scripts/loadtest_feature_service.py --requests 2000 --concurrency 8
+    PYTHONPATH=. python scripts/loadtest_feature_service.py --port 8765 --no-spawn
+
+By default a `python -m pipelines.feature_service` subprocess is started on a
+free port and stopped afterwards; with `--no-spawn` the test targets an
+already running service.
+Each client holds one keep-alive connection and cycles through random fixtures.
+One line per request kind reports p50/p99 latency and throughput.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pipelines.feature_service import decode_matrix
+
+
+async def _request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    method: str,
+    path: str,
+    body: bytes = b"",
+    accept: str = "application/json",
+) -> Tuple[int, bytes]:
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nAccept: {accept}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+def _percentile(timings: List[float], q: float) -> float:
+    return float(np.percentile(np.asarray(timings) * 1e3, q))
+
+
+async def _client(
+    host: str,
+    port: int,
+    jobs: "asyncio.Queue[Tuple[str, str, str, bytes, str]]",
+    timings: Dict[str, List[float]],
+) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            try:
+                kind, method, path, body, accept = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            status, payload = await _request(reader, writer, method, path, body, accept)
+            timings.setdefault(kind, []).append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"{method} {path} returned {status}: {payload[:200]!r}")
+            if kind == "batch-binary":
+                decode_matrix(payload)
+    finally:
+        writer.close()
+
+
+def _jobs(args: argparse.Namespace, match_ids: List[int], model: str) -> List[Tuple[str, str, str, bytes, str]]:
+    rng = random.Random(args.seed)
+    jobs = []
+    for index in range(args.requests):
+        kind = ("single", "batch-json", "batch-binary")[index % 3]
+        if kind == "single":
+            jobs.append((kind, "GET", f"/fixture?match_id={rng.choice(match_ids)}", b"", "application/json"))
+            continue
+        body = json.dumps({"model": model, "fixtures": rng.sample(match_ids, args.batch_size)}).encode("utf-8")
+        accept = "application/octet-stream" if kind == "batch-binary" else "application/json"
+        jobs.append((kind, "POST", "/batch", body, accept))
+    return jobs
+
+
+def _free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+async def _connect(host: str, port: int, timeout: float) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await asyncio.open_connection(host, port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace) -> None:
+    server = None
+    host, port = args.host, args.port
+    if not args.no_spawn:
+        port = _free_port(host)
+        command = [sys.executable, "-m", "pipelines.feature_service", "--host", host, "--port", str(port)]
+        server = subprocess.Popen(command + ["--dataset-version", args.dataset_version])
+
+    try:
+        await _measure(args, host, port)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+async def _measure(args: argparse.Namespace, host: str, port: int) -> None:
+    reader, writer = await _connect(host, port, timeout=120.0)
+    _, payload = await _request(reader, writer, "GET", "/version")
+    version = json.loads(payload)
+    model = args.model or next(iter(version["models"]))
+    _, payload = await _request(
+        reader,
+        writer,
+        "POST",
+        "/batch",
+        json.dumps({"fixtures": None, "model": model}).encode("utf-8"),
+        accept="application/octet-stream",
+    )
+    writer.close()
+    match_ids = decode_matrix(payload)[1].tolist()
+
+    queue: "asyncio.Queue[Tuple[str, str, str, bytes, str]]" = asyncio.Queue()
+    for job in _jobs(args, match_ids, model):
+        queue.put_nowait(job)
+    timings: Dict[str, List[float]] = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, queue, timings) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    print(f"dataset v{version['dataset_version']} model={model} concurrency={args.concurrency}")
+    for kind, values in timings.items():
+        print(
+            f"{kind:<16} p50={_percentile(values, 50):8.3f}ms  p99={_percentile(values, 99):8.3f}ms  "
+            f"mean={statistics.mean(values) * 1e3:8.3f}ms  n={len(values)}"
+        )
+    total = sum(len(values) for values in timings.values())
+    print(f"{'throughput':<16} {total / elapsed:8.1f} req/s")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Feature service load test")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="Target port with --no-spawn")
+    parser.add_argument("--no-spawn", action="store_true", help="Target a running service instead of starting one")
+    parser.add_argument("--dataset-version", default="7")
+    parser.add_argument("--model", help="Model whose matrix batch requests fetch (default: first model)")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
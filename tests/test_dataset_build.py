@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import csv
+import importlib.util
+import sys
+from collections import deque
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pipelines import dataset_build
+from pipelines.dataset_build import (
+    BASE_DIR,
+    BuildConfig,
+    BuildEngine,
+    Stage,
+    StageCache,
+    _format_float,
+    _row_identity,
+    _safe_float,
+    available_leagues,
+    build_dataset,
+    build_leagues,
+    dataset_stages,
+    load_team_shot_counts,
+    volatility_columns,
+)
+
+DATASET_PATH = BASE_DIR / "Dataset_Version_7.csv"
+
+
+def _double(values, factor: int = 2):
+    return [value * factor for value in values]
+
+
+def _total(values):
+    return sum(values)
+
+
+def _write_csv(path: Path, rows) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _engine(cache: StageCache, source: Path, factor: int = 2) -> BuildEngine:
+    def _read(path: str):
+        return [int(line) for line in Path(path).read_text().split()]
+
+    return BuildEngine(
+        {
+            "numbers": Stage("numbers", _read, params={"path": str(source)}, sources=(source,)),
+            "doubled": Stage("doubled", _double, inputs=("numbers",), params={"factor": factor}),
+            "total": Stage("total", _total, inputs=("doubled",)),
+        },
+        cache,
+    )
+
+
+def test_engine_reuses_unchanged_stages(tmp_path: Path):
+    cache = StageCache(tmp_path / "cache")
+    source = tmp_path / "numbers.txt"
+    source.write_text("1 2 3")
+
+    first = _engine(cache, source)
+    assert first.run("total") == 12
+    assert first.rebuilt() == ["numbers", "doubled", "total"]
+
+    warm = _engine(cache, source)
+    assert warm.run("total") == 12
+    assert warm.rebuilt() == []
+
+    # A parameter change reruns its stage and everything downstream only.
+    tripled = _engine(cache, source, factor=3)
+    assert tripled.run("total") == 18
+    assert tripled.rebuilt() == ["doubled", "total"]
+
+    source.write_text("1 2 3 4")
+    appended = _engine(cache, source)
+    assert appended.run("total") == 20
+    assert appended.rebuilt() == ["numbers", "doubled", "total"]
+
+
+def test_stage_cache_prunes_old_entries(tmp_path: Path):
+    cache = StageCache(tmp_path, keep=2)
+    for key in ("a", "b", "c"):
+        cache.store("stage", key, key)
+    assert sorted(path.stem for path in (tmp_path / "stage").glob("*.pkl")) == ["b", "c"]
+    assert cache.load("stage", "a") == (False, None)
+    assert cache.load("stage", "c") == (True, "c")
+
+
+def test_stage_cache_tolerates_entries_removed_by_another_worker(tmp_path: Path, monkeypatch):
+    cache = StageCache(tmp_path, keep=2)
+    for key in ("a", "b"):
+        cache.store("stage", key, key)
+
+    # Another build prunes "a" between this worker's glob and its stat.
+    real_glob = Path.glob
+
+    def racing_glob(self, pattern):
+        entries = list(real_glob(self, pattern))
+        (tmp_path / "stage" / "a.pkl").unlink(missing_ok=True)
+        return iter(entries)
+
+    monkeypatch.setattr(Path, "glob", racing_glob)
+    cache.store("stage", "c", "c")
+    monkeypatch.undo()
+    assert sorted(path.stem for path in (tmp_path / "stage").glob("*.pkl")) == ["b", "c"]
+
+    # ... or between this worker's read and its mtime bump.
+    def pruned_utime(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr("pipelines.dataset_build.os.utime", pruned_utime)
+    assert cache.load("stage", "c") == (True, "c")
+
+
+def test_version3_build_recomputes_only_touched_sources(tmp_path: Path):
+    base_dir = tmp_path / "understat_data"
+    _write_csv(
+        base_dir / "Dataset.csv",
+        [
+            {"league": "EPL", "match_id": "1", "home_team_name": "Arsenal", "away_team_name": "Chelsea", "season": "2024"},
+            {"league": "EPL", "match_id": "2", "home_team_name": "Chelsea", "away_team_name": "Arsenal", "season": "2024"},
+        ],
+    )
+    results = base_dir / "EPL" / "Team_Results" / "team_results.csv"
+    shots = [
+        {"match_id": "1", "team": "Arsenal", "shots_for": "12", "shots_against": "7"},
+        {"match_id": "1", "team": "Chelsea", "shots_for": "7", "shots_against": "12"},
+    ]
+    _write_csv(results, shots)
+    _write_csv(
+        base_dir / "EPL" / "Team_Results" / "team_elos_timeseries.csv",
+        [
+            {"match_id": "1", "home_team": "Arsenal", "away_team": "Chelsea", "home_elo_pre": "1600", "away_elo_pre": "1550", "E_home": "0.57"},
+        ],
+    )
+    config = BuildConfig(base_dir=base_dir)
+    cache = StageCache(tmp_path / "cache")
+
+    first = build_dataset("3", tmp_path / "v3.csv", config, cache)
+    assert first.counts == {"shots": 2, "elo": 1, "summary_home": 0, "summary_away": 0}
+    assert first.rows[0]["home_shots_for"] == "12"
+    assert first.rows[0]["elo_home_pre"] == "1600.000"
+    assert first.rows[1]["elo_home_pre"] == ""
+
+    warm = build_dataset("3", tmp_path / "v3.csv", config, cache)
+    assert [run.name for run in warm.runs if run.status == "built"] == []
+    assert warm.rows == first.rows
+
+    shots.append({"match_id": "2", "team": "Chelsea", "shots_for": "9", "shots_against": "4"})
+    _write_csv(results, shots)
+    updated = build_dataset("3", tmp_path / "v3.csv", config, cache)
+    assert [run.name for run in updated.runs if run.status == "built"] == ["shots", "match_columns"]
+    assert updated.rows[1]["home_shots_for"] == "9"
+    assert updated.counts["shots"] == 1
+
+
+def _reference_volatility(rows, shot_map, window: int = 5, alpha: float = 0.55):
+    """The per-match deque loop `volatility_columns` replaced."""
+
+    history = {metric: {} for metric in ("goal", "xg", "shot")}
+    exp_avgs = {metric: {} for metric in ("goal", "xg", "shot")}
+
+    def _std(values):
+        mean_val = sum(values) / len(values)
+        return (sum((val - mean_val) ** 2 for val in values) / len(values)) ** 0.5
+
+    def _shot_diff(shots):
+        if not shots or shots.get("shots_for") is None or shots.get("shots_against") is None:
+            return None
+        return shots["shots_for"] - shots["shots_against"]
+
+    def _text(value):
+        return _format_float(value, decimals=4) if value is not None else ""
+
+    columns = []
+    for row in rows:
+        league, match_id, home, away, _ = _row_identity(row)
+        goal, xg = _safe_float(row.get("goal_difference")), _safe_float(row.get("xg_difference"))
+        diffs = {
+            "goal": (goal, -goal if goal is not None else None),
+            "xg": (xg, -xg if xg is not None else None),
+            "shot": (_shot_diff(shot_map.get((league, match_id, home))), _shot_diff(shot_map.get((league, match_id, away)))),
+        }
+        out = {}
+        for metric in ("goal", "xg", "shot"):
+            states = {}
+            for side, team in (("home", home), ("away", away)):
+                buffer = history[metric].get(team)
+                states[side] = (_std(buffer) if buffer else None, exp_avgs[metric].get(team))
+                out[f"{side}_{metric}_diff_std5"] = _text(states[side][0])
+                out[f"{side}_{metric}_diff_exp_decay"] = _text(states[side][1])
+            for column, slot in ((f"{metric}_diff_std_gap5", 0), (f"{metric}_diff_exp_decay_gap", 1)):
+                home_val, away_val = states["home"][slot], states["away"][slot]
+                out[column] = _text(home_val - away_val) if home_val is not None and away_val is not None else ""
+        for metric in ("goal", "xg", "shot"):
+            for team, value in zip((home, away), diffs[metric]):
+                if value is None:
+                    continue
+                history[metric].setdefault(team, deque(maxlen=window)).append(value)
+                prev = exp_avgs[metric].get(team)
+                exp_avgs[metric][team] = value if prev is None else alpha * value + (1.0 - alpha) * prev
+        columns.append(out)
+    return columns
+
+
+def test_volatility_columns_match_reference_loop():
+    rng = np.random.default_rng(11)
+    teams = [f"Team {idx}" for idx in range(8)]
+    rows, shot_map = [], {}
+    for match_id in range(600):
+        home, away = rng.choice(teams, size=2, replace=False)
+        goal = "" if rng.random() < 0.05 else str(int(rng.integers(-4, 5)))
+        xg = "" if rng.random() < 0.05 else f"{rng.normal(0, 1.2):.6f}"
+        rows.append(
+            {
+                "league": "EPL",
+                "match_id": str(match_id),
+                "home_team_name": home,
+                "away_team_name": away,
+                "season": "2024",
+                "goal_difference": goal,
+                "xg_difference": xg,
+            }
+        )
+        for team in (home, away):
+            if rng.random() < 0.9:
+                shot_map[("EPL", str(match_id), team)] = {
+                    "shots_for": int(rng.integers(0, 25)),
+                    "shots_against": None if rng.random() < 0.05 else int(rng.integers(0, 25)),
+                }
+
+    assert volatility_columns((rows, []), shot_map) == _reference_volatility(rows, shot_map)
+    assert volatility_columns((rows, []), shot_map, window=3, alpha=0.3) == _reference_volatility(
+        rows, shot_map, window=3, alpha=0.3
+    )
+    assert volatility_columns(([], []), shot_map) == []
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_volatility_columns_match_reference_on_dataset():
+    with DATASET_PATH.open(newline="") as fp:
+        rows = list(csv.DictReader(fp))
+    shot_map = load_team_shot_counts(str(BASE_DIR))
+    assert volatility_columns((rows, []), shot_map) == _reference_volatility(rows, shot_map)
+
+
+def _write_league(base_dir: Path, league: str, teams, first_id: int) -> None:
+    rows = []
+    for offset, (home, away) in enumerate((h, a) for h in teams for a in teams if h != a):
+        rows.append(
+            {
+                "id": str(first_id + offset),
+                "isResult": "True",
+                "h": f"{{'id': '{teams.index(home) + 1}', 'title': '{home}', 'short_title': '{home[:3].upper()}'}}",
+                "a": f"{{'id': '{teams.index(away) + 1}', 'title': '{away}', 'short_title': '{away[:3].upper()}'}}",
+                "goals": f"{{'h': '{offset % 3}', 'a': '{(offset + 1) % 2}'}}",
+                "xG": f"{{'h': '{1 + offset / 10}', 'a': '{0.5 + offset / 20}'}}",
+                "datetime": f"2024-08-{10 + offset:02d} 15:00:00",
+                "forecast": "{'w': '0.45', 'd': '0.3', 'l': '0.25'}",
+            }
+        )
+    _write_csv(base_dir / league / "2024" / "league_results.csv", rows)
+
+
+def test_build_leagues_partitions_match_single_league_builds(tmp_path: Path):
+    base_dir = tmp_path / "understat_data"
+    _write_league(base_dir, "EPL", ["Arsenal", "Chelsea", "Everton"], 100)
+    _write_league(base_dir, "Serie_A", ["Inter", "Milan", "Roma"], 200)
+    (base_dir / "Players").mkdir()
+    config = BuildConfig(base_dir=base_dir)
+    assert available_leagues(base_dir) == ["EPL", "Serie_A"]
+
+    build = build_leagues("7", None, tmp_path / "out", config, cache=None, jobs=2, typed=False)
+    assert build.jobs == 2
+    assert build.rows == 12
+    for league in ("EPL", "Serie_A"):
+        single = build_dataset("7", tmp_path / f"{league}.csv", replace(config, league=league), cache=None, typed=False)
+        partition = tmp_path / "out" / f"league={league}" / "Dataset_Version_7.csv"
+        assert partition.read_text() == single.output.read_text()
+    with build.output.open(newline="") as fp:
+        combined = list(csv.DictReader(fp))
+    assert [row["league"] for row in combined] == ["EPL"] * 6 + ["Serie_A"] * 6
+
+    with pytest.raises(ValueError):
+        build_leagues("3", ["EPL"], tmp_path / "out", config, cache=None)
+    with pytest.raises(FileNotFoundError):
+        build_leagues("7", ["Ligue_1"], tmp_path / "out", config, cache=None)
+
+
+def _module_copy(tmp_path: Path, monkeypatch, name: str, edit=None):
+    source = Path(dataset_build.__file__).read_text()
+    if edit is not None:
+        assert edit[0] in source
+        source = source.replace(edit[0], edit[1])
+    path = tmp_path / f"{name}.py"
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, name, module)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_editing_a_shared_helper_rebuilds_cached_stages(tmp_path: Path, monkeypatch):
+    base_dir = tmp_path / "understat_data"
+    _write_league(base_dir, "EPL", ["Arsenal", "Chelsea", "Everton"], 100)
+    config = BuildConfig(base_dir=base_dir)
+    cache = StageCache(tmp_path / "cache")
+    build_dataset("5", tmp_path / "v5.csv", config, cache, typed=False)
+
+    # Same source under another module name: every stage is still served from the cache.
+    same = _module_copy(tmp_path, monkeypatch, "unchanged_dataset_build")
+    warm = same.build_dataset("5", tmp_path / "v5.csv", same.BuildConfig(base_dir=base_dir), cache, typed=False)
+    assert all(run.status != "built" for run in warm.runs)
+
+    # `frame_rows` is not listed in any stage's `code`, but it formats every v5/v7 row.
+    edited = _module_copy(
+        tmp_path,
+        monkeypatch,
+        "edited_dataset_build",
+        ('("match_datetime_utc", "%Y-%m-%d %H:%M:%S")', '("match_datetime_utc", "%Y-%m-%dT%H:%M:%S")'),
+    )
+    rebuilt = edited.build_dataset("5", tmp_path / "v5.csv", edited.BuildConfig(base_dir=base_dir), cache, typed=False)
+    statuses = {run.name: run.status for run in rebuilt.runs}
+    assert statuses["league_features"] == "built"
+    assert statuses["league_results"] == statuses["shots"] == "cached"
+    assert "2024-08-10T15:00:00" in (tmp_path / "v5.csv").read_text()
+
+
+def test_editing_a_late_stage_helper_keeps_earlier_stage_keys(tmp_path: Path, monkeypatch):
+    base_dir = tmp_path / "understat_data"
+    _write_league(base_dir, "EPL", ["Arsenal", "Chelsea", "Everton"], 100)
+    cache = StageCache(tmp_path / "cache")
+    build_dataset("7", tmp_path / "v7.csv", BuildConfig(base_dir=base_dir), cache, typed=False)
+    before = {stage.name: stage.func for stage in dataset_stages("7", BuildConfig(base_dir=base_dir)).values()}
+
+    # `_exp_decay` is reached only from the v7 `volatility` stage.
+    edited = _module_copy(
+        tmp_path,
+        monkeypatch,
+        "decay_dataset_build",
+        ("decay = values.copy()", "decay = values * 1.0"),
+    )
+    config = edited.BuildConfig(base_dir=base_dir)
+    after = {stage.name: stage.func for stage in edited.dataset_stages("7", config).values()}
+    changed = {
+        name for name in before if edited._reachable_digest(after[name]) != dataset_build._reachable_digest(before[name])
+    }
+    assert changed == {"volatility"}
+
+    rebuilt = edited.build_dataset("7", tmp_path / "v7.csv", config, cache, typed=False)
+    assert {run.name for run in rebuilt.runs if run.status == "built"} == {"volatility"}
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import csv
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from pipelines._synthetic import write_synthetic_league
+from pipelines.dataset_build import BuildConfig, build_dataset
+from pipelines.dataset_stream import stream_dataset
+
+
+def _read(path: Path):
+    with path.open(newline="") as fp:
+        return list(csv.DictReader(fp))
+
+
+def _assert_rows_close(streamed, batch) -> None:
+    assert len(streamed) == len(batch)
+    assert [row["match_id"] for row in streamed] == [row["match_id"] for row in batch]
+    for stream_row, batch_row in zip(streamed, batch):
+        assert list(stream_row) == list(batch_row)
+        for column, value in batch_row.items():
+            try:
+                expected = float(value)
+            except ValueError:
+                assert stream_row[column] == value, column
+            else:
+                assert float(stream_row[column]) == pytest.approx(expected, rel=1e-12, abs=1e-12, nan_ok=True), column
+
+
+def test_stream_matches_batch_build_over_twenty_seasons(tmp_path: Path):
+    base_dir = tmp_path / "understat_data"
+    write_synthetic_league(base_dir, "Synthetic", seasons=20, teams=6)
+    config = BuildConfig(base_dir=base_dir, league="Synthetic")
+
+    batch = build_dataset("7", tmp_path / "batch.csv", config, cache=None, typed=False)
+    streamed = stream_dataset("7", tmp_path / "stream.csv", config)
+
+    assert streamed.chunks == 20
+    assert streamed.rows == len(batch.rows)
+    assert streamed.counts == batch.counts
+    _assert_rows_close(_read(tmp_path / "stream.csv"), _read(tmp_path / "batch.csv"))
+
+
+def _stream_peak(tmp_path: Path, seasons: int) -> int:
+    base_dir = tmp_path / f"seasons_{seasons}"
+    write_synthetic_league(base_dir, "Synthetic", seasons=seasons, teams=6)
+    config = BuildConfig(base_dir=base_dir, league="Synthetic")
+    tracemalloc.start()
+    try:
+        stream_dataset("7", base_dir / "stream.csv", config)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_stream_peak_memory_does_not_grow_with_history(tmp_path: Path):
+    assert _stream_peak(tmp_path, 20) < 1.5 * _stream_peak(tmp_path, 5)
+
+
+def test_stream_rejects_unpartitioned_versions(tmp_path: Path):
+    with pytest.raises(ValueError):
+        stream_dataset("3", tmp_path / "out.csv", BuildConfig(base_dir=tmp_path, league="Synthetic"))
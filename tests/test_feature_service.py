@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pipelines.feature_service import (
+    SERVICE_MEMORY_CACHE_SIZE,
+    SERVICE_MEMORY_CACHE_TTL,
+    FeatureService,
+    decode_matrix,
+    parse_args,
+    start_server,
+)
+from pipelines.feature_store import FeatureStore, RefreshSummary
+
+DATASET_PATH = Path("understat_data/Dataset_Version_7.csv")
+
+
+async def _exchange(port: int, requests):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    try:
+        for method, path, body, accept in requests:
+            writer.write(
+                (
+                    f"{method} {path} HTTP/1.1\r\nHost: test\r\nAccept: {accept}\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n"
+                ).encode("latin-1")
+                + body
+            )
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            payload = await reader.readexactly(int(headers["content-length"]))
+            responses.append((status, headers, payload))
+    finally:
+        writer.close()
+    return responses
+
+
+def _serve_and_request(service: FeatureService, requests):
+    async def scenario():
+        server = await start_server(service, port=0)
+        try:
+            return await _exchange(server.sockets[0].getsockname()[1], requests)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_feature_service_serves_json_and_binary_matrices(tmp_path: Path):
+    store = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=tmp_path)
+    service = FeatureService(store)
+    service.warm()
+    model = next(iter(store.model_features))
+    match_ids = store.df["match_id"].to_numpy()[[3, 500, 1200]].tolist()
+    batch = json.dumps({"model": model, "fixtures": match_ids}).encode("utf-8")
+
+    responses = _serve_and_request(
+        service,
+        [
+            ("GET", "/health", b"", "application/json"),
+            ("GET", "/version", b"", "application/json"),
+            ("GET", "/fixture?season=2025&home=Arsenal&away=Leeds", b"", "application/json"),
+            ("POST", "/batch", batch, "application/octet-stream"),
+            ("POST", "/batch", batch, "application/json"),
+            ("GET", "/fixture?match_id=1", b"", "application/json"),
+            ("POST", "/batch", b'{"fixtures": "all"}', "application/json"),
+            ("GET", "/missing", b"", "application/json"),
+            ("GET", "/stats", b"", "application/json"),
+        ],
+    )
+    statuses = [status for status, _, _ in responses]
+    assert statuses == [200, 200, 200, 200, 200, 404, 400, 404, 200]
+    assert json.loads(responses[-1][2])["memory_cache"]["size"] == 1
+
+    health, version, fixture = (json.loads(payload) for _, _, payload in responses[:3])
+    assert health == {"status": "ok", "dataset_version": "7", "rows": len(store.df)}
+    assert version["dataset_digest"] == store.dataset_digest
+    assert version["models"] == store.model_features
+    expected = store.get_fixture("2025", "Arsenal", "Leeds")
+    assert fixture["match_id"] == expected.match_id
+    assert fixture["features"] == pytest.approx(expected.features)
+
+    expected_matrix, expected_ids = store.get_feature_matrix(match_ids, model)
+    _, headers, payload = responses[3]
+    matrix, ids = decode_matrix(payload)
+    assert headers["x-feature-columns"].split(",") == store.model_features[model]
+    np.testing.assert_array_equal(matrix, expected_matrix)
+    np.testing.assert_array_equal(ids, expected_ids)
+    as_json = json.loads(responses[4][2])
+    np.testing.assert_array_equal(np.asarray(as_json["matrix"], dtype=np.float32), expected_matrix)
+
+
+def _idle_service(tmp_path: Path) -> FeatureService:
+    dataset = tmp_path / "Dataset_Version_7.csv"
+    dataset.write_text("match_id\n1\n")
+    store = FeatureStore(dataset_version="7", dataset_path=dataset, cache_path=None, snapshot_root=None)
+    return FeatureService(store)
+
+
+def test_refresh_runs_off_the_event_loop(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    service = _idle_service(tmp_path)
+    released = threading.Event()
+    waited = []
+
+    def _refresh():
+        # Only a coroutine on the event loop sets the event, so this times out if the loop is blocked.
+        waited.append(released.wait(timeout=5))
+        return RefreshSummary("unchanged")
+
+    monkeypatch.setattr(service.store, "refresh", _refresh)
+    monkeypatch.setattr(service, "warm", lambda: None)
+
+    async def scenario():
+        server = await start_server(service, port=0)
+        try:
+            refresh = asyncio.create_task(
+                _exchange(server.sockets[0].getsockname()[1], [("POST", "/refresh", b"", "application/json")])
+            )
+            await asyncio.sleep(0.05)
+            released.set()
+            return await refresh
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    [(status, _, payload)] = asyncio.run(scenario())
+    assert status == 200 and waited == [True]
+    assert json.loads(payload)["mode"] == "unchanged"
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3"])
+def test_invalid_content_length_is_rejected(tmp_path: Path, length: str):
+    service = _idle_service(tmp_path)
+
+    async def scenario():
+        server = await start_server(service, port=0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(f"POST /batch HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            reply = await reader.read()
+            writer.close()
+            return reply
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    reply = asyncio.run(scenario())
+    assert reply.startswith(b"HTTP/1.1 400 ")
+    assert b"Invalid Content-Length" in reply
+
+
+def test_parse_args_falls_back_on_bad_memory_cache_environment(monkeypatch: pytest.MonkeyPatch, caplog):
+    monkeypatch.setenv("FEATURE_MEMORY_CACHE_SIZE", "abc")
+    monkeypatch.setenv("FEATURE_MEMORY_CACHE_TTL", "1h")
+    args = parse_args([])
+    assert args.memory_cache_size == SERVICE_MEMORY_CACHE_SIZE
+    assert args.memory_cache_ttl == SERVICE_MEMORY_CACHE_TTL
+    assert "FEATURE_MEMORY_CACHE_SIZE" in caplog.text and "FEATURE_MEMORY_CACHE_TTL" in caplog.text
+
+    monkeypatch.setenv("FEATURE_MEMORY_CACHE_SIZE", "32")
+    assert parse_args([]).memory_cache_size == 32
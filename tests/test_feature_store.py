@@ -1,12 +1,32 @@
 from __future__ import annotations
 
+import importlib.util
+import json
+import os
 import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from pipelines.feature_store import FeatureStore
+from pipelines.feature_store import (
+    AUGMENTATION_STEPS,
+    CACHE_KEY_CHUNK,
+    CACHE_SCHEMA_VERSION,
+    FeatureCache,
+    FeatureStore,
+    TieredFeatureCache,
+    _cache_key,
+    collect_cache_garbage,
+    _prior_rolling_means,
+)
+from pipelines import feature_store
+from pipelines.frame_snapshot import FrameSnapshot
 
 DATASET_PATH = Path("understat_data/Dataset_Version_7.csv")
 SAMPLE_FIXTURE = {
@@ -65,3 +85,499 @@ def test_feature_cache_persists_vectors(tmp_path: Path):
             (store.dataset_version, season_key, home_key, away_key),
         ).fetchone()
     assert payload is not None, "Feature row missing from cache"
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_snapshot_round_trip_skips_rebuild(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    fresh = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=tmp_path)
+    expected = fresh.df
+    assert fresh.snapshot is not None and fresh.snapshot.exists()
+
+    warm = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=tmp_path)
+
+    def _fail_rebuild():
+        raise AssertionError("snapshot should have been reused")
+
+    monkeypatch.setattr(warm, "_build_frame", _fail_rebuild)
+    pd.testing.assert_frame_equal(warm.df, expected)
+    assert warm.feature_lineage == fresh.feature_lineage
+
+    rewindowed = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=tmp_path, rolling_window=3)
+    assert rewindowed.snapshot.key != fresh.snapshot.key
+
+
+def _feature_store_copy(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, name: str, edit=None):
+    source = Path(feature_store.__file__).read_text()
+    if edit is not None:
+        assert edit[0] in source
+        source = source.replace(edit[0], edit[1])
+    path = tmp_path / f"{name}.py"
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, name, module)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_editing_feature_code_changes_snapshot_key_and_cache_fingerprint(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    dataset = tmp_path / "Dataset_Version_7.csv"
+    dataset.write_text("match_id\n1\n")
+    kwargs = dict(dataset_version="7", dataset_path=dataset, cache_path=None, snapshot_root=tmp_path)
+    store = FeatureStore(**kwargs)
+
+    same = _feature_store_copy(tmp_path, monkeypatch, "unchanged_feature_store").FeatureStore(**kwargs)
+    assert (same.frame_key, same.cache_fingerprint) == (store.frame_key, store.cache_fingerprint)
+
+    # `_smoothed_avg` is a helper of `_augment_dataframe`; its output changes, so must the keys.
+    edited = _feature_store_copy(
+        tmp_path,
+        monkeypatch,
+        "edited_feature_store",
+        ("alpha = np.clip(frac, 0.0, 1.0)", "alpha = np.clip(frac, 0.0, 0.5)"),
+    ).FeatureStore(**kwargs)
+    assert edited.frame_key != store.frame_key
+    assert edited.cache_fingerprint != store.cache_fingerprint
+
+
+def test_snapshot_prune_keeps_live_configurations_of_the_same_data(tmp_path: Path):
+    frame = pd.DataFrame({"match_id": [1, 2], "prob_edge": [0.1, -0.2]})
+    extras = {
+        "compact": {"dataset_digest": "new", "code_digest": "c", "compact": True},
+        "full": {"dataset_digest": "new", "code_digest": "c", "compact": False},
+        "old_data": {"dataset_digest": "old", "code_digest": "c", "compact": True},
+        "old_code": {"dataset_digest": "new", "code_digest": "b", "compact": True},
+    }
+    for key, extra in extras.items():
+        FrameSnapshot(tmp_path, key).save(frame, extra)
+
+    removed = FrameSnapshot(tmp_path, "compact").prune_siblings({"dataset_digest": "new", "code_digest": "c"})
+    assert sorted(path.name for path in removed) == ["old_code", "old_data"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["compact", "full"]
+    assert FrameSnapshot(tmp_path, "full").load() is not None
+
+    FrameSnapshot(tmp_path, "compact").prune_siblings()
+    assert [path.name for path in tmp_path.iterdir()] == ["compact"]
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_fixture_indexes_match_mask_scan_and_resolve_aliases():
+    store = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None)
+    df = store.df
+    for position in (0, len(df) // 2, len(df) - 1):
+        row = df.iloc[position]
+        by_id = store.get_fixture_by_id(int(row["match_id"]))
+        by_key = store.get_fixture(str(row["season"]), row["home_team_name"].upper(), row["away_team_name"])
+        assert by_id.match_id == by_key.match_id == int(row["match_id"])
+
+    city = df.loc[df["home_team_name"] == "Manchester City"].iloc[0]
+    fixture = store.get_fixture(str(city["season"]), "Man City", city["away_team_name"])
+    assert fixture.match_id == int(city["match_id"])
+    assert store.resolve_team("manchester_city") == "manchester city"
+    with pytest.raises(ValueError):
+        store.get_fixture_by_id(-1)
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_feature_matrix_matches_per_fixture_vectors():
+    store = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None)
+    model_name = next(iter(store._model_features))
+    columns = list(store._model_features[model_name])
+    fixture_key = (SAMPLE_FIXTURE["season"], SAMPLE_FIXTURE["home"], SAMPLE_FIXTURE["away"])
+    first_id = int(store.df["match_id"].iloc[0])
+
+    matrix, match_ids = store.get_feature_matrix([fixture_key, first_id], model_name)
+
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    assert matrix.shape == (2, len(columns))
+    assert match_ids.tolist() == [SAMPLE_FIXTURE["match_id"], first_id]
+    expected = store.get_fixture(*fixture_key).features
+    np.testing.assert_allclose(matrix[0], [expected[name] for name in columns], rtol=1e-6)
+
+    full, all_ids = store.get_feature_matrix(None, model_name)
+    assert full.shape == (len(store.df), len(columns))
+    assert len(all_ids) == len(store.df)
+
+    # The full matrix is the store's cached array: callers cannot edit it in place.
+    with pytest.raises(ValueError):
+        full *= 2.0
+    with pytest.raises(ValueError):
+        all_ids[0] = -1
+    assert matrix.flags.writeable
+    matrix[1] = 0.0
+    np.testing.assert_array_equal(store.get_feature_matrix([first_id], model_name)[0][0], full[0])
+
+
+def _reference_prior_rolling_mean(df: pd.DataFrame, team_col: str, value_col: str, window: int) -> pd.Series:
+    series = (
+        df.groupby(team_col, sort=False)[value_col]
+        .transform(lambda s: s.rolling(window, min_periods=1).mean().shift(1))
+    )
+    fallback = (
+        df.groupby(team_col, sort=False)[value_col]
+        .transform(lambda s: s.shift(1))
+        .fillna(df[value_col].median(skipna=True))
+    )
+    return series.fillna(fallback).fillna(0.0).astype(np.float32)
+
+
+def test_prior_rolling_means_bit_identical_to_groupby_transform():
+    rng = np.random.default_rng(7)
+    n_rows = 2000
+    teams = rng.choice(["A", "B", "C", "D", "E", None], size=n_rows, p=[0.2, 0.2, 0.2, 0.2, 0.15, 0.05])
+    shots = rng.integers(0, 30, size=n_rows).astype(float)
+    shots[rng.random(n_rows) < 0.05] = np.nan
+    halves = rng.integers(0, 60, size=n_rows) / 2.0
+    df = pd.DataFrame({"team": teams, "shots": shots, "halves": halves}, index=rng.permutation(n_rows))
+
+    means = _prior_rolling_means(df, "team", ("shots", "halves"), (5, 3, 1))
+    for (column, window), series in means.items():
+        expected = _reference_prior_rolling_mean(df, "team", column, window)
+        np.testing.assert_array_equal(series.to_numpy(), expected.to_numpy())
+        assert series.index.equals(df.index)
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_shot_rolling_features_match_reference_on_dataset():
+    store = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None)
+    df = store.df
+    for side in ("home", "away"):
+        for stat in ("shots_for", "shots_allowed"):
+            column = f"{side}_{stat}"
+            for suffix, window in (("avg5", 5), ("avg3", 3)):
+                expected = _reference_prior_rolling_mean(df, f"{side}_team_name", column, window)
+                np.testing.assert_array_equal(df[f"{column}_{suffix}"].to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_compact_frame_projects_columns_and_matches_full_load():
+    full = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None, compact=False)
+    compact = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None)
+    full_df, compact_df = full.df, compact.df
+
+    outputs = {column for step_outputs, _ in AUGMENTATION_STEPS for column in step_outputs}
+    assert full._derived_columns <= outputs
+    assert len(compact_df.columns) < len(full_df.columns)
+    assert compact.memory_usage() < full.memory_usage()
+    assert compact_df["match_id"].dtype == np.int64
+    assert isinstance(compact_df["home_team_name"].dtype, pd.CategoricalDtype)
+    assert compact_df["home_team_name"].cat.categories.equals(compact_df["away_team_name"].cat.categories)
+    assert compact.feature_lineage == full.feature_lineage
+
+    for feature in compact.required_features:
+        assert compact_df[feature].dtype == np.float32
+        np.testing.assert_array_equal(
+            compact_df[feature].to_numpy(),
+            full_df[feature].to_numpy(dtype=np.float32, na_value=np.nan),
+        )
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_frame_built_from_typed_mirror_matches_csv(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    pytest.importorskip("pyarrow")
+    from pipelines import feature_store
+    from pipelines.typed_dataset import write_typed_dataset
+
+    dataset = tmp_path / "Dataset_Version_7.csv"
+    dataset.write_bytes(DATASET_PATH.read_bytes())
+    kwargs = dict(dataset_version="7", dataset_path=dataset, cache_path=None, snapshot_root=None)
+    from_csv = {compact: FeatureStore(compact=compact, **kwargs).df for compact in (True, False)}
+
+    write_typed_dataset(dataset)
+    monkeypatch.setattr(feature_store.pd, "read_csv", None)  # the mirror must serve the build
+    for compact, expected in from_csv.items():
+        pd.testing.assert_frame_equal(FeatureStore(compact=compact, **kwargs).df, expected)
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_refresh_appends_new_rows_and_matches_rebuild(tmp_path: Path):
+    dataset = tmp_path / "Dataset_Version_7.csv"
+    lines = DATASET_PATH.read_bytes().splitlines(keepends=True)
+    dataset.write_bytes(b"".join(lines[:-10]))
+    store = FeatureStore(
+        dataset_version="7",
+        dataset_path=dataset,
+        cache_path=tmp_path / "fixture_cache.sqlite",
+        snapshot_root=tmp_path / "snapshots",
+    )
+    store.get_fixture(SAMPLE_FIXTURE["season"], SAMPLE_FIXTURE["home"], SAMPLE_FIXTURE["away"])
+    assert store.refresh().mode == "unchanged"
+
+    with dataset.open("ab") as fh:
+        fh.write(b"".join(lines[-10:]))
+    summary = store.refresh()
+    assert summary.mode == "appended"
+    assert summary.appended_rows == 10
+
+    rebuilt = FeatureStore(dataset_version="7", dataset_path=dataset, cache_path=None, snapshot_root=None)
+    expected = rebuilt.df.set_index("match_id")
+    actual = store.df.set_index("match_id").loc[expected.index]
+    for feature in store.required_features:
+        assert actual[feature].dtype == expected[feature].dtype
+        np.testing.assert_allclose(actual[feature].to_numpy(), expected[feature].to_numpy(), rtol=1e-6)
+    assert store.get_fixture_by_id(int(expected.index[-1])).features == rebuilt.get_fixture_by_id(
+        int(expected.index[-1])
+    ).features
+
+    season, home, away = (value.strip().lower() for value in SAMPLE_FIXTURE.values() if isinstance(value, str))
+    assert store.cache.get(store.dataset_version, season, home, away, store.cache_fingerprint) is not None
+
+    dataset.write_bytes(b"".join(lines[:1] + lines[2:]))
+    assert store.refresh().mode == "rebuilt"
+    assert len(store.df) == len(lines) - 2
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_concurrent_first_access_builds_frame_once(monkeypatch: pytest.MonkeyPatch):
+    store = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None)
+    build = store._build_frame
+    calls = []
+
+    def _counting_build():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return build()
+
+    monkeypatch.setattr(store, "_build_frame", _counting_build)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        frames = list(pool.map(lambda _: store.df, range(8)))
+    assert len(calls) == 1
+    assert all(frame is frames[0] for frame in frames)
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_lookups_stay_consistent_while_refresh_swaps_the_frame(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    dataset = tmp_path / "Dataset_Version_7.csv"
+    lines = DATASET_PATH.read_bytes().splitlines(keepends=True)
+    dataset.write_bytes(b"".join(lines[:-10]))
+    store = FeatureStore(dataset_version="7", dataset_path=dataset, cache_path=None, snapshot_root=None)
+    model = next(iter(store.model_features))
+    store.get_feature_matrix(None, model)
+    normalize = feature_store._normalize_name
+
+    def _slow_normalize(value):
+        time.sleep(1e-5)  # widen index rebuilds so readers land in the middle of a swap
+        return normalize(value)
+
+    monkeypatch.setattr(feature_store, "_normalize_name", _slow_normalize)
+    done = threading.Event()
+
+    def _hammer():
+        lookups = 0
+        while not done.is_set() or lookups == 0:
+            fixture = store.get_fixture(SAMPLE_FIXTURE["season"], SAMPLE_FIXTURE["home"], SAMPLE_FIXTURE["away"])
+            assert fixture.match_id == SAMPLE_FIXTURE["match_id"]
+            # Appends move dataset-wide priors, so values may change; the fixture must never go missing.
+            assert store.get_fixture_by_id(SAMPLE_FIXTURE["match_id"]).home_team == fixture.home_team
+            matrix, match_ids = store.get_feature_matrix(None, model)
+            assert len(matrix) == len(match_ids)
+            lookups += 1
+        return lookups
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        readers = [pool.submit(_hammer) for _ in range(4)]
+        try:
+            with dataset.open("ab") as fh:
+                fh.write(b"".join(lines[-10:]))
+            assert store.refresh().mode == "appended"
+            # Dropping the first data row edits history, so the whole frame is rebuilt and swapped.
+            dataset.write_bytes(b"".join(lines[:1] + lines[2:]))
+            assert store.refresh().mode == "rebuilt"
+        finally:
+            done.set()
+        assert all(reader.result() > 0 for reader in readers)
+    assert len(store.get_feature_matrix(None, model)[0]) == len(lines) - 2
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_shared_memory_frame_is_published_once_and_attached(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    dataset = tmp_path / "Dataset_Version_7.csv"
+    dataset.write_bytes(b"".join(DATASET_PATH.read_bytes().splitlines(keepends=True)[:-3]))
+    kwargs = dict(dataset_version="7", dataset_path=dataset, cache_path=None, snapshot_root=None)
+    publisher = FeatureStore(shared_memory=True, **kwargs)
+    try:
+        expected = publisher.df
+        assert publisher._shared_frame.owner
+
+        sibling = FeatureStore(shared_memory=True, **kwargs)
+
+        def _fail_rebuild():
+            raise AssertionError("sibling should attach to the published frame")
+
+        monkeypatch.setattr(sibling, "_build_frame", _fail_rebuild)
+        pd.testing.assert_frame_equal(sibling.df, expected)
+        assert not sibling._shared_frame.owner
+        assert sibling.feature_lineage == publisher.feature_lineage
+        segment = np.frombuffer(sibling._shared_frame.segment.buf, dtype=np.uint8)
+        for feature in sibling.required_features:
+            assert np.shares_memory(sibling.df[feature].to_numpy(), segment)
+    finally:
+        publisher._shared_frame.unlink()
+
+
+def test_feature_cache_bulk_operations_use_per_thread_wal_connections(tmp_path: Path):
+    cache = FeatureCache(tmp_path / "fixture_cache.sqlite")
+    rows = [("2025", f"home{i}", f"away{i}", i, {"prob_edge": i / 10}) for i in range(CACHE_KEY_CHUNK * 2 + 5)]
+    assert cache.set_many("7", "fp1", rows) == len(rows)
+
+    keys = [row[:3] for row in rows] + [("2025", "missing", "fixture")]
+    found = cache.get_many("7", keys, "fp1")
+    assert len(found) == len(rows)
+    assert found[("2025", "home3", "away3")] == {"prob_edge": pytest.approx(0.3)}
+    assert cache.get_many("7", keys, "fp2") == {}
+    assert cache.get("7", "2025", "home3", "away3", "fp1") == {"prob_edge": pytest.approx(0.3)}
+    assert cache._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def _lookup(index: int):
+        return id(cache._connection()), cache.get("7", "2025", f"home{index}", f"away{index}", "fp1")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(_lookup, range(8)))
+    assert [features for _, features in results] == [{"prob_edge": pytest.approx(i / 10)} for i in range(8)]
+    assert id(cache._connection()) not in {conn for conn, _ in results}
+
+
+def test_feature_cache_replaces_mtime_stamped_layouts(tmp_path: Path):
+    path = tmp_path / "fixture_cache.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE feature_cache (
+                dataset_version TEXT NOT NULL, season TEXT NOT NULL, home TEXT NOT NULL, away TEXT NOT NULL,
+                match_id INTEGER NOT NULL, dataset_mtime REAL NOT NULL, payload TEXT NOT NULL,
+                PRIMARY KEY (dataset_version, season, home, away)
+            )
+            """
+        )
+        conn.execute(
+            "INSERT INTO feature_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ("7", "2025", "Arsenal", "Leeds", 42, 1.5, json.dumps({"prob_edge": 0.25})),
+        )
+
+    features = {"prob_edge": 0.25, "elo_gap": -12.5, "form": 1.0}
+    cache = FeatureCache(path)
+    conn = cache._connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == CACHE_SCHEMA_VERSION
+    assert cache.fingerprints() == {}
+    cache.set("7", "2025", "Arsenal", "Leeds", "fp", 42, features)
+    cache.set("7", "2025", "Leeds", "Arsenal", "fp", 43, dict(reversed(features.items())))
+    assert cache.get("7", "2025", "Arsenal", "Leeds", "fp") == features
+    assert list(cache.get("7", "2025", "Leeds", "Arsenal", "fp")) == list(reversed(features))
+    assert conn.execute("SELECT COUNT(*) FROM feature_schema").fetchone()[0] == 2
+    payload = conn.execute("SELECT payload FROM feature_cache WHERE match_id = 42").fetchone()[0]
+    assert FeatureCache.decode_vector(payload).tolist() == list(features.values())
+    cache.close()
+    # Reopening an up-to-date file is a no-op.
+    assert FeatureCache(path).get("7", "2025", "Arsenal", "Leeds", "fp") == features
+
+
+def test_tiered_cache_bounds_entries_and_invalidates_like_disk(tmp_path: Path):
+    now = [0.0]
+    disk = FeatureCache(tmp_path / "fixture_cache.sqlite")
+    cache = TieredFeatureCache(disk, max_entries=2, ttl=10.0, clock=lambda: now[0])
+    for index in range(3):
+        cache.set("7", "2025", f"home{index}", "away", "fp1", index, {"prob_edge": float(index)})
+    # home0 was evicted from memory but is still on disk.
+    assert cache.get("7", "2025", "home0", "away", "fp1") == {"prob_edge": 0.0}
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.disk_hits, stats.evictions, stats.size) == (0, 1, 1, 2, 2)
+
+    returned = cache.get("7", "2025", "home0", "away", "fp1")
+    returned["prob_edge"] = 99.0
+    assert cache.get("7", "2025", "home0", "away", "fp1") == {"prob_edge": 0.0}
+    assert cache.get("7", "2025", "home0", "away", "fp2") is None
+    assert cache.get("8", "2025", "home0", "away", "fp1") is None
+
+    now[0] = 11.0
+    memory_only = TieredFeatureCache(None, max_entries=4, ttl=10.0, clock=lambda: now[0])
+    memory_only.set_many("7", "fp1", [("2025", "home", "away", 1, {"prob_edge": 0.5})])
+    now[0] = 22.0
+    assert memory_only.get("7", "2025", "home", "away", "fp1") is None
+    assert memory_only.stats().expirations == 1
+
+    memory_only.set_many("7", "fp1", [("2025", "a", "b", 1, {"x": 1.0}), ("2025", "c", "d", 2, {"x": 2.0})])
+    assert memory_only.restamp("7", "fp1", "fp3", {("2025", "a", "b"): (1, {"x": 5.0})}) == 2
+    assert memory_only.get_many("7", [("2025", "a", "b"), ("2025", "c", "d")], "fp3") == {
+        ("2025", "a", "b"): {"x": 5.0},
+        ("2025", "c", "d"): {"x": 2.0},
+    }
+    assert memory_only.keys("7", "fp1") == set()
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_memory_cache_size_comes_from_arguments_then_environment(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("FEATURE_MEMORY_CACHE_SIZE", "0")
+    assert FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None).cache is None
+    store = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None, memory_cache_size=8)
+    assert isinstance(store.cache, TieredFeatureCache) and store.cache.max_entries == 8
+    first = store.get_fixture_by_id(SAMPLE_FIXTURE["match_id"])
+    assert store.get_fixture_by_id(SAMPLE_FIXTURE["match_id"]) == first
+    assert store.cache.stats().hits == 1
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_get_fixtures_matches_single_lookups_and_fills_cache(tmp_path: Path):
+    store = FeatureStore(dataset_version="7", cache_path=tmp_path / "fixture_cache.sqlite", snapshot_root=tmp_path)
+    match_ids = store.df["match_id"].to_numpy()[[0, 10, 700]].tolist()
+    refs = [*match_ids, (SAMPLE_FIXTURE["season"], SAMPLE_FIXTURE["home"], SAMPLE_FIXTURE["away"])]
+
+    batch = store.get_fixtures(refs)
+    assert [fixture.match_id for fixture in batch] == [*match_ids, SAMPLE_FIXTURE["match_id"]]
+    assert len(store.cache.keys(store.dataset_version, store.cache_fingerprint)) == len(refs)
+    for fixture in batch:
+        assert store.get_fixture_by_id(fixture.match_id) == fixture
+    assert store.get_fixtures(refs) == batch
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_prewarm_caches_a_season_with_per_fixture_values(tmp_path: Path):
+    store = FeatureStore(
+        dataset_version="7",
+        cache_path=tmp_path / "fixture_cache.sqlite",
+        snapshot_root=tmp_path,
+        memory_cache_size=0,
+    )
+    df = store.df
+    season_rows = df[df["season"].astype(str) == "2025"]
+    assert store.prewarm("2025", league="EPL") == len(season_rows)
+    assert store.prewarm("2025", league="Serie A") == 0
+
+    keys = [_cache_key(row) for _, row in season_rows.iterrows()]
+    cached = store.cache.get_many(store.dataset_version, keys, store.cache_fingerprint)
+    assert len(cached) == len(season_rows)
+    for _, row in season_rows.iloc[::10].iterrows():
+        assert cached[_cache_key(row)] == store._row_features(row)
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_cache_survives_touch_and_gc_drops_superseded_fingerprints(tmp_path: Path):
+    dataset = tmp_path / "Dataset_Version_7.csv"
+    dataset.write_bytes(DATASET_PATH.read_bytes())
+    cache_path = tmp_path / "fixture_cache.sqlite"
+    kwargs = dict(dataset_version="7", dataset_path=dataset, cache_path=cache_path, snapshot_root=None)
+    store = FeatureStore(memory_cache_size=0, **kwargs)
+    store.get_fixture_by_id(SAMPLE_FIXTURE["match_id"])
+    stat = dataset.stat()
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    assert store.refresh().mode == "unchanged"
+    touched = FeatureStore(memory_cache_size=0, **kwargs)
+    assert touched.cache_fingerprint == store.cache_fingerprint
+    assert touched.cache.keys("7", touched.cache_fingerprint) == store.cache.keys("7", store.cache_fingerprint)
+    assert FeatureStore(rolling_window=3, **kwargs).cache_fingerprint != store.cache_fingerprint
+
+    # Same bytes under another path: same fingerprint, so the cached rows are shared.
+    current = FeatureStore(dataset_version="7", cache_path=cache_path, snapshot_root=None, memory_cache_size=0)
+    assert current.cache_fingerprint == store.cache_fingerprint
+    written = current.prewarm("2025")
+    stale = [("2025", f"home{i}", "away", i, {"prob_edge": 0.1}) for i in range(50)]
+    current.cache.set_many("7", "superseded", stale)
+    current.cache.set_many("99", "gone", stale)
+    current.cache.close()
+
+    report = collect_cache_garbage(cache_path)
+    assert report.rows_before == written + 2 * len(stale)
+    assert FeatureCache(cache_path).fingerprints() == {("7", current.cache_fingerprint): written}
+    assert report.rows_after == written and report.bytes_after <= report.bytes_before
+
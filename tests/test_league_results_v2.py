@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from analysis import build_league_results_v2 as league_v2
+
+
+def _trailing_sum_counts(dates: np.ndarray, weights: np.ndarray, window_days: int) -> np.ndarray:
+    """The two-pointer loop `calendar_window_sums` replaced."""
+
+    if dates.dtype != "datetime64[ns]":
+        dates = dates.astype("datetime64[ns]")
+    counts = np.zeros(len(dates), dtype=float)
+    left = 0
+    window = np.timedelta64(window_days, "D")
+    for idx, current in enumerate(dates):
+        window_start = current - window
+        while left < idx and dates[left] < window_start:
+            left += 1
+        if idx > 0:
+            counts[idx] = float(weights[left:idx].sum())
+    return counts
+
+
+def _reference_add_rolling_features(long_df: pd.DataFrame) -> pd.DataFrame:
+    """The per-group `transform(lambda ...)` implementation the engine replaced."""
+
+    feature_cols = ("points", "goals_for", "goals_against", "goal_diff", "xg_for", "xg_against", "xg_diff")
+    windows = (2, 3, 5, 8, 10)
+    grouped = long_df.groupby("team_id", group_keys=False)
+    for col in feature_cols:
+        for window in windows:
+            long_df[f"{col}_last_{window}"] = grouped[col].transform(
+                lambda s, w=window: s.shift().rolling(window=w, min_periods=1).sum()
+            )
+    long_df["rest_days_prev"] = grouped["rest_days"].transform(lambda s: s.shift())
+    long_df["rest_days_prev"] = long_df["rest_days_prev"].fillna(0)
+    long_df["rest_days_capped"] = long_df["rest_days_prev"].clip(upper=28.0)
+    long_df["rest_reset_flag"] = (long_df["rest_days_prev"] > 35).astype(int)
+    for window in windows:
+        denom = 3 * long_df["match_number"].clip(upper=window)
+        denom = denom.replace(0, np.nan)
+        long_df[f"points_pct_last_{window}"] = long_df[f"points_last_{window}"] / denom
+    for col in ("points", "goal_diff", "xg_diff"):
+        long_df[f"{col}_exp_decay"] = grouped[col].transform(lambda s: s.shift().ewm(alpha=0.5, adjust=False).mean())
+    matches_last14 = []
+    away_matches_last14 = []
+    for _, group in grouped:
+        dates = group["match_datetime_utc"].to_numpy()
+        all_weights = np.ones(len(group), dtype=float)
+        away_weights = (1 - group["is_home"].to_numpy()).astype(float)
+        all_counts = _trailing_sum_counts(dates, all_weights, window_days=14)
+        away_counts = _trailing_sum_counts(dates, away_weights, window_days=14)
+        matches_last14.append(pd.Series(all_counts, index=group.index))
+        away_matches_last14.append(pd.Series(away_counts, index=group.index))
+    long_df["matches_last_14_days"] = pd.concat(matches_last14).sort_index()
+    long_df["away_matches_last_14_days"] = pd.concat(away_matches_last14).sort_index()
+    long_df["fixture_congestion_flag"] = (
+        (long_df["matches_last_14_days"] >= 3) | (long_df["rest_days_prev"] <= 3)
+    ).astype(int)
+    travel_denominator = long_df["rest_days_prev"] + long_df["away_matches_last_14_days"] + 1.0
+    long_df["travel_rest_ratio"] = long_df["rest_days_prev"] / travel_denominator.replace(0, np.nan)
+    long_df["travel_rest_ratio"] = long_df["travel_rest_ratio"].fillna(0.0)
+    long_df["win_prob_prev"] = grouped["win_prob"].transform(lambda s: s.shift(1))
+    long_df["win_prob_prev2"] = grouped["win_prob"].transform(lambda s: s.shift(2))
+    long_df["win_prob_prev_delta"] = long_df["win_prob_prev"] - long_df["win_prob_prev2"]
+    long_df.fillna(0, inplace=True)
+    return long_df
+
+
+def _synthetic_long_table(teams: int = 7, matches: int = 40, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frames = []
+    for team_id in rng.permutation(np.arange(100, 100 + teams)):
+        kickoffs = pd.Timestamp("2021-08-01") + pd.to_timedelta(np.cumsum(rng.integers(2, 12, matches)), unit="D")
+        goals_for = rng.poisson(1.4, matches)
+        goals_against = rng.poisson(1.2, matches)
+        xg_for = rng.gamma(2.0, 0.7, matches)
+        xg_against = rng.gamma(2.0, 0.6, matches)
+        xg_for[rng.random(matches) < 0.1] = np.nan
+        frames.append(
+            pd.DataFrame(
+                {
+                    "match_id": rng.integers(1, 10**6, matches),
+                    "match_datetime_utc": kickoffs,
+                    "team_id": team_id,
+                    "points": np.select([goals_for > goals_against, goals_for == goals_against], [3, 1], 0),
+                    "goals_for": goals_for,
+                    "goals_against": goals_against,
+                    "xg_for": xg_for,
+                    "xg_against": xg_against,
+                    "win_prob": rng.uniform(0.05, 0.9, matches),
+                    "is_home": rng.integers(0, 2, matches),
+                }
+            )
+        )
+    long_df = pd.concat(frames, ignore_index=True)
+    long_df["goal_diff"] = long_df["goals_for"] - long_df["goals_against"]
+    long_df["xg_diff"] = long_df["xg_for"] - long_df["xg_against"]
+    long_df["match_number"] = long_df.groupby("team_id").cumcount()
+    long_df["rest_days"] = long_df.groupby("team_id")["match_datetime_utc"].diff().dt.total_seconds().div(86400)
+    # Interleave the teams so blocks are not contiguous in the input.
+    return long_df.sample(frac=1.0, random_state=seed).sort_values("match_datetime_utc", kind="stable")
+
+
+def test_rolling_features_match_per_group_reference_exactly():
+    long_df = _synthetic_long_table()
+    expected = _reference_add_rolling_features(long_df.copy())
+    result = league_v2.add_rolling_features(long_df.copy())
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+
+def test_rolling_features_keep_team_blocks_apart():
+    long_df = pd.DataFrame(
+        {
+            "match_id": [1, 2, 3, 4, 5],
+            "match_datetime_utc": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-08", "2024-01-09", "2024-01-15"]),
+            "team_id": [2, 1, 2, 1, 2],
+            "points": [3, 1, 0, 3, 3],
+            "goals_for": [2, 1, 0, 4, 1],
+            "goals_against": [0, 1, 1, 0, 0],
+            "xg_for": [1.5, 0.9, 0.4, 2.2, 1.1],
+            "xg_against": [0.3, 1.0, 1.3, 0.2, 0.6],
+            "win_prob": [0.6, 0.4, 0.3, 0.7, 0.55],
+            "is_home": [1, 0, 0, 1, 1],
+            "match_number": [0, 0, 1, 1, 2],
+            "rest_days": [np.nan, np.nan, 7.0, 7.0, 7.0],
+        }
+    )
+    long_df["goal_diff"] = long_df["goals_for"] - long_df["goals_against"]
+    long_df["xg_diff"] = long_df["xg_for"] - long_df["xg_against"]
+
+    result = league_v2.add_rolling_features(long_df)
+    assert result["points_last_2"].tolist() == [0.0, 0.0, 3.0, 1.0, 3.0]
+    assert result["points_last_10"].tolist() == [0.0, 0.0, 3.0, 1.0, 3.0]
+    assert result["points_exp_decay"].tolist() == [0.0, 0.0, 3.0, 1.0, 1.5]
+    assert result["win_prob_prev2"].tolist() == [0.0, 0.0, 0.0, 0.0, 0.6]
+
+
+def test_calendar_window_sums_match_two_pointer_loop():
+    long_df = _synthetic_long_table(teams=5, matches=60, seed=11)
+    long_df["minutes"] = np.random.default_rng(11).integers(0, 121, len(long_df))
+    weights = {"matches": np.ones(len(long_df)), "away_matches": 1 - long_df["is_home"], "minutes": "minutes"}
+    windows = (7, 14, 21, 28)
+
+    sums = league_v2.calendar_window_sums(long_df, weights, windows)
+    assert list(sums.columns) == [f"{name}_last_{days}_days" for name in weights for days in windows]
+    assert sums.index.equals(long_df.index)
+    for name, weight in weights.items():
+        values = pd.Series(long_df[weight] if isinstance(weight, str) else weight, index=long_df.index)
+        for days in windows:
+            expected = pd.Series(0.0, index=long_df.index)
+            for _, group in long_df.groupby("team_id"):
+                dates = group["match_datetime_utc"].to_numpy()
+                expected[group.index] = _trailing_sum_counts(dates, values[group.index].to_numpy(dtype=float), days)
+            np.testing.assert_array_equal(sums[f"{name}_last_{days}_days"].to_numpy(), expected.to_numpy())
+
+
+def test_calendar_window_excludes_same_kickoff_rows_after_the_current_one():
+    long_df = pd.DataFrame(
+        {
+            "team_id": [1, 1, 1, 2],
+            "match_datetime_utc": pd.to_datetime(["2024-01-01", "2024-01-10", "2024-01-10", "2024-01-10"]),
+        }
+    )
+    sums = league_v2.calendar_window_sums(long_df, {"matches": np.ones(4)}, (9, 14))
+    assert sums["matches_last_9_days"].tolist() == [0.0, 1.0, 2.0, 0.0]
+    assert sums["matches_last_14_days"].tolist() == [0.0, 1.0, 2.0, 0.0]
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pipelines import match_table
+from pipelines.match_table import load_match_table, match_records, parse_nested
+
+
+def _write_results(path: Path, rows) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+RAW_ROWS = [
+    {
+        "id": "26602",
+        "isResult": "True",
+        "h": "{'id': '89', 'title': 'Manchester United', 'short_title': 'MUN'}",
+        "a": "{'id': '228', 'title': 'Fulham', 'short_title': 'FLH'}",
+        "goals": "{'h': '1', 'a': '0'}",
+        "xG": "{'h': '2.04268', 'a': '0.418711'}",
+        "datetime": "2024-08-16 19:00:00",
+        "forecast": "{'w': 0.8069, 'd': 0.1489, 'l': 0.0442}",
+        "Season": "2024",
+    },
+    {
+        "id": "26700",
+        "isResult": "False",
+        "h": "{'id': '249', 'title': \"Nott'm Forest\", 'short_title': 'NFO'}",
+        "a": "{'id': '83', 'title': 'Arsenal', 'short_title': 'ARS'}",
+        "goals": "{'h': None, 'a': None}",
+        "xG": "{'h': None, 'a': None}",
+        "datetime": "",
+        "forecast": "",
+        "Season": "",
+    },
+]
+
+
+def test_parse_nested_prefers_json_and_falls_back_to_literal_eval(monkeypatch):
+    assert parse_nested("{'h': '1', 'a': '0'}") == {"h": "1", "a": "0"}
+    assert parse_nested("") == {}
+    assert parse_nested(float("nan")) == {}
+    assert parse_nested("not a dict") == {}
+    assert parse_nested("{'title': \"Nott'm Forest\"}") == {"title": "Nott'm Forest"}
+
+    def _no_literal_eval(text):
+        raise AssertionError(f"literal_eval called on {text!r}")
+
+    monkeypatch.setattr(match_table.ast, "literal_eval", _no_literal_eval)
+    assert parse_nested("{'w': 0.63, 'd': 0.24, 'l': 0.13}") == {"w": 0.63, "d": 0.24, "l": 0.13}
+    assert parse_nested("{'h': None, 'a': None}") == {"h": None, "a": None}
+
+
+def test_match_table_is_flat_and_typed(tmp_path: Path):
+    source = tmp_path / "league_results.csv"
+    _write_results(source, RAW_ROWS)
+
+    table = load_match_table(source, cache_root=None)
+    assert list(table.columns) == match_table.MATCH_COLUMNS + ["Season"]
+    assert str(table["match_id"].dtype) == "Int64"
+    assert str(table["home_goals"].dtype) == "Int64"
+    assert table["is_result"].tolist() == [True, False]
+    assert table["kickoff"].iloc[0] == pd.Timestamp("2024-08-16 19:00:00")
+
+    played, upcoming = match_records(table)
+    assert played["home_team_name"] == "Manchester United"
+    assert (played["home_goals"], played["away_goals"]) == (1, 0)
+    assert played["away_xg"] == pytest.approx(0.418711)
+    assert played["forecast_home_win"] == pytest.approx(0.8069)
+    assert played["Season"] == "2024"
+    assert upcoming["home_team_name"] == "Nott'm Forest"
+    assert upcoming["home_goals"] is None and upcoming["forecast_draw"] is None
+    assert upcoming["kickoff"] is None and upcoming["Season"] is None
+
+
+def test_match_table_cache_is_keyed_on_file_content(tmp_path: Path, monkeypatch):
+    source = tmp_path / "league_results.csv"
+    _write_results(source, RAW_ROWS)
+    cache_root = tmp_path / "match_tables"
+
+    first = load_match_table(source, cache_root)
+    assert match_table.match_table_cache_path(source, cache_root).exists()
+
+    real_read = match_table.read_match_table
+    reads = []
+
+    def _counting_read(path):
+        reads.append(path)
+        return real_read(path)
+
+    monkeypatch.setattr(match_table, "read_match_table", _counting_read)
+    pd.testing.assert_frame_equal(load_match_table(source, cache_root), first)
+    assert reads == []
+
+    _write_results(source, RAW_ROWS[:1])
+    assert len(load_match_table(source, cache_root)) == 1
+    assert reads == [source]
+
+
+def test_match_table_cache_keeps_the_newest_tables_per_source(tmp_path: Path):
+    cache_root = tmp_path / "match_tables"
+    league = tmp_path / "EPL" / "league_results.csv"
+    other = tmp_path / "Serie_A" / "league_results.csv"
+    _write_results(other, RAW_ROWS)
+    load_match_table(other, cache_root)
+
+    paths = []
+    for count in (1, 2, 1, 2):
+        _write_results(league, RAW_ROWS[:count] if count == 1 else RAW_ROWS + RAW_ROWS[:1])
+        load_match_table(league, cache_root)
+        paths.append(match_table.match_table_cache_path(league, cache_root))
+    # Flipping between two contents reuses both tables instead of writing new ones.
+    assert paths[0] == paths[2] and paths[1] == paths[3]
+    assert all(path.exists() for path in paths)
+
+    _write_results(league, RAW_ROWS)
+    load_match_table(league, cache_root)
+    assert sorted(path.name for path in paths[-1].parent.glob("*.pkl")) == sorted(
+        {paths[-1].name, match_table.match_table_cache_path(league, cache_root).name}
+    )
+    assert match_table.match_table_cache_path(other, cache_root).exists()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from pipelines import notebook_catalog
+from pipelines.notebook_catalog import INDEX_FILENAME, CatalogIndex, discover_latest_notebook_run
+
+
+def _write_model(run_dir: Path, name: str, features, label: str = "Dataset_Version_7") -> Path:
+    model_dir = run_dir / name
+    model_dir.mkdir(parents=True, exist_ok=True)
+    metrics_path = model_dir / "metrics.json"
+    metrics_path.write_text(json.dumps({"feature_cols": list(features), "dataset_label": label}), encoding="utf-8")
+    return metrics_path
+
+
+def _bump_mtime(path: Path) -> None:
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_catalog_index_tracks_new_and_rewritten_runs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    _write_model(tmp_path / "run_20250101-000000", "performance_dense", ["a", "b"])
+    (tmp_path / "run_20250102-000000" / "performance_dense").mkdir(parents=True)
+
+    first = discover_latest_notebook_run(tmp_path, ["performance_dense"])
+    assert first is not None and first.run_id == "run_20250101-000000"
+    assert (tmp_path / INDEX_FILENAME).exists()
+    assert first == discover_latest_notebook_run(tmp_path, ["performance_dense"], use_index=False)
+
+    # A warm index answers without parsing any metrics file.
+    def _fail_read(path: Path) -> dict:
+        if path.name == "metrics.json":
+            raise AssertionError(f"unexpected parse of {path}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    monkeypatch.setattr(notebook_catalog, "_read_json", _fail_read)
+    assert discover_latest_notebook_run(tmp_path, ["performance_dense"]) == first
+    monkeypatch.undo()
+
+    # Metrics landing in a previously empty model directory are picked up.
+    _write_model(tmp_path / "run_20250102-000000", "performance_dense", ["c"])
+    latest = discover_latest_notebook_run(tmp_path, ["performance_dense"])
+    assert latest.run_id == "run_20250102-000000"
+    assert latest.models["performance_dense"].feature_cols == ["c"]
+
+    # A new run is indexed incrementally; a rewritten metrics file is re-read.
+    _write_model(tmp_path / "run_20250103-000000", "performance_dense", ["d"])
+    assert discover_latest_notebook_run(tmp_path, ["performance_dense"]).run_id == "run_20250103-000000"
+    metrics = _write_model(tmp_path / "run_20250103-000000", "performance_dense", ["e", "f"], label="v8")
+    _bump_mtime(metrics)
+    run = discover_latest_notebook_run(tmp_path, ["performance_dense"])
+    assert run.models["performance_dense"].feature_cols == ["e", "f"]
+    assert run.dataset_versions == ["8"]
+
+    index = CatalogIndex.open(tmp_path)
+    assert index.run_ids() == ["run_20250103-000000", "run_20250102-000000", "run_20250101-000000"]
+
+
+def test_catalog_index_rebuilds_when_unreadable(tmp_path: Path):
+    _write_model(tmp_path / "run_20250101-000000", "market_gradient_boost", ["x"])
+    (tmp_path / INDEX_FILENAME).write_text("{not json", encoding="utf-8")
+
+    run = discover_latest_notebook_run(tmp_path)
+    assert run is not None and run.feature_columns == {"market_gradient_boost": ["x"]}
+    payload = json.loads((tmp_path / INDEX_FILENAME).read_text(encoding="utf-8"))
+    assert payload["format"] == notebook_catalog.INDEX_FORMAT_VERSION
+    assert set(payload["runs"]) == {"run_20250101-000000"}
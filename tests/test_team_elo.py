@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+import pytest
+
+import getTeamEloV2 as elo_v2
+from pipelines._synthetic import write_synthetic_league
+from pipelines.team_ledger import TeamLedger, update_team_ledger
+
+
+def _reference_elos(df_matches: pd.DataFrame):
+    """The `iterrows` loop `run_elo` replaced, returning (table, timeseries)."""
+
+    max_date = df_matches["date_parsed"].max()
+    elos: Dict[str, float] = {}
+    stats: Dict[str, Dict[str, int]] = {}
+
+    def ensure(team: str):
+        if team not in elos:
+            elos[team] = elo_v2.START_ELO
+            stats[team] = {"played": 0, "wins": 0, "draws": 0, "losses": 0}
+
+    timeseries: List[Dict] = []
+    last_season = None
+    for _, m in df_matches.iterrows():
+        season = m["season"]
+        if pd.notna(season) and last_season is not None and season != last_season and len(elos) > 0:
+            league_mean = sum(elos.values()) / len(elos)
+            for t in list(elos.keys()):
+                elos[t] = (1.0 - elo_v2.REGRESS_GAMMA) * elos[t] + elo_v2.REGRESS_GAMMA * league_mean
+        last_season = season if pd.notna(season) else last_season
+
+        home, away = m["home_team"], m["away_team"]
+        h_goals, a_goals = int(m["home_goals"]), int(m["away_goals"])
+        date_parsed = m.get("date_parsed", pd.NaT)
+        ensure(home)
+        ensure(away)
+        elo_home, elo_away = elos[home], elos[away]
+        dr = (elo_home + elo_v2.HOME_ADVANTAGE) - elo_away
+        p_h, p_d, p_a = elo_v2.davidson_probs(dr)
+        e2 = elo_v2.expected_score_2way(p_h, p_d)
+        s_home, s_away = elo_v2.result_to_score(h_goals, a_goals)
+        mov = elo_v2.mov_multiplier(abs(h_goals - a_goals), dr)
+        if isinstance(date_parsed, pd.Timestamp) and pd.notna(date_parsed) and isinstance(max_date, pd.Timestamp):
+            rec = elo_v2.recency_weight((max_date - date_parsed).days)
+        else:
+            rec = 1.0
+        k_eff = elo_v2.K_BASE * mov * rec
+        delta = k_eff * (s_home - e2)
+        elos[home] = elo_home + delta
+        elos[away] = elo_away - delta
+
+        stats[home]["played"] += 1
+        stats[away]["played"] += 1
+        if s_home == 1.0:
+            stats[home]["wins"] += 1
+            stats[away]["losses"] += 1
+        elif s_away == 1.0:
+            stats[away]["wins"] += 1
+            stats[home]["losses"] += 1
+        else:
+            stats[home]["draws"] += 1
+            stats[away]["draws"] += 1
+        timeseries.append(
+            {
+                "match_id": int(m["match_id"]),
+                "date": m.get("date", ""),
+                "home_team": home,
+                "away_team": away,
+                "home_goals": h_goals,
+                "away_goals": a_goals,
+                "dr_pre": round(dr, 2),
+                "p_home": round(p_h, 4),
+                "p_draw": round(p_d, 4),
+                "p_away": round(p_a, 4),
+                "k_eff": round(k_eff, 3),
+                "home_elo_post": round(elos[home], 2),
+                "away_elo_post": round(elos[away], 2),
+            }
+        )
+
+    rows = [
+        {"team": team, "final_elo": round(elo, 2), **stats[team]}
+        for team, elo in sorted(elos.items(), key=lambda kv: kv[1], reverse=True)
+    ]
+    return pd.DataFrame(rows), pd.DataFrame(timeseries)
+
+
+@pytest.fixture()
+def synthetic_matches(tmp_path: Path) -> pd.DataFrame:
+    base_dir = tmp_path / "understat_data"
+    write_synthetic_league(base_dir, "Synthetic", seasons=6, teams=8)
+    ledger, _ = update_team_ledger("Synthetic", base_dir, tmp_path / "team_ledger")
+    return elo_v2.load_matches_from_ledger(ledger)
+
+
+def test_run_elo_matches_reference_loop_byte_for_byte(synthetic_matches: pd.DataFrame):
+    table, timeseries = elo_v2.run_elo(synthetic_matches)
+    ref_table, ref_timeseries = _reference_elos(synthetic_matches)
+    assert table.to_csv(index=False) == ref_table.to_csv(index=False)
+    assert timeseries.to_csv(index=False) == ref_timeseries.to_csv(index=False)
+
+
+def test_run_elo_handles_promoted_teams_and_undated_matches(synthetic_matches: pd.DataFrame):
+    # A team first seen mid-history is outside the preseason regression until it plays,
+    # and matches without a kickoff get full weight.
+    matches = synthetic_matches.copy()
+    late = matches.index[matches["season"] == matches["season"].max()][:3]
+    matches.loc[late, "home_team"] = "Promoted FC"
+    matches.loc[matches.index[::17], "date_parsed"] = pd.NaT
+    table, timeseries = elo_v2.run_elo(matches)
+    ref_table, ref_timeseries = _reference_elos(matches)
+    assert table.to_csv(index=False) == ref_table.to_csv(index=False)
+    assert timeseries.to_csv(index=False) == ref_timeseries.to_csv(index=False)
+    assert table["played"].sum() == 2 * len(matches)
+
+
+def test_incremental_updates_match_one_pass(synthetic_matches: pd.DataFrame, tmp_path: Path):
+    full_state, full_series, resumed = elo_v2.update_elo(synthetic_matches)
+    assert not resumed
+
+    cut = len(synthetic_matches) // 3
+    state, first, _ = elo_v2.update_elo(synthetic_matches.iloc[:cut])
+    state.save("Synthetic", tmp_path)
+    state, second, resumed = elo_v2.update_elo(synthetic_matches, elo_v2.EloState.load("Synthetic", tmp_path))
+    assert resumed and len(second) == len(synthetic_matches) - cut
+    assert state == full_state
+    assert pd.concat([first, second]).to_csv(index=False) == full_series.to_csv(index=False)
+    assert state.table().to_csv(index=False) == full_state.table().to_csv(index=False)
+
+    # Nothing new: the state is returned as is.
+    again, rows, resumed = elo_v2.update_elo(synthetic_matches, state)
+    assert resumed and rows.empty and again == state
+
+
+def test_incremental_update_restarts_when_history_changes(synthetic_matches: pd.DataFrame):
+    state, _, _ = elo_v2.update_elo(synthetic_matches.iloc[:100])
+    edited = synthetic_matches.copy()
+    edited.loc[edited.index[10], "home_goals"] += 1
+    rebuilt, series, resumed = elo_v2.update_elo(edited, state)
+    assert not resumed and len(series) == len(edited)
+    assert rebuilt == elo_v2.update_elo(edited)[0]
+
+
+def test_compute_elos_appends_new_matches_and_full_recompute_keeps_legacy_outputs(tmp_path: Path, capsys):
+    base_dir = tmp_path / "understat_data"
+    root = tmp_path / "team_ledger"
+    league_dir = base_dir / "Synthetic"
+    timeseries_path = league_dir / "Team_Results" / "team_elos_timeseries.csv"
+    write_synthetic_league(base_dir, "Synthetic", seasons=3, teams=6)
+    update_team_ledger("Synthetic", base_dir, root)
+    elo_v2.compute_elos_for_league(league_dir, root)
+    assert "rebuilt from 90 matches" in capsys.readouterr().out
+
+    # A new season arrives; only the results files change, as in the update pipeline.
+    exported = timeseries_path.read_text()
+    write_synthetic_league(base_dir, "Synthetic", seasons=4, teams=6)
+    timeseries_path.write_text(exported)
+    ledger, _ = update_team_ledger("Synthetic", base_dir, root)
+    elo_v2.compute_elos_for_league(league_dir, root)
+    assert "+30 matches" in capsys.readouterr().out
+
+    matches = elo_v2.load_matches_from_ledger(ledger)
+    state, series, _ = elo_v2.update_elo(matches)
+    assert timeseries_path.read_text() == series.to_csv(index=False)
+    assert (league_dir / "team_elos_v2.csv").read_text() == state.table().to_csv(index=False)
+    assert elo_v2.EloState.load("Synthetic", root).ratings == state.ratings
+    assert TeamLedger.load("Synthetic", root).frame["elo_post"].notna().all()
+
+    # A CSV rewritten behind the state's back is rebuilt rather than appended to.
+    timeseries_path.write_text(exported)
+    elo_v2.compute_elos_for_league(league_dir, root)
+    assert "rebuilt from 120 matches" in capsys.readouterr().out
+    assert timeseries_path.read_text() == series.to_csv(index=False)
+
+    elo_v2.compute_elos_for_league(league_dir, root, full_recompute=True)
+    table, legacy = elo_v2.run_elo(matches)
+    assert timeseries_path.read_text() == legacy.to_csv(index=False)
+    assert (league_dir / "team_elos_v2.csv").read_text() == table.to_csv(index=False)
+    assert elo_v2.EloState.load("Synthetic", root) is None
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipelines._synthetic import write_synthetic_league
+from pipelines.dataset_build import (
+    LEDGER_DIRNAME,
+    BuildConfig,
+    build_dataset,
+    collect_league_results,
+    dataset_stages,
+    league_frame,
+    load_elo_timeseries,
+    load_team_shot_counts,
+)
+from pipelines.dataset_stream import stream_dataset
+from pipelines.team_ledger import LEDGER_COLUMNS, TEAM_RESULTS_COLUMNS, TeamLedger, team_rows, update_team_ledger
+
+DATASET_PATH = Path("understat_data/Dataset_Version_7.csv")
+
+
+def _reference_compute_team_view(matches: pd.DataFrame) -> pd.DataFrame:
+    """`league_v2.compute_team_view` before it moved onto `team_rows`."""
+
+    def outcome_points(code: str) -> tuple[int, int]:
+        if code == "H":
+            return 3, 0
+        if code == "A":
+            return 0, 3
+        return 1, 1
+
+    home_pts, away_pts = zip(*matches["match_outcome_code"].map(outcome_points))
+    matches = matches.assign(home_points=home_pts, away_points=away_pts)
+    home_cols = {
+        "home_team_id": "team_id",
+        "home_team_name": "team_name",
+        "home_points": "points",
+        "home_goals": "goals_for",
+        "away_goals": "goals_against",
+        "home_xg": "xg_for",
+        "away_xg": "xg_against",
+        "forecast_home_win": "win_prob",
+    }
+    away_cols = {
+        "away_team_id": "team_id",
+        "away_team_name": "team_name",
+        "away_points": "points",
+        "away_goals": "goals_for",
+        "home_goals": "goals_against",
+        "away_xg": "xg_for",
+        "home_xg": "xg_against",
+        "forecast_away_win": "win_prob",
+    }
+    home_df = matches[["match_id", "match_datetime_utc", "season", *home_cols.keys()]].rename(columns=home_cols)
+    home_df["is_home"] = 1
+    away_df = matches[["match_id", "match_datetime_utc", "season", *away_cols.keys()]].rename(columns=away_cols)
+    away_df["is_home"] = 0
+    long_df = pd.concat([home_df, away_df], ignore_index=True).sort_values(["team_id", "match_datetime_utc"])
+    long_df["goal_diff"] = long_df["goals_for"] - long_df["goals_against"]
+    long_df["xg_diff"] = long_df["xg_for"] - long_df["xg_against"]
+    long_df["match_number"] = long_df.groupby("team_id").cumcount()
+    long_df["rest_days"] = long_df.groupby("team_id")["match_datetime_utc"].diff().dt.total_seconds().div(86400)
+    return long_df.reset_index(drop=True)
+
+
+@pytest.fixture()
+def synthetic_base(tmp_path: Path) -> Path:
+    base_dir = tmp_path / "understat_data"
+    write_synthetic_league(base_dir, "Synthetic", seasons=3, teams=6)
+    return base_dir
+
+
+def test_team_rows_match_previous_team_view(synthetic_base: Path):
+    matches = league_frame(collect_league_results(str(synthetic_base / "Synthetic"), "Synthetic"))
+    pd.testing.assert_frame_equal(team_rows(matches), _reference_compute_team_view(matches), check_exact=True)
+
+
+def test_ledger_appends_new_matches_once_and_stays_sorted(tmp_path: Path):
+    base_dir = tmp_path / "understat_data"
+    root = tmp_path / "team_ledger"
+    write_synthetic_league(base_dir, "Synthetic", seasons=2, teams=6)
+    ledger, added = update_team_ledger("Synthetic", base_dir, root)
+    assert added == len(ledger) == 2 * 2 * 30
+
+    write_synthetic_league(base_dir, "Synthetic", seasons=3, teams=6)
+    ledger, added = update_team_ledger("Synthetic", base_dir, root)
+    assert added == 2 * 30
+    assert update_team_ledger("Synthetic", base_dir, root)[1] == 0
+
+    fresh, _ = update_team_ledger("Synthetic", base_dir, tmp_path / "fresh")
+    pd.testing.assert_frame_equal(TeamLedger.load("Synthetic", root).frame, fresh.frame)
+    frame = ledger.frame
+    assert list(frame.columns) == LEDGER_COLUMNS
+    assert not frame.duplicated(["team_id", "match_id"]).any()
+    assert frame.equals(frame.sort_values(["team_id", "match_datetime_utc"], kind="stable"))
+    # Rest days run across the season boundary instead of restarting at each append.
+    assert frame["rest_days"].isna().sum() == 6
+
+
+def test_ledger_lookups_equal_the_csv_readers(synthetic_base: Path, tmp_path: Path):
+    ledger, _ = update_team_ledger("Synthetic", synthetic_base, tmp_path / "team_ledger")
+    assert ledger.shot_counts() == load_team_shot_counts(str(synthetic_base))
+    assert ledger.elo_timeseries() == load_elo_timeseries(str(synthetic_base))
+    some = {str(match_id) for match_id in ledger.frame["match_id"].head(7)}
+    assert ledger.elo_timeseries(some) == load_elo_timeseries(str(synthetic_base), match_ids=some)
+
+    matches = ledger.matches()
+    assert len(matches) == len(ledger) // 2
+    assert matches["match_datetime_utc"].is_monotonic_increasing
+    assert (matches["home_shots"].notna() & matches["away_elo_post"].notna()).all()
+
+
+def test_builds_read_shots_and_elo_from_a_saved_ledger(synthetic_base: Path, tmp_path: Path):
+    config = BuildConfig(base_dir=synthetic_base, league="Synthetic")
+    from_csv = build_dataset("7", tmp_path / "csv.csv", config, cache=None, typed=False)
+    assert dataset_stages("7", config)["shots"].name == "shots"
+
+    update_team_ledger("Synthetic", synthetic_base, synthetic_base / LEDGER_DIRNAME)
+    stages = dataset_stages("7", config)
+    assert (stages["shots"].name, stages["elo_timeseries"].name) == ("ledger_shots", "ledger_elo_timeseries")
+    from_ledger = build_dataset("7", tmp_path / "ledger.csv", config, cache=None, typed=False)
+    assert from_ledger.output.read_bytes() == from_csv.output.read_bytes()
+    stream_dataset("7", tmp_path / "stream_ledger.csv", config)
+    shutil.rmtree(synthetic_base / LEDGER_DIRNAME)
+    stream_dataset("7", tmp_path / "stream_csv.csv", config)
+    assert (tmp_path / "stream_ledger.csv").read_bytes() == (tmp_path / "stream_csv.csv").read_bytes()
+
+
+def test_team_results_and_team_reads(synthetic_base: Path, tmp_path: Path):
+    ledger, _ = update_team_ledger("Synthetic", synthetic_base, tmp_path / "team_ledger")
+    results = ledger.team_results()
+    assert list(results.columns) == TEAM_RESULTS_COLUMNS
+    assert set(results["venue"]) == {"Home", "Away"}
+    points = results["result"].map({"w": 3, "d": 1, "l": 0})
+    assert (points == results["points"]).all()
+
+    club = ledger.team("club 03")
+    assert len(club) == 3 * 10 and club["match_datetime_utc"].is_monotonic_increasing
+    assert ledger.team(int(club["team_id"].iloc[0]), last=4).equals(club.tail(4).reset_index(drop=True))
+    cutoff = club["match_datetime_utc"].iloc[10]
+    assert len(ledger.team("Club 03", before=cutoff)) == 10
+    assert np.isnan(club["rest_days"].iloc[0])
+
+
+def test_failed_shot_fetches_stay_missing_in_the_ledger(synthetic_base: Path, tmp_path: Path):
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("understat")
+    import asyncio
+
+    import transformTeamData
+
+    class FlakyUnderstat:
+        async def get_match_shots(self, match_id):
+            if match_id % 2:
+                raise ConnectionError("understat timed out")
+            return {"h": [{}] * 3, "a": [{}]}
+
+    ledger, _ = update_team_ledger("Synthetic", synthetic_base, tmp_path / "team_ledger")
+    ledger.frame[["shots_for", "shots_against"]] = pd.NA
+    matches = ledger.matches()
+
+    async def fetch_all():
+        cache = {}
+        sem = asyncio.Semaphore(4)
+        await asyncio.gather(
+            *(transformTeamData.fetch_shots_counts(FlakyUnderstat(), int(mid), sem, cache) for mid in matches["match_id"])
+        )
+        return cache
+
+    cache = asyncio.run(fetch_all())
+    ledger.attach_shots(transformTeamData.shot_rows(matches, cache))
+    odd = ledger.frame["match_id"] % 2 == 1
+    assert ledger.frame.loc[odd, "shots_for"].isna().all()
+    assert (ledger.frame.loc[~odd & (ledger.frame["is_home"] == 1), "shots_for"] == 3).all()
+
+
+@pytest.mark.skipif(not DATASET_PATH.exists(), reason="Dataset_Version_7.csv missing")
+def test_feature_store_reads_team_history_from_ledger(tmp_path: Path):
+    from pipelines.feature_store import FeatureStore
+
+    update_team_ledger("EPL", root=tmp_path)
+    store = FeatureStore(dataset_version="7", cache_path=None, snapshot_root=None, ledger_root=tmp_path)
+    history = store.team_history("Man City", last=5)
+    assert len(history) == 5
+    assert set(history["team_name"]) == {"Manchester City"}
+    assert history["match_datetime_utc"].is_monotonic_increasing
+    assert store.team_history("arsenal", before="2022-09-01")["season"].eq(2022).all()
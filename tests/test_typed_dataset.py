@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from pipelines.typed_dataset import (
+    load_dataset,
+    read_typed_dataset,
+    read_typed_metadata,
+    typed_dataset_path,
+    write_typed_dataset,
+)
+
+CSV_TEXT = (
+    "match_id,season,match_datetime_utc,match_date,home_team_name,home_xg,elo_home_pre,market_vs_elo_edge\n"
+    "1,2024,2024-08-16 19:00:00,2024-08-16,Arsenal,1.734,1602.125,\n"
+    "2,2024,2024-08-17 14:00:00,2024-08-17,Chelsea,0.9,,0.012345\n"
+)
+
+
+def test_typed_mirror_round_trips_the_csv(tmp_path: Path):
+    csv_path = tmp_path / "Dataset_Version_9.csv"
+    csv_path.write_text(CSV_TEXT)
+    assert read_typed_dataset(csv_path) is None
+
+    path = write_typed_dataset(csv_path, {"metadata": ["match_id", "season"], "elo": ["elo_home_pre"]}, {"dataset_version": "9"})
+    assert path == typed_dataset_path(csv_path) and path.exists()
+    metadata = read_typed_metadata(csv_path)
+    assert metadata["dataset_version"] == "9"
+    assert metadata["rows"] == 2
+    assert metadata["feature_groups"]["metadata"] == ["match_id", "season"]
+    assert metadata["feature_groups"]["elo"] == ["elo_home_pre"]
+    assert "home_xg" in metadata["feature_groups"]["other"]
+
+    expected = pd.read_csv(csv_path, parse_dates=["match_datetime_utc", "match_date"])
+    typed = read_typed_dataset(csv_path)
+    pd.testing.assert_frame_equal(typed, expected)
+    pd.testing.assert_frame_equal(load_dataset(csv_path), expected)
+
+    # Column projections come back in file order, like read_csv(usecols=...).
+    projected = read_typed_dataset(csv_path, columns=["elo_home_pre", "match_id"])
+    assert list(projected.columns) == ["match_id", "elo_home_pre"]
+
+
+def test_stale_typed_mirror_falls_back_to_csv(tmp_path: Path):
+    csv_path = tmp_path / "Dataset.csv"
+    csv_path.write_text(CSV_TEXT)
+    write_typed_dataset(csv_path)
+    csv_path.write_text(CSV_TEXT + "3,2024,2024-08-18 16:30:00,2024-08-18,Fulham,1.1,1500.0,\n")
+
+    assert read_typed_dataset(csv_path) is None
+    loaded = load_dataset(csv_path, columns=["match_id", "match_date"])
+    assert loaded["match_id"].tolist() == [1, 2, 3]
+    assert pd.api.types.is_datetime64_any_dtype(loaded["match_date"])
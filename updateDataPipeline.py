@@ -3,15 +3,17 @@ import subprocess
 import sys
 from pathlib import Path
 from datetime import datetime
+from typing import Sequence
 
-def run_script(script_name: str, description: str) -> bool:
-    """Run a Python script and return True if successful."""
+def run_script(argv: Sequence[str], description: str) -> bool:
+    """Run `python <argv...>` (a script path or `-m module`, plus arguments) and return True if successful."""
+    command = " ".join(argv)
     print(f"\n{'='*50}")
     print(f" {description}")
     print(f"{'='*50}")
     
     try:
-        result = subprocess.run([sys.executable, script_name], 
+        result = subprocess.run([sys.executable, *argv], 
                               capture_output=True, text=True, check=True)
         print(result.stdout)
         if result.stderr:
@@ -19,13 +21,13 @@ def run_script(script_name: str, description: str) -> bool:
         print(f" {description} completed successfully")
         return True
     except subprocess.CalledProcessError as e:
-        print(f" Error in {script_name}:")
+        print(f" Error in {command}:")
         print(f"Return code: {e.returncode}")
         print(f"stdout: {e.stdout}")
         print(f"stderr: {e.stderr}")
         return False
     except FileNotFoundError:
-        print(f" Script {script_name} not found")
+        print(f" Could not run {command}")
         return False
 
 def main():
@@ -34,15 +36,16 @@ def main():
     print(f" Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     pipeline_steps = [
-        ("updateData.py", "Fetching current season data from Understat API"),
-        ("transformTeamData.py", "Transforming and processing team data"),
-        ("getTeamEloV2.py", "Computing updated Elo ratings with V2 model")
+        (("updateData.py",), "Fetching current season data from Understat API"),
+        (("transformTeamData.py",), "Transforming and processing team data"),
+        (("getTeamEloV2.py",), "Computing updated Elo ratings with V2 model"),
+        (("-m", "pipelines.feature_store", "prewarm"), "Prewarming the feature cache for the latest season"),
     ]
     
     success_count = 0
     
-    for script, description in pipeline_steps:
-        if run_script(script, description):
+    for argv, description in pipeline_steps:
+        if run_script(argv, description):
             success_count += 1
         else:
             print(f"\n Pipeline failed at step: {description}")
@@ -56,6 +59,7 @@ def main():
         print("  - understat_data/{league}/Team_Results/*.csv (transformed data)")
         print("  - understat_data/{league}/team_elos_v2.csv (updated ratings)")
         print("  - understat_data/{league}/Team_Results/team_elos_timeseries.csv")
+        print("  - understat_data/feature_cache.sqlite (prewarmed fixture features)")
     else:
         print(f"\n Pipeline incomplete: {success_count}/{len(pipeline_steps)} steps completed")
     